@@ -0,0 +1,220 @@
+# DreamARC Backend - canonical answer forms for the arena
+"""Canonicalize monster answers once, compare attacks cheaply.
+
+``canonicalize`` turns an answer into one of:
+
+    n:<fraction>        exact value of a number as written ("2187", "-0.5", "3/4", "1e3")
+    n:<fraction>@<expr> the same for any other arithmetic, tagged with its normalized
+                        source ("3^7" -> "n:2187@3 ** 7")
+    e:<vars>:<values>   an expression in single-letter variables, fingerprinted by
+                        its exact values at fixed rational points ("2(x+1)", "2x+2")
+    s:<item>|<item>     an ordered tuple or list of the above ("(3, 4)", "[1, 2]")
+    t:<text>            anything else, lower-cased with runs of whitespace collapsed
+
+so "2187" matches "3^7" and "x = 5" matches "5".  A student's number only
+matches by value when it is written as a literal; arithmetic has to repeat
+the stored expression, so restating the question ("3^2 * 3^5" for a "3^7"
+monster) or "10/2" for "5" does not win.  Expressions are parsed
+with ``ast`` and evaluated over ``Fraction`` with only arithmetic nodes
+allowed and exponents capped, so nothing a student types is executed.
+
+A student's answer is only read as an expression when the stored answer is
+one (``matches``), and adjacent letters are never multiplied together, so
+words compare as text: "on" does not beat a "no" monster.  Commas are only
+dropped as thousands separators ("1,000"); "3,4" is the pair (3, 4).
+
+``AnswerIndex`` keeps the canonical form of live monsters in memory, keyed by
+monster id, so an attack is a dict lookup plus a string comparison.
+"""
+import ast
+import math
+import re
+import threading
+from collections import OrderedDict
+from fractions import Fraction
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+MAX_EXPONENT = 64
+MAX_BITS = 4096
+MAX_LENGTH = 200
+# Distinct primes keep accidental collisions between different expressions negligible.
+_POINTS = ((Fraction(2, 7), Fraction(3, 11), Fraction(5, 13)), (Fraction(-7, 17), Fraction(11, 19), Fraction(13, 23)))
+
+_OPS = {ast.Add: lambda a, b: a + b, ast.Sub: lambda a, b: a - b, ast.Mult: lambda a, b: a * b, ast.Div: lambda a, b: a / b}
+_SEQUENCES = (ast.Tuple, ast.List)
+_BRACKETED = re.compile(r"^[(\[].*[)\]]$")
+_THOUSANDS = re.compile(r"(?<![\d.,])\d{1,3}(?:,\d{3})+(?![\d,]|\.\d)")
+_SCIENTIFIC = re.compile(r"(?<![a-z\d.])(\d+(?:\.\d*)?|\.\d+)e([+-]?\d+)(?![\d.])")
+# Only an answer with a digit or an operator in it is stored as an expression.
+_EXPRESSION = re.compile(r"[\d+\-*/^()×÷−]")
+
+
+def _text(answer: str) -> str:
+    return re.sub(r"\s+", " ", (answer or "").strip().lower())
+
+
+def _prepare(answer: str) -> str:
+    s = re.sub(r"\s+", "", _text(answer)).replace("^", "**").replace("×", "*").replace("÷", "/").replace("−", "-")
+    s = re.sub(r"^[a-z]=", "", s)  # "x=5" -> "5"
+    if not _BRACKETED.match(s):
+        s = _THOUSANDS.sub(lambda m: m.group(0).replace(",", ""), s)  # "1,000" -> "1000"
+    s = _SCIENTIFIC.sub(r"(\1*10**(\2))", s)  # "1e3" -> "(1*10**(3))"
+    s = re.sub(r"(\d|\))(?=[a-z(])", r"\1*", s)  # implicit multiplication: 2x, 2(, )(
+    s = re.sub(r"(?<![a-z])([a-z])(?=[(\d])", r"\1*", s)  # x2, x(; "ab" stays one name
+    return s
+
+
+def _evaluate(node: ast.AST, env: Dict[str, Fraction]) -> Fraction:
+    if isinstance(node, ast.Constant) and isinstance(node.value, int) and not isinstance(node.value, bool):
+        return Fraction(node.value)
+    if isinstance(node, ast.Constant) and isinstance(node.value, float):
+        return Fraction(repr(node.value))
+    if isinstance(node, ast.Name) and node.id in env:
+        return env[node.id]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _evaluate(node.operand, env)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp):
+        left, right = _evaluate(node.left, env), _evaluate(node.right, env)
+        if isinstance(node.op, ast.Pow):
+            if right.denominator != 1 or abs(right) > MAX_EXPONENT:
+                raise ValueError("unsupported exponent")
+            value = left ** int(right)
+            if max(value.numerator.bit_length(), value.denominator.bit_length()) > MAX_BITS:
+                raise ValueError("value too large")
+            return value
+        op = _OPS.get(type(node.op))
+        if op is not None:
+            return op(left, right)
+    raise ValueError("unsupported expression")
+
+
+def _is_number(node: ast.AST) -> bool:
+    return isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool)
+
+
+def _is_literal(node: ast.AST) -> bool:
+    """A number as written: "12", "-0.5", "1.5e-3", or a fraction in lowest terms."""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        node = node.operand
+    if _is_number(node):
+        return True
+    if not isinstance(node, ast.BinOp):
+        return False
+    if isinstance(node.op, ast.Mult):  # scientific notation as rewritten by _prepare
+        power = node.right
+        if not (isinstance(power, ast.BinOp) and isinstance(power.op, ast.Pow) and _is_number(node.left)):
+            return False
+        exponent = power.right.operand if isinstance(power.right, ast.UnaryOp) else power.right
+        return isinstance(power.left, ast.Constant) and power.left.value == 10 and _is_number(exponent)
+    if isinstance(node.op, ast.Div):
+        num, den = node.left, node.right
+        if isinstance(num, ast.UnaryOp) and isinstance(num.op, (ast.USub, ast.UAdd)):
+            num = num.operand
+        ints = all(isinstance(n, ast.Constant) and type(n.value) is int for n in (num, den))
+        return ints and den.value > 1 and math.gcd(num.value, den.value) == 1
+    return False
+
+
+def _value(node: ast.AST, names: List[str]) -> str:
+    if not names:
+        value = f"n:{_evaluate(node, {})}"
+        return value if _is_literal(node) else f"{value}@{ast.unparse(node)}"
+    values = [_evaluate(node, dict(zip(names, point))) for point in _POINTS]
+    return f"e:{','.join(names)}:{';'.join(str(v) for v in values)}"
+
+
+def canonicalize(answer: str, algebraic: Optional[bool] = None) -> str:
+    """Canonical form of ``answer``.
+
+    ``algebraic`` says whether variables are allowed; by default they are
+    when the answer itself looks like an expression rather than a word.
+    """
+    text = _text(answer)
+    if not text or len(text) > MAX_LENGTH:
+        return f"t:{text}"
+    if algebraic is None:
+        algebraic = bool(_EXPRESSION.search(text))
+    try:
+        body = ast.parse(_prepare(answer), mode="eval").body
+        names = sorted({n.id for n in ast.walk(body) if isinstance(n, ast.Name)})
+        if names and (not algebraic or any(len(n) != 1 for n in names) or len(names) > len(_POINTS[0])):
+            return f"t:{text}"
+        if isinstance(body, _SEQUENCES):
+            if not body.elts or any(isinstance(e, _SEQUENCES) for e in body.elts):
+                return f"t:{text}"
+            return "s:" + "|".join(_value(e, names) for e in body.elts)
+        return _value(body, names)
+    except (SyntaxError, ValueError, ZeroDivisionError, OverflowError, RecursionError):
+        return f"t:{text}"
+
+
+def _is_algebraic(canonical: str) -> bool:
+    if canonical.startswith("s:"):
+        return any(item.startswith("e:") for item in canonical[2:].split("|"))
+    return canonical.startswith("e:")
+
+
+def _same(stored: str, given: str) -> bool:
+    # A literal answer matches a stored expression by value; anything else must be identical.
+    return given == stored or (stored.startswith("n:") and given == stored.partition("@")[0])
+
+
+def matches(canonical: str, answer: str) -> bool:
+    given = canonicalize(answer, algebraic=_is_algebraic(canonical))
+    if canonical.startswith("s:") and given.startswith("s:"):
+        stored_items, given_items = canonical[2:].split("|"), given[2:].split("|")
+        return len(stored_items) == len(given_items) and all(map(_same, stored_items, given_items))
+    return _same(canonical, given)
+
+
+class AnswerEntry(NamedTuple):
+    student_id: int
+    canonical: str
+    monster_name: str
+    xp_reward: int
+
+
+class AnswerIndex:
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, AnswerEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, monster_id: int) -> Optional[AnswerEntry]:
+        with self._lock:
+            entry = self._entries.get(monster_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(monster_id)
+            self.hits += 1
+            return entry
+
+    def put_rows(self, rows: Sequence) -> Optional[AnswerEntry]:
+        """Index ``game_monsters`` rows; returns the entry for the last one."""
+        entry = None
+        with self._lock:
+            for r in rows:
+                entry = AnswerEntry(r["student_id"], r["answer_canonical"] or canonicalize(r["correct_answer"]), r["monster_name"], r["xp_reward"])
+                self._entries[r["id"]] = entry
+                self._entries.move_to_end(r["id"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def discard(self, monster_id: int):
+        with self._lock:
+            self._entries.pop(monster_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,463 @@
+# DreamARC Backend - load-test harness
+"""Drive the real app under classroom-scale concurrency and report latency.
+
+    python -m backend.bench [--mix classroom] [--students 200] [--concurrency 50]
+                            [--duration 30] [--llm-latency 0.8] [--tts-latency 0.3]
+                            [--out result.json] [--compare baseline.json]
+
+Each run seeds a fresh SQLite database in a temp directory with synthetic
+students (one shared pbkdf2_sha256 hash, so seeding takes seconds), starts
+local stand-ins for the OpenAI chat/responses and ElevenLabs TTS APIs with
+the given latency, and starts ``backend.main:app`` under uvicorn pointed at
+both.  Server, fakes and load generator are separate processes, so the
+numbers are the server's own.
+
+Virtual users loop for ``--duration`` seconds, each picking operations
+from the mix by weight.  The report is JSON: per-operation request and
+error counts, status codes, throughput and p50/p95/p99/max latency, plus
+the commit and settings it was measured with.  ``--compare`` prints the
+p95 and throughput change against an earlier report and exits 1 when any
+p95 grew by more than ``--threshold``.
+
+``python -m backend.bench fakes --port N`` runs only the upstream fakes.
+
+``python -m backend.bench coldstart [--runs 5]`` starts the server
+``--runs`` times against one seeded database and reports, per run, the
+time from spawn until ``/health`` answers and until a first login
+succeeds, together with the server's own ``/health/boot`` phases.  The
+first run meets an unfingerprinted database; the rest show the warm path.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "bench-pass"
+TOPICS = ("Algebra", "Geometry", "Fractions", "Exponents", "Ratios", "Statistics")
+REPLY = "Let's break it into steps. First write what you know, then isolate the unknown and check your answer."
+
+# operation -> weight
+MIXES: Dict[str, Dict[str, int]] = {
+    "classroom": {"login": 3, "chat": 20, "lambda": 35, "dashboard": 25, "overview": 10, "tts": 7},
+    "login-storm": {"login": 1},
+    "chat": {"chat": 1},
+    "lambda": {"lambda": 1},
+    "dashboard": {"dashboard": 3, "overview": 1},
+    "tts": {"tts": 1},
+}
+
+
+# --- upstream fakes ------------------------------------------------------
+def fake_upstream_app(llm_latency: float, tts_latency: float, jitter: float = 0.25, seed: int = 1):
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+
+    rng = random.Random(seed)
+
+    def delay(base: float) -> float:
+        return max(0.0, base * (1 + rng.uniform(-jitter, jitter)))
+
+    async def chat_completions(request):
+        body = await request.json()
+        text = json.dumps({"content": REPLY}) if body.get("response_format") else REPLY
+        await asyncio.sleep(delay(llm_latency))
+        model = body.get("model", "fake")
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 30, "total_tokens": 130},
+            })
+
+        async def events():
+            for i in range(0, len(text), 12):
+                chunk = {
+                    "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {"content": text[i:i + 12]}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(0.005)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def responses(request):
+        body = await request.json()
+        await asyncio.sleep(delay(llm_latency))
+        return JSONResponse({
+            "id": "resp-bench", "object": "response", "created_at": int(time.time()), "model": body.get("model", "fake"),
+            "status": "completed", "parallel_tool_calls": False, "tool_choice": "auto", "tools": [],
+            "output": [{"type": "message", "id": "msg-bench", "status": "completed", "role": "assistant",
+                        "content": [{"type": "output_text", "text": REPLY, "annotations": []}]}],
+        })
+
+    async def text_to_speech(request):
+        await request.body()
+        await asyncio.sleep(delay(tts_latency))
+
+        async def audio():
+            for _ in range(4):
+                yield b"\xff\xf3" * 4096
+                await asyncio.sleep(0.01)
+
+        return StreamingResponse(audio(), media_type="audio/mpeg")
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/responses", responses, methods=["POST"]),
+        Route("/v1/text-to-speech/{voice_id}", text_to_speech, methods=["POST"]),
+    ])
+
+
+# --- database ------------------------------------------------------------
+def seed_db(path: str, students: int, seed: int = 7) -> List[Tuple[str, int]]:
+    """Fresh database with ``students`` synthetic students; returns ``[(username, student_id)]``."""
+    from .migrations import migrate
+    from .passwords import make_crypt_context
+
+    rng = random.Random(seed)
+    hashed = make_crypt_context().hash(PASSWORD)
+    conn = sqlite3.connect(path)
+    try:
+        migrate(conn)
+        users = []
+        for n in range(1, students + 1):
+            username = f"bench{n:05d}"
+            uid = conn.execute("INSERT INTO users (username, hashed_password, role) VALUES (?, ?, 'student')", (username, hashed)).lastrowid
+            sid = conn.execute("INSERT INTO students (user_id, grade) VALUES (?, ?)", (uid, str(6 + n % 7))).lastrowid
+            conn.execute("INSERT INTO pq_scores (student_id, homework, attitude) VALUES (?, ?, ?)", (sid, rng.randint(0, 10), rng.randint(0, 10)))
+            conn.executemany(
+                "INSERT INTO topic_mastery (student_id, topic_name, lambda_val, consecutive_correct) VALUES (?, ?, ?, ?)",
+                [(sid, t, round(rng.uniform(0.3, 4.5), 3), rng.randint(0, 4)) for t in TOPICS],
+            )
+            conn.executemany(
+                "INSERT INTO lambda_logs (student_id, topic, lambda_val) VALUES (?, ?, ?)",
+                [(sid, rng.choice(TOPICS), round(rng.uniform(0.3, 4.5), 3)) for _ in range(10)],
+            )
+            conn.executemany(
+                "INSERT INTO tutoring_logs (student_id, log_date, log_content, tutor_name) VALUES (?, date('now'), 'Chat', 'samie')",
+                [(sid,)] * 5,
+            )
+            users.append((username, sid))
+        conn.commit()
+    finally:
+        conn.close()
+    return users
+
+
+# --- processes -----------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawn(args: Sequence[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "wb")
+    return subprocess.Popen([sys.executable, *args], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60.0, poll: float = 0.1):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{url} exited with {proc.returncode} before it was ready")
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(poll)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+# --- load ----------------------------------------------------------------
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, op: str, seconds: float, status: str, ok: bool):
+        self.samples.setdefault(op, []).append(seconds)
+        counts = self.statuses.setdefault(op, {})
+        counts[status] = counts.get(status, 0) + 1
+        if not ok:
+            self.errors[op] = self.errors.get(op, 0) + 1
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), int(-(-q * len(ordered) // 100))))
+    return ordered[rank - 1]
+
+
+def summarize(samples: Sequence[float], errors: int, elapsed: float, statuses: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    ms = lambda v: round(v * 1000, 2)  # noqa: E731
+    out = {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]) if ordered else 0.0,
+    }
+    if statuses is not None:
+        out["status"] = statuses
+    return out
+
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, users: List[Tuple[str, int]], seed: int):
+        self.client = client
+        self.users = users
+        self.seed = seed
+        self._chatted: set = set()
+
+    def request(self, op: str, rng: random.Random, user: Tuple[str, int]):
+        username, sid = user
+        if op == "login":
+            return self.client.post("/api/auth/login", json={"username": username, "password": PASSWORD})
+        if op == "chat":
+            first = sid not in self._chatted
+            self._chatted.add(sid)
+            return self.client.post("/api/learning/tutor-request", json={
+                "student_id": sid, "persona": "samie", "new_session": first,
+                "system": "You are Samie, a patient math tutor.",
+                "message": f"How do I solve {rng.randint(2, 9)}x + {rng.randint(1, 20)} = {rng.randint(20, 90)}?",
+            })
+        if op == "lambda":
+            return self.client.post("/api/lambda/attempt", json={
+                "student_id": sid, "topic_name": rng.choice(TOPICS), "correctness": rng.randint(0, 1),
+                "latency_tau": round(rng.uniform(0.2, 3.0), 2), "dependency_h": rng.randint(0, 2),
+            })
+        if op == "dashboard":
+            return self.client.get(f"/api/students/{sid}/dashboard")
+        if op == "overview":
+            return self.client.get(f"/api/students/{sid}/overview", params={"fields": "dashboard,rmsq_stats"})
+        if op == "tts":
+            # A small phrase pool, so both cache hits and upstream misses show up.
+            return self.client.post("/api/tts/speak", json={"text": f"Great job on question {rng.randint(1, 40)}!", "persona": "samie"})
+        raise ValueError(f"unknown operation {op}")
+
+    async def user_loop(self, index: int, mix: Dict[str, int], stop_at: float, record_after: float, recorder: Recorder):
+        rng = random.Random(self.seed * 100003 + index)
+        ops, weights = list(mix), list(mix.values())
+        user = self.users[index % len(self.users)]
+        while time.monotonic() < stop_at:
+            op = rng.choices(ops, weights)[0]
+            started = time.monotonic()
+            try:
+                resp = await self.request(op, rng, user)
+                status, ok = str(resp.status_code), resp.status_code < 400
+            except httpx.HTTPError as e:
+                status, ok = type(e).__name__, False
+            if started >= record_after:
+                recorder.add(op, time.monotonic() - started, status, ok)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = MIXES[args.mix]
+    with tempfile.TemporaryDirectory(prefix="dreamarc-bench-") as tmp:
+        t0 = time.perf_counter()
+        users = seed_db(os.path.join(tmp, "bench.db"), args.students, args.seed)
+        seed_seconds = time.perf_counter() - t0
+
+        fake_port, app_port = _free_port(), _free_port()
+        env = dict(os.environ)
+        env.update({
+            "DB_PATH": os.path.join(tmp, "bench.db"),
+            "OPENAI_API_KEY": "bench",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+            "ELEVENLABS_API_KEY": "bench",
+            "ELEVENLABS_BASE_URL": f"http://127.0.0.1:{fake_port}",
+            "TTS_CACHE_DIR": os.path.join(tmp, "tts"),
+        })
+        fakes = _spawn(["-m", "backend.bench", "fakes", "--port", str(fake_port), "--llm-latency", str(args.llm_latency),
+                        "--tts-latency", str(args.tts_latency), "--seed", str(args.seed)], env, os.path.join(tmp, "fakes.log"))
+        server = _spawn(["-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(app_port), "--log-level", "warning",
+                         "--no-access-log"], env, os.path.join(tmp, "server.log"))
+        try:
+            await _wait_ready(f"http://127.0.0.1:{fake_port}/", fakes)
+            await _wait_ready(f"http://127.0.0.1:{app_port}/health", server)
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=args.timeout) as client:
+                workload = Workload(client, users, args.seed)
+                recorder = Recorder()
+                start = time.monotonic()
+                record_after = start + args.warmup
+                stop_at = record_after + args.duration
+                await asyncio.gather(*(workload.user_loop(i, mix, stop_at, record_after, recorder) for i in range(args.concurrency)))
+                elapsed = time.monotonic() - record_after
+        finally:
+            for proc in (server, fakes):
+                proc.terminate()
+            for proc in (server, fakes):
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+        if server.returncode not in (0, -15):
+            with open(os.path.join(tmp, "server.log"), "rb") as f:
+                sys.stderr.write(f.read()[-4000:].decode("utf-8", "replace"))
+
+    endpoints = {op: summarize(s, recorder.errors.get(op, 0), elapsed, recorder.statuses[op]) for op, s in sorted(recorder.samples.items())}
+    every = [v for s in recorder.samples.values() for v in s]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "mix": args.mix,
+            "weights": mix,
+            "students": args.students,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "llm_latency_s": args.llm_latency,
+            "tts_latency_s": args.tts_latency,
+            "seed": args.seed,
+            "seed_db_s": round(seed_seconds, 2),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "endpoints": endpoints,
+        "total": summarize(every, sum(recorder.errors.values()), elapsed),
+    }
+
+
+async def coldstart(args: argparse.Namespace) -> Dict[str, Any]:
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="dreamarc-coldstart-") as tmp:
+        users = seed_db(os.path.join(tmp, "bench.db"), 1, args.seed)
+        env = dict(os.environ)
+        env.update({
+            "DB_PATH": os.path.join(tmp, "bench.db"),
+            "OPENAI_API_KEY": "bench",
+            "OPENAI_BASE_URL": "http://127.0.0.1:9/v1",  # never called; the client only has to exist
+            "TTS_CACHE_DIR": os.path.join(tmp, "tts"),
+        })
+        for i in range(args.runs):
+            port = _free_port()
+            started = time.perf_counter()
+            server = _spawn(["-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+                             "--no-access-log"], env, os.path.join(tmp, f"server-{i}.log"))
+            try:
+                await _wait_ready(f"http://127.0.0.1:{port}/health", server, poll=0.01)
+                ready = time.perf_counter() - started
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30.0) as client:
+                    r = await client.post("/api/auth/login", json={"username": users[0][0], "password": PASSWORD})
+                    login = time.perf_counter() - started
+                    boot = await client.get("/health/boot")
+            finally:
+                server.terminate()
+                try:
+                    server.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+            runs.append({
+                "ready_ms": round(ready * 1000, 1),
+                "first_login_ms": round(login * 1000, 1),
+                "login_status": r.status_code,
+                "boot": boot.json() if boot.status_code == 200 else None,
+            })
+    warm = sorted(run["ready_ms"] for run in runs[1:]) or [runs[0]["ready_ms"]]
+    return {
+        "meta": {"commit": _git_commit(), "python": platform.python_version(), "runs": args.runs,
+                 "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")},
+        "runs": runs,
+        "warm_ready_p50_ms": percentile(warm, 50),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> bool:
+    """Print p95/throughput deltas; returns True when any p95 regressed past ``threshold``."""
+    regressed = False
+    print(f"{'operation':12s} {'p95 base':>10s} {'p95 new':>10s} {'change':>8s} {'rps base':>9s} {'rps new':>9s}")
+    for op in sorted(set(base["endpoints"]) | set(new["endpoints"])):
+        a, b = base["endpoints"].get(op), new["endpoints"].get(op)
+        if not a or not b:
+            print(f"{op:12s} {'-' if not a else a['p95_ms']:>10} {'-' if not b else b['p95_ms']:>10}")
+            continue
+        ratio = b["p95_ms"] / a["p95_ms"] if a["p95_ms"] else 1.0
+        flag = " !" if ratio > threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"{op:12s} {a['p95_ms']:10.1f} {b['p95_ms']:10.1f} {ratio - 1:+7.0%}{flag} {a['throughput_rps']:9.1f} {b['throughput_rps']:9.1f}")
+    return regressed
+
+
+def main(argv: Sequence[str]) -> int:
+    if argv and argv[0] == "fakes":
+        parser = argparse.ArgumentParser(prog="python -m backend.bench fakes")
+        parser.add_argument("--port", type=int, required=True)
+        parser.add_argument("--llm-latency", type=float, default=0.8)
+        parser.add_argument("--tts-latency", type=float, default=0.3)
+        parser.add_argument("--seed", type=int, default=1)
+        args = parser.parse_args(argv[1:])
+        import uvicorn
+
+        uvicorn.run(fake_upstream_app(args.llm_latency, args.tts_latency, seed=args.seed), host="127.0.0.1", port=args.port, log_level="warning")
+        return 0
+    if argv and argv[0] == "coldstart":
+        parser = argparse.ArgumentParser(prog="python -m backend.bench coldstart")
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=7)
+        args = parser.parse_args(argv[1:])
+        print(json.dumps(asyncio.run(coldstart(args)), indent=2))
+        return 0
+
+    parser = argparse.ArgumentParser(prog="python -m backend.bench", description="Load-test the DreamARC API against local fakes.")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="classroom")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds to first token from the fake LLM")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="seconds to first byte from the fake TTS")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p95 ratio that counts as a regression")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(json.load(f), report, args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
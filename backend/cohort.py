@@ -0,0 +1,296 @@
+# DreamARC Backend - cohort analytics
+"""Class-wide views over every student, computed on columnar arrays.
+
+``load`` reads ``topic_mastery``, ``lambda_logs``, ``pq_scores``,
+``game_monsters`` and ``students`` in one read transaction into NumPy
+columns (topics are dictionary-encoded to integer codes).  Group-bys use
+``bincount``/``lexsort`` and percentiles are interpolated on sorted groups,
+so no step loops over rows in Python.  A ``CohortData`` snapshot also
+memoizes each computed view; ``CohortCache`` keeps the snapshot until the
+next write to one of those tables.
+
+    python -m backend.cohort --bench [STUDENTS]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STRUGGLE_LAMBDA = 3.5  # same threshold the A2G memory uses
+PQ_FIELDS = ("homework", "attitude", "valid_question", "solving_question", "organization", "test_prep", "review")
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def _columns(cursor, count: int) -> List[Sequence[Any]]:
+    rows = cursor.fetchall()
+    return list(zip(*rows)) if rows else [() for _ in range(count)]
+
+
+def _floats(values: Sequence[Any], default: float):
+    """Float column with NULLs replaced by ``default``."""
+    arr = np.asarray(values, dtype=np.float64)  # None -> nan
+    arr[np.isnan(arr)] = default
+    return arr
+
+
+def _encode(values: List[Any]):
+    """Dictionary-encode strings: ``(names, codes)``."""
+    names, codes = np.unique(np.asarray([v or "" for v in values], dtype=object).astype(str), return_inverse=True)
+    return names.tolist(), codes.astype(np.int64)
+
+
+def _group_percentiles(groups, values, n_groups: int):
+    """Per-group count, mean and linear-interpolated percentiles."""
+    order = np.lexsort((values, groups))
+    sorted_vals = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    means = np.divide(np.bincount(groups, weights=values, minlength=n_groups), counts, out=np.zeros(n_groups), where=present)
+    pct = {}
+    for p in PERCENTILES:
+        pos = starts + (np.maximum(counts, 1) - 1) * (p / 100.0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        if len(sorted_vals):
+            lo, hi = np.minimum(lo, len(sorted_vals) - 1), np.minimum(hi, len(sorted_vals) - 1)
+            pct[p] = sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (pos - lo)
+        else:
+            pct[p] = np.zeros(n_groups)
+    return counts, means, pct
+
+
+class CohortData:
+    """One consistent snapshot of the cohort tables, as columns."""
+
+    def __init__(self, db: sqlite3.Connection):
+        started = time.perf_counter()
+        cur = db.cursor()
+        cur.row_factory = None  # plain tuples; Row objects cost more than the arrays
+        sid, grade = _columns(cur.execute("SELECT id, grade FROM students"), 2)
+        self.student_ids = np.asarray(sid, dtype=np.int64)
+        self.student_grades = np.asarray([str(g or "") for g in grade], dtype=object)
+
+        sid, topic, lam = _columns(cur.execute("SELECT student_id, topic_name, lambda_val FROM topic_mastery"), 3)
+        self.m_student = np.asarray(sid, dtype=np.int64)
+        self.m_topics, self.m_topic = _encode(topic)
+        self.m_lambda = _floats(lam, 1.0)
+
+        sid, lam = _columns(cur.execute("SELECT student_id, lambda_val FROM lambda_logs"), 2)
+        self.l_student = np.asarray(sid, dtype=np.int64)
+        self.l_lambda = _floats(lam, 0.0)
+
+        # Latest pq_scores row per student: rows arrive ordered, keep each group's last.
+        cols = _columns(cur.execute(f"SELECT student_id, {', '.join(PQ_FIELDS)} FROM pq_scores ORDER BY student_id, updated_at, id"), 1 + len(PQ_FIELDS))
+        pq_student = np.asarray(cols[0], dtype=np.int64)
+        last = np.flatnonzero(np.append(pq_student[1:] != pq_student[:-1], True)) if len(pq_student) else np.zeros(0, dtype=np.int64)
+        self.p_student = pq_student[last]
+        self.p_scores = _floats(cols[1:], 0.0).reshape(len(PQ_FIELDS), -1)[:, last]
+
+        sid, topic, kind, defeated = _columns(cur.execute("SELECT student_id, topic_name, monster_type, is_defeated FROM game_monsters"), 4)
+        self.g_student = np.asarray(sid, dtype=np.int64)
+        self.g_topics, self.g_topic = _encode(topic)
+        self.g_types, self.g_type = _encode(kind)
+        self.g_defeated = _floats(defeated, 0.0) != 0
+
+        self.load_ms = round((time.perf_counter() - started) * 1000, 2)
+        self._memo: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def _in_grade(self, students, grade: Optional[str]):
+        if grade is None:
+            return np.ones(len(students), dtype=bool)
+        return np.isin(students, self.student_ids[self.student_grades == str(grade)])
+
+    def _memoized(self, key, compute):
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = compute()
+            return self._memo[key]
+
+    def lambda_distribution(self, grade: Optional[str] = None) -> List[Dict[str, Any]]:
+        def compute():
+            mask = self._in_grade(self.m_student, grade)
+            topic, lam = self.m_topic[mask], self.m_lambda[mask]
+            n = len(self.m_topics)
+            counts, means, pct = _group_percentiles(topic, lam, n)
+            struggling = np.bincount(topic[lam > STRUGGLE_LAMBDA], minlength=n)
+            return [
+                {"topic_name": self.m_topics[t], "students": int(counts[t]), "mean": round(float(means[t]), 4),
+                 "percentiles": {f"p{p}": round(float(pct[p][t]), 4) for p in PERCENTILES},
+                 "struggling": int(struggling[t])}
+                for t in np.flatnonzero(counts)
+            ]
+        return self._memoized(("lambda", grade), compute)
+
+    def struggling_students(self, grade: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        def compute():
+            mask = self._in_grade(self.m_student, grade) & (self.m_lambda > STRUGGLE_LAMBDA)
+            student, topic, lam = self.m_student[mask], self.m_topic[mask], self.m_lambda[mask]
+            if not len(student):
+                return []
+            order = np.lexsort((-lam, student))  # per student, worst topic first
+            student, topic, lam = student[order], topic[order], lam[order]
+            ids, first, counts = np.unique(student, return_index=True, return_counts=True)
+            log_ids, log_counts = np.unique(self.l_student[self.l_lambda > STRUGGLE_LAMBDA], return_counts=True)
+            events = np.zeros(len(ids), dtype=np.int64)
+            pos = np.searchsorted(log_ids, ids)
+            hit = (pos < len(log_ids)) & (log_ids[np.minimum(pos, len(log_ids) - 1)] == ids) if len(log_ids) else np.zeros(len(ids), dtype=bool)
+            events[hit] = log_counts[pos[hit]]
+            rank = np.lexsort((-lam[first], -counts))  # lexsort's last key is primary: most struggling topics first
+            return [
+                {"student_id": int(ids[i]), "struggling_topics": int(counts[i]), "worst_topic": self.m_topics[topic[first[i]]],
+                 "max_lambda": round(float(lam[first[i]]), 4), "struggle_events": int(events[i])}
+                for i in rank
+            ]
+        return self._memoized(("struggling", grade), compute)[:limit]
+
+    def pq_averages(self, grade: Optional[str] = None) -> Dict[str, Any]:
+        def compute():
+            scores = self.p_scores[:, self._in_grade(self.p_student, grade)]
+            n = scores.shape[1]
+            means = scores.mean(axis=1) if n else np.zeros(len(PQ_FIELDS))
+            totals = scores.sum(axis=0)
+            return {
+                "students": int(n),
+                "averages": {f: round(float(m), 4) for f, m in zip(PQ_FIELDS, means)},
+                "total": {"mean": round(float(totals.mean()), 4) if n else 0.0,
+                          **{f"p{p}": round(float(np.percentile(totals, p)), 4) if n else 0.0 for p in PERCENTILES}},
+            }
+        return self._memoized(("pq", grade), compute)
+
+    def monster_defeat_rates(self, grade: Optional[str] = None) -> Dict[str, Any]:
+        def compute():
+            mask = self._in_grade(self.g_student, grade)
+            defeated = self.g_defeated[mask]
+
+            def rates(codes, names):
+                total = np.bincount(codes[mask], minlength=len(names))
+                won = np.bincount(codes[mask][defeated], minlength=len(names))
+                return [{"name": names[i], "monsters": int(total[i]), "defeated": int(won[i]), "rate": round(float(won[i] / total[i]), 4)}
+                        for i in np.flatnonzero(total)]
+
+            return {
+                "monsters": int(mask.sum()),
+                "defeated": int(defeated.sum()),
+                "rate": round(float(defeated.mean()), 4) if len(defeated) else 0.0,
+                "by_topic": rates(self.g_topic, self.g_topics),
+                "by_type": rates(self.g_type, self.g_types),
+            }
+        return self._memoized(("monsters", grade), compute)
+
+
+def load(db: sqlite3.Connection) -> CohortData:
+    db.execute("BEGIN")  # one snapshot across all tables
+    try:
+        return CohortData(db)
+    finally:
+        db.rollback()
+
+
+class CohortCache:
+    """Holds the current ``CohortData`` until a write invalidates it."""
+
+    def __init__(self):
+        self.loads = 0
+        self.invalidations = 0
+        self._data: Optional[CohortData] = None
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self) -> Optional[CohortData]:
+        return self._data
+
+    def put(self, data: CohortData, generation: int):
+        self.loads += 1
+        if generation == self._generation:
+            self._data = data
+
+    def invalidate(self):
+        self._generation += 1
+        if self._data is not None:
+            self._data = None
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": np is not None,
+            "loaded": self._data is not None,
+            "load_ms": self._data.load_ms if self._data is not None else None,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+        }
+
+
+def _synthetic_db(path: str, students: int, topics: int = 12, seed: int = 7):
+    from .migrations import migrate
+
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    ids = np.arange(1, students + 1)
+    conn.executemany("INSERT INTO students (id, user_id, grade) VALUES (?, ?, ?)", [(int(i), int(i), str(7 + i % 6)) for i in ids])
+    names = [f"Topic {t}" for t in range(topics)]
+    conn.executemany(
+        "INSERT INTO topic_mastery (student_id, topic_name, lambda_val, consecutive_correct) VALUES (?, ?, ?, ?)",
+        [(int(s), names[t], float(np.clip(rng.gamma(2.0, 1.0), 0.1, 5.0)), int(rng.integers(0, 6))) for s in ids for t in range(topics)],
+    )
+    conn.executemany(
+        "INSERT INTO lambda_logs (student_id, topic, lambda_val) VALUES (?, ?, ?)",
+        [(int(s), names[int(rng.integers(topics))], float(np.clip(rng.gamma(2.0, 1.0), 0.1, 5.0))) for s in ids for _ in range(5)],
+    )
+    conn.executemany(
+        f"INSERT INTO pq_scores (student_id, {', '.join(PQ_FIELDS)}) VALUES (?{', ?' * len(PQ_FIELDS)})",
+        [(int(s), *[int(v) for v in rng.integers(0, 11, len(PQ_FIELDS))]) for s in ids for _ in range(2)],
+    )
+    conn.executemany(
+        "INSERT INTO game_monsters (student_id, monster_name, monster_type, topic_name, hp_max, hp_current, xp_reward, is_defeated) VALUES (?, 'Bench', ?, ?, 100, 100, 10, ?)",
+        [(int(s), "BOSS" if m == 0 else "MINION", names[int(rng.integers(topics))], int(rng.random() < 0.6)) for s in ids for m in range(4)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def bench(students: int = 10000) -> Dict[str, float]:
+    from .db import configure_connection
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cohort.db")
+        _synthetic_db(path, students)
+        conn = sqlite3.connect(path)
+        configure_connection(conn)
+        timings = {}
+        started = time.perf_counter()
+        data = load(conn)
+        timings["load_ms"] = (time.perf_counter() - started) * 1000
+        for name, fn in (("lambda_distribution", data.lambda_distribution), ("struggling_students", data.struggling_students),
+                         ("pq_averages", data.pq_averages), ("monster_defeat_rates", data.monster_defeat_rates)):
+            started = time.perf_counter()
+            fn()
+            timings[f"{name}_ms"] = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            fn()
+            timings[f"{name}_cached_us"] = (time.perf_counter() - started) * 1e6
+        conn.close()
+    return {k: round(v, 2) for k, v in timings.items()}
+
+
+if __name__ == "__main__":
+    if np is None:
+        sys.exit("cohort analytics needs numpy")
+    if "--bench" in sys.argv:
+        args = [a for a in sys.argv[1:] if not a.startswith("--")]
+        n = int(args[0]) if args else 10000
+        for key, value in bench(n).items():
+            print(f"{key:32s} {value}")
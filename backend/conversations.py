@@ -0,0 +1,182 @@
+# DreamARC Backend - server-side tutor conversations
+"""Per (student, persona) chat sessions held on the server.
+
+Clients send only the new message.  The session keeps the system prompt,
+the recent turns and an optional rolling summary; ``context`` assembles
+what goes upstream and trims it to ``token_budget`` (oldest turns first,
+the system prompt and the new message always stay).  Turns pushed out of
+the budget are either dropped or, when a ``summarize`` coroutine is given,
+folded into the summary in the background.
+
+``fit_to_budget`` applies the same trimming to histories that legacy
+clients still upload in full.  Token counts come from ``tiktoken`` when it
+is installed and otherwise from a 4-characters-per-token estimate.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+MESSAGE_OVERHEAD = 4
+_IMAGE = re.compile(r"data:image/[a-zA-Z]+;base64,[A-Za-z0-9+/=]+")
+_encoding = None
+
+Message = Dict[str, Any]
+Summarizer = Callable[[str, List[Message]], Awaitable[str]]
+
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if tiktoken is not None and _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: Message) -> int:
+    content = message.get("content")
+    return MESSAGE_OVERHEAD + count_tokens(content if isinstance(content, str) else str(content or ""))
+
+
+def fit_to_budget(messages: List[Message], budget: int) -> Tuple[List[Message], int]:
+    """Keep leading system messages and the newest turns that fit; returns ``(kept, dropped)``."""
+    head = 0
+    while head < len(messages) and messages[head].get("role") == "system":
+        head += 1
+    system, turns = messages[:head], messages[head:]
+    used = sum(message_tokens(m) for m in system)
+    kept = 0
+    for m in reversed(turns):
+        cost = message_tokens(m)
+        if kept and used + cost > budget:
+            break
+        used += cost
+        kept += 1
+    return system + turns[len(turns) - kept:], len(turns) - kept
+
+
+class _Session:
+    __slots__ = ("system", "summary", "turns", "lifetime_tokens", "updated", "summarizing")
+
+    def __init__(self):
+        self.system: Optional[str] = None
+        self.summary = ""
+        self.turns: List[Message] = []
+        self.lifetime_tokens = 0  # every turn ever recorded, for the before/after counters
+        self.updated = time.monotonic()
+        self.summarizing = False
+
+
+class ConversationStore:
+    def __init__(self, token_budget: int = 3000, max_sessions: int = 4096, idle_ttl: float = 6 * 3600,
+                 summarize: Optional[Summarizer] = None):
+        self.token_budget = token_budget
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.summarize = summarize
+        self.counters: Dict[str, int] = {"turns": 0, "request_bytes": 0, "prompt_tokens_sent": 0,
+                                         "prompt_tokens_full_history": 0, "turns_dropped": 0, "summaries": 0}
+        self._sessions: "OrderedDict[Tuple[int, str], _Session]" = OrderedDict()
+        self._tasks: set = set()
+
+    def _session(self, student_id: int, persona: str, create: bool = True) -> Optional[_Session]:
+        key = (student_id, persona)
+        session = self._sessions.get(key)
+        if session is not None and time.monotonic() - session.updated > self.idle_ttl:
+            del self._sessions[key]
+            session = None
+        if session is None and create:
+            session = self._sessions[key] = _Session()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        if session is not None:
+            self._sessions.move_to_end(key)
+        return session
+
+    def reset(self, student_id: int, persona: str):
+        self._sessions.pop((student_id, persona), None)
+
+    def context(self, student_id: int, persona: str, message: str, system: Optional[str] = None) -> List[Message]:
+        """Messages to send upstream for a new user ``message``, within the token budget."""
+        session = self._session(student_id, persona)
+        if system:
+            session.system = system
+        head = [{"role": "system", "content": session.system}] if session.system else []
+        if session.summary:
+            head.append({"role": "system", "content": f"Summary of the earlier conversation: {session.summary}"})
+        messages, _ = fit_to_budget(head + session.turns + [{"role": "user", "content": message}], self.token_budget)
+        self.counters["turns"] += 1
+        self.counters["request_bytes"] += len(message.encode("utf-8")) + len((system or "").encode("utf-8"))
+        self.counters["prompt_tokens_sent"] += sum(message_tokens(m) for m in messages)
+        # What a client re-uploading everything would have cost for this turn.
+        self.counters["prompt_tokens_full_history"] += sum(message_tokens(m) for m in head[:1]) + session.lifetime_tokens + message_tokens(messages[-1])
+        return messages
+
+    def record(self, student_id: int, persona: str, message: str, reply: str):
+        """Append a completed exchange and push overflow out of the session."""
+        session = self._session(student_id, persona)
+        for m in ({"role": "user", "content": _IMAGE.sub("[image]", message)}, {"role": "assistant", "content": reply}):
+            session.turns.append(m)
+            session.lifetime_tokens += message_tokens(m)
+        session.updated = time.monotonic()
+        head = [{"role": "system", "content": session.system}] if session.system else []
+        _, dropped = fit_to_budget(head + session.turns, self.token_budget)
+        if dropped:
+            overflow, session.turns = session.turns[:dropped], session.turns[dropped:]
+            self.counters["turns_dropped"] += dropped
+            if self.summarize is not None:
+                self._fold(session, overflow)
+
+    def _fold(self, session: _Session, overflow: List[Message]):
+        async def run():
+            try:
+                session.summary = (await self.summarize(session.summary, overflow)).strip()
+                self.counters["summaries"] += 1
+            except Exception as e:
+                logger.warning(f"Conversation summary failed: {e}")
+            finally:
+                session.summarizing = False
+
+        if session.summarizing:
+            return  # one fold at a time; a busy summarizer just loses these turns
+        session.summarizing = True
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def note_legacy_request(self, history: List[Message], sent: List[Message]):
+        self.counters["request_bytes"] += sum(len(str(m.get("content") or "").encode("utf-8")) for m in history)
+        self.counters["prompt_tokens_sent"] += sum(message_tokens(m) for m in sent)
+        self.counters["prompt_tokens_full_history"] += sum(message_tokens(m) for m in history)
+        self.counters["turns"] += 1
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        turns = self.counters["turns"] or 1
+        return {
+            **self.counters,
+            "sessions": len(self._sessions),
+            "token_budget": self.token_budget,
+            "avg_request_bytes": round(self.counters["request_bytes"] / turns, 1),
+            "avg_prompt_tokens_sent": round(self.counters["prompt_tokens_sent"] / turns, 1),
+            "avg_prompt_tokens_full_history": round(self.counters["prompt_tokens_full_history"] / turns, 1),
+            "tokenizer": "tiktoken" if _encoding else "estimate",
+        }
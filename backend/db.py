@@ -0,0 +1,160 @@
+# DreamARC Backend - pooled SQLite access
+"""Run SQLite work off the event loop.
+
+Readers share a bounded thread pool; every reader thread keeps one
+long-lived connection that is configured once when it is opened.  All
+writes go through a single writer connection on its own thread, so write
+paths are serialized without readers ever queuing behind the write lock
+(WAL lets readers see the last committed snapshot).
+
+An optional ``observer(kind, label, wait, run)`` is called on the event
+loop after each job with its queue wait and run time in seconds; the
+label is the job function's name, or ``"<verb> <table>"`` for the
+``fetchone``/``fetchall``/``execute`` helpers.
+
+``synchronous`` is SQLite's durability setting and defaults to ``FULL``,
+so a committed write survives power loss.  ``NORMAL`` is faster under WAL
+but a crash of the machine (not just the process) can roll back the last
+commits; only choose it where that is acceptable.
+"""
+import asyncio
+import functools
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def _synchronous(mode: str) -> str:
+    if mode.upper() not in SYNCHRONOUS_MODES:
+        raise ValueError(f"synchronous must be one of {', '.join(SYNCHRONOUS_MODES)}, not {mode!r}")
+    return mode.upper()
+
+
+def configure_connection(conn: sqlite3.Connection, synchronous: str = "FULL") -> sqlite3.Connection:
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={_synchronous(synchronous)}")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+@functools.lru_cache(maxsize=512)
+def sql_label(sql: str) -> str:
+    verb = sql.split(None, 1)[0].lower() if sql.strip() else "sql"
+    table = re.search(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+(\w+)", sql, re.IGNORECASE)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+def _statement(sql: str, run: Callable) -> Callable:
+    def statement(db, params):
+        return run(db.execute(sql, params))
+    statement.__name__ = sql_label(sql)
+    return statement
+
+
+def _timed(runner: Callable, fn: Callable, args: Sequence[Any], timing: List[float]):
+    timing[0] = time.perf_counter()
+    try:
+        return runner(fn, args)
+    finally:
+        timing[1] = time.perf_counter()
+
+
+class DBPool:
+    def __init__(self, path: str, readers: int = 4, timeout: float = 30,
+                 observer: Optional[Callable[[str, str, float, float], None]] = None, synchronous: str = "FULL"):
+        self.path = path
+        self.timeout = timeout
+        self.synchronous = _synchronous(synchronous)
+        self.readers = max(1, readers)
+        self.observer = observer
+        self.pending: Dict[str, int] = {"read": 0, "write": 0}
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        self._local = threading.local()
+        self._readers = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="db-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.timeout)
+        configure_connection(conn, self.synchronous)
+        with self._conns_lock:
+            self._conns.append(conn)
+        return conn
+
+    def _thread_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _run_read(self, fn: Callable, args: Sequence[Any]):
+        return fn(self._thread_conn(), *args)
+
+    def _run_write(self, fn: Callable, args: Sequence[Any]):
+        conn = self._thread_conn()
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            return result
+        except BaseException:
+            conn.rollback()
+            raise
+
+    async def _submit(self, kind: str, executor: ThreadPoolExecutor, runner: Callable, fn: Callable, args: Sequence[Any]):
+        loop = asyncio.get_running_loop()
+        self.pending[kind] += 1
+        try:
+            if self.observer is None:
+                return await loop.run_in_executor(executor, runner, fn, args)
+            submitted = time.perf_counter()
+            timing = [submitted, submitted]
+            try:
+                return await loop.run_in_executor(executor, _timed, runner, fn, args, timing)
+            finally:
+                self.observer(kind, getattr(fn, "__name__", "query"), timing[0] - submitted, timing[1] - timing[0])
+        finally:
+            self.pending[kind] -= 1
+
+    async def read(self, fn: Callable, *args):
+        """Run ``fn(conn, *args)`` on a pooled reader connection."""
+        return await self._submit("read", self._readers, self._run_read, fn, args)
+
+    async def write(self, fn: Callable, *args):
+        """Run ``fn(conn, *args)`` in one transaction on the writer connection."""
+        return await self._submit("write", self._writer, self._run_write, fn, args)
+
+    async def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[sqlite3.Row]:
+        return await self.read(_statement(sql, lambda cur: cur.fetchone()), params)
+
+    async def fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        return await self.read(_statement(sql, lambda cur: cur.fetchall()), params)
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        """Run one write statement and return ``lastrowid``."""
+        return await self.write(_statement(sql, lambda cur: cur.lastrowid), params)
+
+    def close(self):
+        """Close every pooled connection; the pool reopens lazily on next use."""
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        with self._conns_lock:
+            for conn in self._conns:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    logger.exception("Failed to close pooled connection")
+            self._conns.clear()
+        self._open()
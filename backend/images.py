@@ -0,0 +1,132 @@
+# DreamARC Backend - image intake for the Samie vision path
+"""Worksheet photos, bounded before they go upstream.
+
+``ImageIntake.digest`` reads a multipart upload in chunks (Starlette has
+already spooled it to disk past 1 MB), hashes it and sniffs its type
+without holding the whole file in memory, refusing anything over
+``max_bytes``.  The SHA-256 of the original bytes is the dedupe key, so a
+re-sent photo of the same worksheet can hit the analysis cache before any
+decoding happens.
+
+``ImageIntake.shrink`` re-encodes to JPEG with the long side capped at
+``max_side``.  It needs Pillow; without it, files already under
+``passthrough_bytes`` are forwarded as they are and larger ones refused.
+"""
+import base64
+import hashlib
+import io
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+CHUNK = 64 * 1024
+MAX_PIXELS = 40_000_000
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+class ImageRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff(head: bytes) -> Optional[str]:
+    for magic, mime in _SIGNATURES:
+        if head.startswith(magic):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def data_url(data: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+class ImageIntake:
+    def __init__(self, max_bytes: int = 12 * 1024 * 1024, max_side: int = 1568, quality: int = 85,
+                 passthrough_bytes: int = 1536 * 1024):
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+        self.quality = quality
+        self.passthrough_bytes = passthrough_bytes
+        self.uploads = 0
+        self.bytes_in = 0
+        self.encoded = 0
+        self.bytes_out = 0
+
+    async def digest(self, upload: Any) -> Tuple[str, str, int]:
+        """``(sha256 hex, mime, size)`` of an ``UploadFile``; rewinds it afterwards."""
+        h = hashlib.sha256()
+        size = 0
+        mime = None
+        while True:
+            chunk = await upload.read(CHUNK)
+            if not chunk:
+                break
+            if mime is None:
+                mime = sniff(chunk[:16])
+                if mime is None:
+                    raise ImageRejected(415, "Unsupported image type")
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise ImageRejected(413, "Image larger than the upload limit")
+            h.update(chunk)
+        if mime is None:
+            raise ImageRejected(400, "Empty upload")
+        await upload.seek(0)
+        self.uploads += 1
+        self.bytes_in += size
+        return h.hexdigest(), mime, size
+
+    def shrink(self, fileobj: BinaryIO, mime: str, size: int) -> Tuple[bytes, str]:
+        """Bounded JPEG for upstream (blocking; run it off the event loop)."""
+        if Image is None:
+            if size > self.passthrough_bytes:
+                raise ImageRejected(413, "Image too large to forward without downscaling")
+            data = fileobj.read()
+        else:
+            try:
+                im = Image.open(fileobj)
+                if im.width * im.height > MAX_PIXELS:
+                    raise ImageRejected(413, "Image has too many pixels")
+                # JPEG can decode straight to a smaller scale, skipping most of the IDCT work.
+                im.draft("RGB", (self.max_side, self.max_side))
+                im = ImageOps.exif_transpose(im)
+                im.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+                if im.mode in ("RGBA", "LA", "P"):
+                    im = im.convert("RGBA")
+                    canvas = Image.new("RGB", im.size, "white")
+                    canvas.paste(im, mask=im.getchannel("A"))
+                    im = canvas
+                elif im.mode != "RGB":
+                    im = im.convert("RGB")
+                out = io.BytesIO()
+                im.save(out, "JPEG", quality=self.quality, optimize=True)
+            except ImageRejected:
+                raise
+            except Exception as e:
+                raise ImageRejected(400, f"Unreadable image: {e}")
+            data, mime = out.getvalue(), "image/jpeg"
+        self.encoded += 1
+        self.bytes_out += len(data)
+        return data, mime
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pillow": Image is not None,
+            "max_side": self.max_side,
+            "uploads": self.uploads,
+            "bytes_in": self.bytes_in,
+            "encoded": self.encoded,
+            "bytes_out": self.bytes_out,
+        }
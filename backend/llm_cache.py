@@ -0,0 +1,163 @@
+# DreamARC Backend - LLM response cache + single-flight
+"""Share identical tutor replies across students.
+
+Responses are keyed by a canonical hash of the call (persona, model,
+system prompt and the trailing ``history_turns`` messages), kept for
+``ttl`` seconds in an LRU of ``max_entries``.  Concurrent misses for the
+same key wait on the first caller's upstream request instead of issuing
+their own.
+
+The shared upstream request runs as its own task, so the caller that
+started it can go away (a client disconnect) without cancelling it for the
+others; the reply still lands in the cache.  Streamed calls go through
+``join_stream``: every reader replays the pieces received so far and then
+follows the live stream.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class Flight:
+    """One upstream call in progress; ``pieces`` is a list only for streamed calls."""
+
+    def __init__(self, streamed: bool):
+        self.task: Optional[asyncio.Task] = None
+        self.pieces: Optional[List[str]] = [] if streamed else None
+        self._changed = asyncio.Event()
+
+    def push(self, piece: str):
+        self.pieces.append(piece)
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self) -> AsyncIterator[str]:
+        """Every piece from the first, until the stream ends; then await ``result``."""
+        i = 0
+        while True:
+            changed = self._changed
+            while i < len(self.pieces):
+                yield self.pieces[i]
+                i += 1
+            if self.task.done():
+                return
+            await changed.wait()
+
+    async def result(self) -> str:
+        # shield: a reader going away must not cancel the shared call
+        return await asyncio.shield(self.task)
+
+
+class LLMResponseCache:
+    def __init__(self, ttl: float = 60.0, max_entries: int = 512, history_turns: int = 4):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.history_turns = history_turns
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, Flight] = {}
+
+    def key(self, persona: str, model: str, messages: List[Dict[str, Any]], **extra) -> str:
+        system = [m.get("content") for m in messages if m.get("role") == "system"]
+        turns = [m for m in messages if m.get("role") != "system"][-self.history_turns:]
+        canonical = json.dumps(
+            {"persona": persona, "model": model, "system": system, "turns": turns, "extra": extra},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: str):
+        if not value:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_call(self, key: str, call: Callable[[], Awaitable[str]]) -> str:
+        """The cached reply for ``key``, joining or starting the upstream call.
+
+        ``call`` runs synchronously in the caller that starts the flight, so
+        an admission check it makes before returning its awaitable (a 429 for
+        that caller's student) fails that caller alone and starts no flight.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            flight = self._start(key, lambda _: call(), streamed=False)
+        return await flight.result()
+
+    def join_stream(self, key: str, stream: Callable[[], AsyncIterator[str]], finalize: Callable[[str], str]) -> Tuple[Flight, bool]:
+        """The in-flight call for ``key``, starting ``stream`` if there is none; returns ``(flight, started)``.
+
+        The flight's result is ``finalize`` of the concatenated pieces.  A
+        flight joined from ``get_or_call`` has no pieces, only a result.
+        """
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            return flight, False
+        self.misses += 1
+
+        async def relay(flight: Flight) -> str:
+            raw = ""
+            async for piece in stream():
+                raw += piece
+                flight.push(piece)
+            return finalize(raw)
+
+        return self._start(key, relay, streamed=True), True
+
+    def _start(self, key: str, run: Callable[[Flight], Awaitable[str]], streamed: bool) -> Flight:
+        flight = Flight(streamed)
+        flight.task = asyncio.get_running_loop().create_task(run(flight))
+        self._inflight[key] = flight
+        flight.task.add_done_callback(lambda task: self._landed(key, flight, task))
+        return flight
+
+    def _landed(self, key: str, flight: Flight, task: asyncio.Task):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        flight._wake()
+        # Reading the exception also keeps asyncio from warning when nobody awaited it.
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result())
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_saved_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,267 @@
+# DreamARC Backend - upstream LLM dispatch
+"""Admission control for every call to the LLM provider.
+
+Calls hold one of ``max_concurrency`` global slots while they run.  When all
+slots are busy, callers wait in a priority queue (``INTERACTIVE`` before
+``BACKGROUND``, FIFO within a class) until a slot frees or their deadline
+passes.  Admission is decided up front and rejects fast:
+
+    429  the student already has ``per_student`` calls queued or running
+    503  the queue for that priority class is full, or the circuit is open
+    504  the deadline passed while queued or while the upstream call ran
+
+The circuit opens after ``breaker_failures`` consecutive upstream failures
+(errors or timeouts) and rejects everything for ``breaker_cooldown`` seconds;
+after that one trial call decides whether it closes again.
+
+Tickets reserved but not yet started (a stream whose body has not begun)
+count against the queue limit too, since each will want a slot shortly.
+Whoever reserves a ticket releases it; nothing is left to a finalizer.
+
+No database work happens under a slot: callers finish their reads before
+asking for one, so a slow provider never pins pooled connections.
+
+An optional ``observer(priority, outcome, wait, seconds)`` hears about
+every admitted call once it finishes: ``outcome`` is ``ok``, ``error``
+or ``timeout``, ``wait`` the time spent queued for a slot and ``seconds``
+the time spent upstream.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+INTERACTIVE = 0
+BACKGROUND = 1
+_CLASS_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class LLMUnavailable(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One admitted call; release is idempotent."""
+
+    __slots__ = ("dispatcher", "priority", "student_id", "deadline", "trial", "started", "running", "released", "waiter")
+
+    def __init__(self, dispatcher: "LLMDispatcher", priority: int, student_id: Optional[int], deadline: float, trial: bool):
+        self.dispatcher = dispatcher
+        self.priority = priority
+        self.student_id = student_id
+        self.deadline = deadline
+        self.trial = trial
+        self.started = False
+        self.running = False
+        self.released = False
+        self.waiter: Optional[asyncio.Future] = None
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    async def __aenter__(self) -> "Ticket":
+        await self.dispatcher._acquire(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.dispatcher._release(self)
+
+
+class LLMDispatcher:
+    def __init__(self, max_concurrency: int = 16, per_student: int = 2, max_queue: int = 64,
+                 breaker_failures: int = 5, breaker_cooldown: float = 30.0,
+                 observer: Optional[Callable[[int, str, float, float], None]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.observer = observer
+        self.per_student = per_student
+        # Background work sheds first: it gets a quarter of the queue.
+        self.queue_limits = {INTERACTIVE: max_queue, BACKGROUND: max(1, max_queue // 4)}
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.counters: Dict[str, int] = {"admitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "rejected_429": 0, "rejected_503": 0}
+        self._running = 0
+        self._queued: Dict[int, int] = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._reserved: Dict[int, int] = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._per_student: Dict[int, int] = {}
+        self._heap: List[Tuple[int, int, Ticket]] = []
+        self._seq = itertools.count()
+        self._failures = 0
+        self._open_until = 0.0
+        self._trial_inflight = False
+
+    # --- admission -------------------------------------------------------
+    def reserve(self, priority: int = INTERACTIVE, student_id: Optional[int] = None, timeout: float = 60.0) -> Ticket:
+        """Admit a call or raise ``LLMUnavailable`` without waiting."""
+        trial = False
+        if self._failures >= self.breaker_failures:
+            wait = self._open_until - time.monotonic()
+            if wait > 0 or self._trial_inflight:
+                self.counters["rejected_503"] += 1
+                raise LLMUnavailable(503, "AI provider unavailable, retry shortly", max(1, int(wait) + 1))
+            trial = self._trial_inflight = True
+        if student_id is not None and self._per_student.get(student_id, 0) >= self.per_student:
+            self._reject_trial(trial)
+            self.counters["rejected_429"] += 1
+            raise LLMUnavailable(429, "Too many AI requests in flight for this student", 1)
+        # Everything admitted but not running will queue once the free slots are taken.
+        waiting = self._queued[priority] + self._reserved[priority] - max(0, self.max_concurrency - self._running)
+        if waiting >= self.queue_limits[priority]:
+            self._reject_trial(trial)
+            self.counters["rejected_503"] += 1
+            raise LLMUnavailable(503, "AI is busy, retry shortly", 2)
+        if student_id is not None:
+            self._per_student[student_id] = self._per_student.get(student_id, 0) + 1
+        self.counters["admitted"] += 1
+        self._reserved[priority] += 1
+        return Ticket(self, priority, student_id, time.monotonic() + timeout, trial)
+
+    def _reject_trial(self, trial: bool):
+        if trial:
+            self._trial_inflight = False
+
+    def _start(self, ticket: Ticket):
+        if not ticket.started:
+            ticket.started = True
+            self._reserved[ticket.priority] -= 1
+
+    async def _acquire(self, ticket: Ticket):
+        self._start(ticket)
+        if self._running < self.max_concurrency and not any(self._queued.values()):
+            self._running += 1
+            ticket.running = True
+            return
+        ticket.waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (ticket.priority, next(self._seq), ticket))
+        self._queued[ticket.priority] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.waiter), timeout=max(ticket.remaining(), 0))
+        except asyncio.TimeoutError:
+            if ticket.running:
+                return
+            self._abandon(ticket)
+            self.counters["timeouts"] += 1
+            raise LLMUnavailable(504, "AI request timed out while queued")
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    def _abandon(self, ticket: Ticket):
+        if not ticket.running:
+            # Still in the heap; its entry is skipped when popped.
+            ticket.waiter.cancel()
+            self._queued[ticket.priority] -= 1
+        ticket.release()
+
+    def _release(self, ticket: Ticket):
+        self._start(ticket)
+        if ticket.running:
+            ticket.running = False
+            self._running -= 1
+        if ticket.student_id is not None:
+            left = self._per_student.get(ticket.student_id, 1) - 1
+            if left > 0:
+                self._per_student[ticket.student_id] = left
+            else:
+                self._per_student.pop(ticket.student_id, None)
+        if ticket.trial:
+            self._trial_inflight = False
+        while self._heap and self._running < self.max_concurrency:
+            _, _, nxt = heapq.heappop(self._heap)
+            if nxt.waiter.done():
+                continue
+            self._queued[nxt.priority] -= 1
+            self._running += 1
+            nxt.running = True
+            nxt.waiter.set_result(None)
+
+    def _observe(self, ticket: Ticket, outcome: str, queued: float, started: float):
+        if self.observer is not None:
+            self.observer(ticket.priority, outcome, started - queued, time.monotonic() - started)
+
+    def _record(self, ok: bool):
+        if ok:
+            self._failures = 0
+            self.counters["completed"] += 1
+            return
+        self._failures += 1
+        self.counters["failed"] += 1
+        if self._failures >= self.breaker_failures:
+            self._open_until = time.monotonic() + self.breaker_cooldown
+
+    # --- calls -----------------------------------------------------------
+    async def call(self, fn: Callable[[], Awaitable[Any]], priority: int = INTERACTIVE, student_id: Optional[int] = None,
+                   timeout: float = 60.0, ticket: Optional[Ticket] = None) -> Any:
+        ticket = ticket or self.reserve(priority, student_id, timeout)
+        queued = time.monotonic()
+        async with ticket:
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(fn(), timeout=max(ticket.remaining(), 0.001))
+            except asyncio.TimeoutError:
+                self.counters["timeouts"] += 1
+                self._record(False)
+                self._observe(ticket, "timeout", queued, started)
+                raise LLMUnavailable(504, "AI request timed out")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._record(False)
+                self._observe(ticket, "error", queued, started)
+                raise
+            self._record(True)
+            self._observe(ticket, "ok", queued, started)
+            return result
+
+    async def stream(self, ticket: Ticket, chunks: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """Relay ``chunks`` under ``ticket``'s slot; the deadline covers the whole stream."""
+        queued = time.monotonic()
+        async with ticket:
+            started = time.monotonic()
+            iterator = chunks.__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), timeout=max(ticket.remaining(), 0.001))
+                    except StopAsyncIteration:
+                        break
+                    yield chunk
+            except asyncio.TimeoutError:
+                self.counters["timeouts"] += 1
+                self._record(False)
+                self._observe(ticket, "timeout", queued, started)
+                raise LLMUnavailable(504, "AI request timed out")
+            except (asyncio.CancelledError, GeneratorExit):
+                raise
+            except Exception:
+                self._record(False)
+                self._observe(ticket, "error", queued, started)
+                raise
+            finally:
+                aclose = getattr(iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+            self._record(True)
+            self._observe(ticket, "ok", queued, started)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            **self.counters,
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "queued": {_CLASS_NAMES[p]: n for p, n in self._queued.items()},
+            "reserved": {_CLASS_NAMES[p]: n for p, n in self._reserved.items()},
+            "students_in_flight": len(self._per_student),
+            "circuit": "open" if self._failures >= self.breaker_failures and now < self._open_until
+                       else "half-open" if self._failures >= self.breaker_failures else "closed",
+        }
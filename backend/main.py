@@ -1,28 +1,52 @@
 # DreamARC Backend - v8.9 Fixed (584 lines, synced from Lovable)
+import time
+_IMPORT_STARTED = time.perf_counter()  # cold-start clock; see boot_timings
+
+import asyncio
+import base64
+import importlib
+import importlib.util
 import logging
 import os
 import json
 import sqlite3
 import re
+import threading
 from pathlib import Path
 from datetime import date
 from typing import List, Optional, Dict, Any
 
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request
+from fastapi import FastAPI, APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from passlib.context import CryptContext
-from jose import jwt
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
-import requests
 
-# OpenAI Import
-try:
-    from openai import AsyncOpenAI
-except ImportError:
-    AsyncOpenAI = None
+from . import cohort
+from .answers import AnswerIndex, canonicalize, matches
+from .conversations import ConversationStore, fit_to_budget
+from .db import DBPool
+from .images import ImageIntake, ImageRejected, data_url
+from .llm_cache import LLMResponseCache
+from .llm_dispatch import BACKGROUND, INTERACTIVE, LLMDispatcher, LLMUnavailable
+from .mastery import apply_attempts
+from .memory_cache import StudentMemory, StudentMemoryCache
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, LoopLagMonitor, MetricsMiddleware, Registry, TraceBuffer, span
+from .migrations import LATEST_VERSION, get_meta, migrate, set_meta
+from .monster_factory import DIFFICULTIES, FakeMonsterLLM, MonsterFactory, consume_pool_rows, difficulty_for
+from .passwords import HasherBusy, PasswordHasher, make_crypt_context
+from .pubsub import PubSubHub
+from .review_queue import ReviewQueue, load_topics
+from . import rmsq, waterfall
+from .tts import AudioCache, TTSClient, TTSError
+from .versions import StudentVersions
+from .write_behind import WriteBehindQueue
+
+# The OpenAI SDK is imported on first use (or by the post-boot warm-up); on
+# its own it is most of this module's import time.
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
 
 # =========================================
 # --- 1. SETUP ---
@@ -38,13 +62,158 @@ SECRET_KEY = os.getenv("SECRET_KEY", "dreamarc_secret_key_change_this")
 ALGORITHM = "HS256"
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", str(BASE_DIR / "tts_cache"))
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "200"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "0")) or None
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "0")) or None
+PASSWORD_MAX_WAIT_SECONDS = float(os.getenv("PASSWORD_MAX_WAIT_SECONDS", "10"))
+PASSWORD_REHASH_ON_LOGIN = os.getenv("PASSWORD_REHASH_ON_LOGIN", "1") == "1"
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "2048"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"
+LLM_CACHE_WITH_MEMORY = os.getenv("LLM_CACHE_WITH_MEMORY", "0") == "1"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "60"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_HISTORY_TURNS = int(os.getenv("LLM_CACHE_HISTORY_TURNS", "4"))
+VISION_MAX_UPLOAD_MB = int(os.getenv("VISION_MAX_UPLOAD_MB", "12"))
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "1568"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+VISION_CACHE_TTL = float(os.getenv("VISION_CACHE_TTL", "86400"))
+VISION_CACHE_SIZE = int(os.getenv("VISION_CACHE_SIZE", "256"))
+WRITE_BEHIND_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_INTERVAL_MS", "50"))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "200"))
+WATERFALL_WINDOW = int(os.getenv("WATERFALL_WINDOW", "100"))
+RMSQ_SERIES_POINTS = int(os.getenv("RMSQ_SERIES_POINTS", str(rmsq.SERIES_POINTS)))
+REVIEW_QUEUE_STUDENTS = int(os.getenv("REVIEW_QUEUE_STUDENTS", "4096"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_PER_STUDENT = int(os.getenv("LLM_PER_STUDENT", "2"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "45"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "3000"))
+CONVERSATION_SUMMARIZE = os.getenv("CONVERSATION_SUMMARIZE", "0") == "1"
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "4096"))
+MONSTER_FAKE_LLM = os.getenv("MONSTER_FAKE_LLM", "0") == "1"
+MONSTER_POOL_SIZE = int(os.getenv("MONSTER_POOL_SIZE", "12"))
+MONSTER_LOW_WATER = int(os.getenv("MONSTER_LOW_WATER", "4"))
+MONSTER_CALLS_PER_MIN = float(os.getenv("MONSTER_CALLS_PER_MIN", "20"))
+MONSTERS_PER_SEED = 3
+PAGE_LIMIT_MAX = 200
+SSE_KEEPALIVE_SECONDS = 15
+OVERVIEW_PAGE_SIZE = 50
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+# FULL keeps every acknowledged write across a power cut; NORMAL trades the last few commits for speed.
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "FULL")
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+SLOW_TRACE_SAMPLE = float(os.getenv("SLOW_TRACE_SAMPLE", "1.0"))
+
+class _LazyOpenAI:
+    """Stands in for ``AsyncOpenAI`` and builds the real client on first attribute access."""
+
+    def __init__(self, api_key: str):
+        self._api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import AsyncOpenAI
+
+                    self._client = AsyncOpenAI(api_key=self._api_key)
+                    logger.info(f"✅ OpenAI Client Initialized (Model: {LLM_MODEL})")
+        return self._client
+
+    async def ready(self):
+        """``load`` off the event loop, so a request never waits on the import or the lock."""
+        if self._client is None:
+            await asyncio.to_thread(self.load)
+        return self._client
+
+    @property
+    def available(self) -> bool:
+        """Whether the real client is built; asking never builds it."""
+        return self._client is not None
+
+    @property
+    def has_responses(self) -> bool:
+        # Older SDKs have no Responses API (vision); answers False until loaded.
+        return self.available and hasattr(self._client, "responses")
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
 
 openai_client = None
-if AsyncOpenAI:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if api_key:
-        openai_client = AsyncOpenAI(api_key=api_key)
-        logger.info(f"✅ OpenAI Client Initialized (Model: {LLM_MODEL})")
+if OPENAI_AVAILABLE and os.getenv("OPENAI_API_KEY"):
+    openai_client = _LazyOpenAI(os.getenv("OPENAI_API_KEY"))
+
+# Served on /metrics; the observers below feed it from the hot paths.
+metrics_registry = Registry()
+slow_traces = TraceBuffer(SLOW_REQUEST_SECONDS, SLOW_TRACE_SAMPLE) if METRICS_ENABLED and SLOW_TRACE_SAMPLE > 0 else None
+loop_lag = LoopLagMonitor(metrics_registry)
+sql_seconds = metrics_registry.histogram("db_query_seconds", "SQLite job run time by pool and statement label", ("pool", "label"))
+sql_wait = metrics_registry.histogram("db_queue_wait_seconds", "Time a SQLite job waited for a pool thread", ("pool",))
+llm_seconds = metrics_registry.histogram("llm_upstream_seconds", "Upstream LLM call time by priority and outcome", ("priority", "outcome"),
+                                         buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0))
+llm_wait = metrics_registry.histogram("llm_queue_wait_seconds", "Time an admitted LLM call waited for a slot", ("priority",))
+llm_tokens = metrics_registry.counter("llm_tokens_total", "LLM tokens reported by the provider", ("call", "kind"))
+tts_seconds = metrics_registry.histogram("tts_upstream_seconds", "ElevenLabs time to first byte and to the last byte", ("phase",))
+tts_requests = metrics_registry.counter("tts_requests_total", "TTS requests by audio cache result", ("cache",))
+tts_bytes = metrics_registry.counter("tts_audio_bytes_total", "Audio bytes relayed from ElevenLabs")
+tutor_errors = metrics_registry.counter("tutor_errors_total", "Tutor turns answered with the fallback reply", ("persona",))
+
+
+def _observe_sql(pool: str, label: str, wait: float, run: float):
+    sql_seconds.observe(pool, label, value=run)
+    sql_wait.observe(pool, value=wait)
+    span(f"sql {label}", run, wait)
+
+
+def _observe_llm(priority: int, outcome: str, wait: float, seconds: float):
+    name = "interactive" if priority == INTERACTIVE else "background"
+    llm_seconds.observe(name, outcome, value=seconds)
+    llm_wait.observe(name, value=wait)
+    span(f"llm {name} {outcome}", seconds, wait)
+
+
+def _record_usage(call: str, usage):
+    if usage is None:
+        return
+    # Chat completions say prompt/completion, the responses API says input/output.
+    llm_tokens.inc(call, "prompt", amount=getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", None) or 0)
+    llm_tokens.inc(call, "completion", amount=getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", None) or 0)
+
+
+# Every upstream LLM call is admitted here: concurrency budgets, priorities, deadlines, breaker.
+llm_dispatch = LLMDispatcher(
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    per_student=LLM_PER_STUDENT,
+    max_queue=LLM_MAX_QUEUE,
+    breaker_failures=LLM_BREAKER_FAILURES,
+    breaker_cooldown=LLM_BREAKER_COOLDOWN,
+    observer=_observe_llm if METRICS_ENABLED else None,
+)
+
+# Server-side tutor sessions, so clients stop re-uploading the whole history.
+conversation_store = ConversationStore(
+    token_budget=CONVERSATION_TOKEN_BUDGET,
+    max_sessions=CONVERSATION_MAX_SESSIONS,
+    summarize=(lambda summary, turns: _summarize_turns(summary, turns)) if CONVERSATION_SUMMARIZE else None,
+)
+
+# Background question writer; the fake keeps the arena stocked when offline.
+monster_factory = MonsterFactory(
+    openai_client or (FakeMonsterLLM() if MONSTER_FAKE_LLM else None),
+    LLM_MODEL,
+    pool_size=MONSTER_POOL_SIZE,
+    low_water=MONSTER_LOW_WATER,
+    calls_per_minute=MONSTER_CALLS_PER_MIN,
+    dispatcher=llm_dispatch,
+)
 
 app = FastAPI(title="DreamARC", version="8.9 Fixed-Login")
 
@@ -52,6 +221,33 @@ app = FastAPI(title="DreamARC", version="8.9 Fixed-Login")
 def health():
     return {"status": "ok"}
 
+@app.get("/health/boot")
+def health_boot():
+    """Seconds spent importing, in startup and until the first response, measured from process import."""
+    return boot_timings
+
+@app.get("/metrics")
+def metrics():
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/metrics/slow-requests")
+def slow_requests():
+    """Sampled traces of recent requests slower than SLOW_REQUEST_SECONDS, newest first."""
+    return {
+        "threshold_seconds": SLOW_REQUEST_SECONDS,
+        "sample_rate": SLOW_TRACE_SAMPLE if slow_traces else 0.0,
+        "traces": slow_traces.recent() if slow_traces else [],
+    }
+
+@app.exception_handler(HasherBusy)
+async def hasher_busy_handler(request: Request, exc: HasherBusy):
+    return JSONResponse({"detail": "Server busy, retry shortly"}, status_code=503, headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(LLMUnavailable)
+async def llm_unavailable_handler(request: Request, exc: LLMUnavailable):
+    headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=headers)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -59,55 +255,132 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, registry=metrics_registry, traces=slow_traces)
+
+
+class _BootClock:
+    """Records how long after import the first HTTP response started, then gets out of the way."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "first_request_s" in boot_timings:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and "first_request_s" not in boot_timings:
+                boot_timings["first_request_s"] = round(time.perf_counter() - _IMPORT_STARTED, 4)
+                logger.info(f"⏱️ First response {boot_timings['first_request_s']}s after import")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+app.add_middleware(_BootClock)
 
 api = APIRouter(prefix="/api")
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Request-path hashing runs on a process pool.
+password_hasher = PasswordHasher(PASSWORD_WORKERS, PASSWORD_MAX_PENDING, PASSWORD_MAX_WAIT_SECONDS, rehash_on_login=PASSWORD_REHASH_ON_LOGIN)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
 # ==========================================
 # --- 2. DATABASE UTILITIES ---
 # ==========================================
-def get_db():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=30)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    try:
-        yield conn
-    finally:
-        conn.close()
+# Long-lived pooled connections; routes await db_pool.read/write instead of
+# running sqlite3 on the event loop.
+db_pool = DBPool(DB_PATH, readers=DB_POOL_SIZE, observer=_observe_sql if METRICS_ENABLED else None, synchronous=DB_SYNCHRONOUS)
+# Append-only event inserts are group-committed by a background task.
+event_writer = WriteBehindQueue(db_pool, WRITE_BEHIND_INTERVAL_MS, WRITE_BEHIND_MAX_BATCH)
+
+memory_cache = StudentMemoryCache(MEMORY_CACHE_SIZE)
+gc_hub = PubSubHub()
+review_queue = ReviewQueue(max_students=REVIEW_QUEUE_STUDENTS)
+# Canonical answers of live monsters; an attack never reads the answer from the DB.
+answer_index = AnswerIndex()
+# Cohort snapshot, dropped on any write to mastery, PQ, monster or student rows.
+cohort_cache = cohort.CohortCache()
+cohort_load_lock = asyncio.Lock()
+# Bumped after every committed write that changes a student's pages (ETag source).
+student_versions = StudentVersions()
+llm_cache = LLMResponseCache(LLM_CACHE_TTL, LLM_CACHE_SIZE, LLM_CACHE_HISTORY_TURNS)
+# Photo analyses keyed by the upload's content hash; no memory goes into them, so always on.
+vision_cache = LLMResponseCache(VISION_CACHE_TTL, VISION_CACHE_SIZE)
+image_intake = ImageIntake(VISION_MAX_UPLOAD_MB * 1024 * 1024, VISION_MAX_SIDE, VISION_JPEG_QUALITY)
+
+tts_client = TTSClient(ELEVENLABS_BASE_URL, ELEVENLABS_API_KEY, AudioCache(TTS_CACHE_DIR, TTS_CACHE_MAX_MB * 1024 * 1024))
+
+# Saturation gauges read the components' own counters at scrape time.
+_CACHES = (("memory", memory_cache), ("llm", llm_cache), ("vision", vision_cache), ("answers", answer_index),
+           ("review", review_queue), ("tts_audio", tts_client.cache))
+metrics_registry.collect("db_pool_pending", "SQLite jobs queued or running", lambda: [({"pool": k}, v) for k, v in db_pool.pending.items()])
+metrics_registry.collect("db_pool_threads", "SQLite pool threads", lambda: [({"pool": "read"}, db_pool.readers), ({"pool": "write"}, 1)])
+metrics_registry.collect("password_hasher_pending", "Password hashes queued or running", lambda: [({}, password_hasher.pending)])
+metrics_registry.collect("password_hasher_max_pending", "Password hashes allowed before 503", lambda: [({}, password_hasher.max_pending)])
+metrics_registry.collect("password_hasher_rejected_total", "Password hashes shed with 503, by reason",
+                         lambda: [({"reason": "queue_full"}, password_hasher.rejected - password_hasher.timed_out), ({"reason": "deadline"}, password_hasher.timed_out)], kind="counter")
+metrics_registry.collect("llm_dispatch_running", "LLM calls holding a slot", lambda: [({}, llm_dispatch.stats()["running"])])
+metrics_registry.collect("llm_dispatch_slots", "LLM concurrency slots", lambda: [({}, llm_dispatch.max_concurrency)])
+metrics_registry.collect("llm_dispatch_queued", "LLM calls waiting for a slot", lambda: [({"priority": p}, n) for p, n in llm_dispatch.stats()["queued"].items()])
+metrics_registry.collect("llm_dispatch_events_total", "LLM admissions, completions, failures and rejections",
+                         lambda: [({"event": k}, v) for k, v in llm_dispatch.counters.items()], kind="counter")
+metrics_registry.collect("llm_circuit_open", "1 while the LLM circuit breaker is open or half-open",
+                         lambda: [({}, int(llm_dispatch.stats()["circuit"] != "closed"))])
+metrics_registry.collect("write_behind_pending", "Event rows waiting for the next group commit", lambda: [({}, event_writer.stats()["pending"])])
+metrics_registry.collect("sse_subscribers", "Open group-chat event streams", lambda: [({}, gc_hub.stats()["subscribers"])])
+metrics_registry.collect("cache_hits_total", "In-process cache hits", lambda: [({"cache": n}, c.hits) for n, c in _CACHES], kind="counter")
+metrics_registry.collect("app_boot_seconds", "Cold-start phases, from process import",
+                         lambda: [({"phase": k[:-2]}, v) for k, v in boot_timings.items() if k.endswith("_s")])
+metrics_registry.collect("cache_misses_total", "In-process cache misses", lambda: [({"cache": n}, c.misses) for n, c in _CACHES], kind="counter")
+
+# Bump SEED_VERSION whenever seed_default_users starts writing something new.
+SEED_VERSION = 1
+BOOT_FINGERPRINT = f"schema={LATEST_VERSION};seed={SEED_VERSION}"
+boot_timings: Dict[str, Any] = {}
 
 def setup_database():
     conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE, hashed_password TEXT, role TEXT DEFAULT 'student')")
-    cur.execute("CREATE TABLE IF NOT EXISTS students (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER UNIQUE, grade TEXT, FOREIGN KEY(user_id) REFERENCES users(id))")
-    cur.execute("CREATE TABLE IF NOT EXISTS pq_scores (id INTEGER PRIMARY KEY, student_id INTEGER, session_date DATE, homework INTEGER DEFAULT 0, attitude INTEGER DEFAULT 0, valid_question INTEGER DEFAULT 0, solving_question INTEGER DEFAULT 0, organization INTEGER DEFAULT 0, test_prep INTEGER DEFAULT 0, review INTEGER DEFAULT 0, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
-    cur.execute("CREATE TABLE IF NOT EXISTS tutoring_logs (id INTEGER PRIMARY KEY, student_id INTEGER, log_date DATE, log_content TEXT, duration_minutes INTEGER DEFAULT 0, tutor_name TEXT)")
-    cur.execute("CREATE TABLE IF NOT EXISTS topic_mastery (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, topic_name TEXT, lambda_val REAL DEFAULT 1.0, last_practiced_at DATETIME DEFAULT CURRENT_TIMESTAMP, consecutive_correct INTEGER DEFAULT 0)")
-    cur.execute("CREATE TABLE IF NOT EXISTS rmsq_weekly_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id TEXT NOT NULL, week_label TEXT, lambda_score REAL, rmsq_score INTEGER, context_note TEXT, recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
-    cur.execute("CREATE TABLE IF NOT EXISTS game_monsters (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, monster_name TEXT, monster_type TEXT, topic_name TEXT, question_text TEXT, correct_answer TEXT, hp_max INTEGER, hp_current INTEGER, xp_reward INTEGER, is_defeated BOOLEAN DEFAULT 0, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
-    cur.execute("CREATE TABLE IF NOT EXISTS diary_entries (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, entry_date DATE, content TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
-    cur.execute("CREATE TABLE IF NOT EXISTS pq_waterfall_state (student_id INTEGER, metric_name TEXT, history_json TEXT, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (student_id, metric_name))")
-    cur.execute("CREATE TABLE IF NOT EXISTS atoz_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, current_score INTEGER, future_score INTEGER, rms_plan TEXT, future_goal TEXT, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
-    cur.execute("CREATE TABLE IF NOT EXISTS gc_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, sender_id TEXT, sender_name TEXT, message_content TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
-    cur.execute("CREATE TABLE IF NOT EXISTS lambda_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, topic TEXT, lambda_val REAL, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)")
-    conn.commit()
-    conn.close()
+    try:
+        applied = migrate(conn)
+        if applied:
+            logger.info(f"🗄️ Applied schema migrations: {applied}")
+    finally:
+        conn.close()
 
 def seed_default_users():
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
-    hashed = pwd_context.hash("student01")
     if not cur.execute("SELECT id FROM users WHERE username = 'STUDENT01'").fetchone():
+        # Hash only when the row is actually written; pbkdf2 is the slow part of seeding.
+        hashed = make_crypt_context().hash("student01")
         cur.execute("INSERT INTO users (username, hashed_password, role) VALUES (?, ?, 'student')", ("STUDENT01", hashed))
         uid = cur.lastrowid
         cur.execute("INSERT INTO students (user_id, grade) VALUES (?, ?)", (uid, "9"))
         sid = cur.lastrowid
         cur.execute("INSERT INTO pq_scores (student_id, homework, attitude) VALUES (?, 9, 8)", (sid,))
-        cur.execute("INSERT INTO game_monsters (student_id, monster_name, monster_type, topic_name, question_text, correct_answer, hp_max, hp_current, xp_reward) VALUES (?, 'Exponent Dragon', 'BOSS', 'Math', 'Simplify 3^2 * 3^5', '3^7', 1500, 1500, 500)", (sid,))
+        cur.execute("INSERT INTO game_monsters (student_id, monster_name, monster_type, topic_name, question_text, correct_answer, answer_canonical, hp_max, hp_current, xp_reward) VALUES (?, 'Exponent Dragon', 'BOSS', 'Math', 'Simplify 3^2 * 3^5', '3^7', ?, 1500, 1500, 500)", (sid, canonicalize("3^7")))
     conn.commit()
     conn.close()
 
+def prepare_database() -> bool:
+    """Migrate and seed unless the database already carries this build's fingerprint; True when skipped."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        if get_meta(conn, "boot_fingerprint") == BOOT_FINGERPRINT:
+            return True
+    finally:
+        conn.close()
+    setup_database()
+    seed_default_users()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        set_meta(conn, "boot_fingerprint", BOOT_FINGERPRINT)
+        conn.commit()
+    finally:
+        conn.close()
+    return False
+
 # ==========================================
 # --- 3. MODELS & HELPERS ---
 # ==========================================
@@ -117,11 +390,16 @@ class UserCreate(BaseModel):
     grade: Optional[str] = None
 
 class LearningRequest(BaseModel):
-    history: List[Dict[str, Any]]
+    # Legacy clients upload the whole history; session clients send only
+    # ``message`` (plus ``system`` on the first turn) and the server keeps the rest.
+    history: List[Dict[str, Any]] = []
     language: str = "en"
     student_id: Optional[int] = None
     message: Optional[str] = None
     persona: str = "judy"
+    stream: bool = False
+    system: Optional[str] = None
+    new_session: bool = False
 
 class AtozUpdateRequest(BaseModel):
     current_score: int
@@ -144,6 +422,9 @@ class LambdaAttemptRequest(BaseModel):
     latency_tau: float
     dependency_h: int = 0
 
+class LambdaBatchRequest(BaseModel):
+    attempts: List[LambdaAttemptRequest]
+
 class GameAttackRequest(BaseModel):
     student_id: int
     monster_id: int
@@ -162,7 +443,14 @@ class DiaryEntryRequest(BaseModel):
 class WaterfallUpdate(BaseModel):
     metric_name: str
     new_entry: Dict[str, Any]
-    full_history: List[Dict[str, Any]]
+    # Legacy clients still send it; only used to seed a metric's first snapshot.
+    full_history: Optional[List[Dict[str, Any]]] = None
+
+class RmsqLogRequest(BaseModel):
+    week_label: str
+    lambda_score: float
+    rmsq_score: Optional[int] = None
+    context_note: Optional[str] = None
 
 class GCMessageRequest(BaseModel):
     sender_id: str
@@ -176,16 +464,6 @@ def get_voice_id(persona: str):
         return os.getenv("SAM_VOICE_ID", "AZnzlk1XvdvUeBnXmlld")
     return os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
 
-def _alpha_tau(tau: float) -> float:
-    if tau <= 30:
-        return 1.0
-    if tau <= 60:
-        return 0.8
-    return 0.5
-
-def _beta_h(h: int) -> float:
-    return 1.0 if (h is None or h == 0) else 0.5
-
 vision_prompt = (
     "You are Dr. Sam (Samie). Analyze the student's problem. "
     "Respond with clear step-by-step reasoning and include LaTeX when helpful. "
@@ -195,10 +473,11 @@ vision_prompt = (
 METRIC_RUBRIC = {"lambda": {"range": [0.0, 5.0]}, "rmsq": {"range": [0.0, 100.0]}}
 
 
-def _inject_a2g_memory(db, student_id, history_list):
-    """A2G Contextual Memory (Big Brother/Sister Logic) — shared helper."""
-    if not student_id or not history_list:
-        return
+def _load_student_memory(db, student_id) -> StudentMemory:
+    logs = db.execute(
+        "SELECT log_content FROM tutoring_logs WHERE student_id=? ORDER BY id DESC LIMIT 3",
+        (student_id,),
+    ).fetchall()
     life_log = db.execute(
         "SELECT content FROM diary_entries WHERE student_id=? ORDER BY created_at DESC LIMIT 1",
         (student_id,),
@@ -207,13 +486,53 @@ def _inject_a2g_memory(db, student_id, history_list):
         "SELECT topic FROM lambda_logs WHERE student_id=? AND lambda_val > 3.5 ORDER BY timestamp DESC LIMIT 1",
         (student_id,),
     ).fetchone()
-    memory_context = "\n[SYSTEM MEMORY ADVICE]: "
-    if life_log:
-        memory_context += f"The student recently mentioned: '{life_log['content']}'. "
-    if past_struggles:
-        memory_context += f"They struggled with '{past_struggles['topic']}' recently; check if they've recovered. "
-    if life_log or past_struggles:
-        history_list[0]["content"] += memory_context
+    return StudentMemory(
+        [l["log_content"] for l in logs],
+        life_log["content"] if life_log else None,
+        past_struggles["topic"] if past_struggles else None,
+    )
+
+
+async def _student_memory(student_id) -> Optional[StudentMemory]:
+    """Cached memory context; only a cache miss touches the database."""
+    if not student_id:
+        return None
+    memory = memory_cache.get(student_id)
+    if memory is None:
+        generation = memory_cache.generation(student_id)
+        memory = await db_pool.read(_load_student_memory, student_id)
+        memory_cache.put(student_id, memory, generation)
+    return memory
+
+
+def _inject_a2g_memory(memory: Optional[StudentMemory], history_list):
+    """A2G Contextual Memory (Big Brother/Sister Logic) — returns a new list, never mutates the caller's."""
+    history_list = list(history_list or [])
+    advice = memory.a2g_advice if memory else ""
+    if advice and history_list:
+        first = dict(history_list[0])
+        first["content"] = (first.get("content") or "") + advice
+        history_list[0] = first
+    return history_list
+
+
+def _load_user(db, username):
+    user = db.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+    student = db.execute("SELECT id FROM students WHERE user_id = ?", (user["id"],)).fetchone() if user else None
+    return user, student
+
+def _encode_token(claims: Dict[str, Any]) -> str:
+    # python-jose is imported here, not at boot; only logins need it.
+    from jose import jwt
+
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+async def _check_password(user, password: str) -> bool:
+    ok, new_hash = await password_hasher.verify(password, user["hashed_password"])
+    if ok and new_hash:
+        # Hash parameters changed since this password was stored; upgrade it in place.
+        await db_pool.execute("UPDATE users SET hashed_password=? WHERE id=?", (new_hash, user["id"]))
+    return ok
 
 
 # ==========================================
@@ -221,28 +540,36 @@ def _inject_a2g_memory(db, student_id, history_list):
 # ==========================================
 
 @api.post("/auth/register")
-async def register(user: UserCreate, db: sqlite3.Connection = Depends(get_db)):
-    if db.execute("SELECT * FROM users WHERE username=?", (user.username,)).fetchone():
+async def register(user: UserCreate):
+    if await db_pool.fetchone("SELECT id FROM users WHERE username=?", (user.username,)):
         raise HTTPException(400, "Username taken")
-    hashed = pwd_context.hash(user.password)
-    cur = db.cursor()
-    cur.execute("INSERT INTO users (username, hashed_password, role) VALUES (?, ?, 'student')", (user.username, hashed))
-    uid = cur.lastrowid
-    cur.execute("INSERT INTO students (user_id, grade) VALUES (?, ?)", (uid, user.grade))
-    sid = cur.lastrowid
-    cur.execute("INSERT INTO pq_scores (student_id, homework, attitude) VALUES (?, 5, 5)", (sid,))
-    db.commit()
+    hashed = await password_hasher.hash(user.password)
+
+    def _create(db):
+        cur = db.cursor()
+        cur.execute("INSERT INTO users (username, hashed_password, role) VALUES (?, ?, 'student')", (user.username, hashed))
+        uid = cur.lastrowid
+        cur.execute("INSERT INTO students (user_id, grade) VALUES (?, ?)", (uid, user.grade))
+        sid = cur.lastrowid
+        cur.execute("INSERT INTO pq_scores (student_id, homework, attitude) VALUES (?, 5, 5)", (sid,))
+        return sid
+
+    try:
+        sid = await db_pool.write(_create)
+    except sqlite3.IntegrityError:
+        raise HTTPException(400, "Username taken")
+    student_versions.bump(sid)
+    cohort_cache.invalidate()
     return {"message": "Created", "student_id": sid, "id": sid, "name": user.username, "access_token": "temp_token"}
 
 @api.post("/auth/token")
-async def login_token(form: OAuth2PasswordRequestForm = Depends(), db: sqlite3.Connection = Depends(get_db)):
-    user = db.execute("SELECT * FROM users WHERE username = ?", (form.username,)).fetchone()
-    if not user or not pwd_context.verify(form.password, user["hashed_password"]):
+async def login_token(form: OAuth2PasswordRequestForm = Depends()):
+    user, student = await db_pool.read(_load_user, form.username)
+    if not user or not await _check_password(user, form.password):
         raise HTTPException(400, "Bad credentials")
-    student = db.execute("SELECT id FROM students WHERE user_id = ?", (user["id"],)).fetchone()
     real_id = student["id"] if student else user["id"]
     return {
-        "access_token": jwt.encode({"sub": user["username"]}, SECRET_KEY, algorithm=ALGORITHM),
+        "access_token": _encode_token({"sub": user["username"]}),
         "token_type": "bearer",
         "id": real_id,
         "name": user["username"],
@@ -250,7 +577,7 @@ async def login_token(form: OAuth2PasswordRequestForm = Depends(), db: sqlite3.C
     }
 
 @api.post("/auth/login")
-async def login_json(request: Request, db=Depends(get_db)):
+async def login_json(request: Request):
     """
     Accept BOTH:
       1) JSON: {"username":"...","password":"..."}
@@ -278,21 +605,14 @@ async def login_json(request: Request, db=Depends(get_db)):
     if not username or not password:
         raise HTTPException(status_code=400, detail="Missing username/password")
 
-    cur = db.cursor()
-    cur.execute("SELECT * FROM users WHERE username = ?", (username,))
-    row = cur.fetchone()
+    row, student = await db_pool.read(_load_user, username)
 
-    if (not row) or (not pwd_context.verify(password, row["hashed_password"])):
+    if (not row) or (not await _check_password(row, password)):
         raise HTTPException(status_code=401, detail="Incorrect")
 
-    student = db.execute("SELECT id FROM students WHERE user_id = ?", (row["id"],)).fetchone()
     real_id = student["id"] if student else row["id"]
 
-    token = jwt.encode(
-        {"sub": row["username"], "id": real_id, "role": row["role"]},
-        SECRET_KEY,
-        algorithm=ALGORITHM,
-    )
+    token = _encode_token({"sub": row["username"], "id": real_id, "role": row["role"]})
     return {
         "access_token": token,
         "token_type": "bearer",
@@ -309,229 +629,714 @@ def get_metric_rubric():
 async def speak(req: SpeakRequest):
     if not ELEVENLABS_API_KEY:
         return Response(content=b"", media_type="audio/mpeg")
+    voice_id = get_voice_id(req.persona)
+    cached = tts_client.cache.get(voice_id, req.text)
+    if cached:
+        tts_requests.inc("hit")
+        return FileResponse(cached, media_type="audio/mpeg", headers={"X-TTS-Cache": "hit"})
+    started = time.perf_counter()
     try:
-        r = requests.post(
-            f"https://api.elevenlabs.io/v1/text-to-speech/{get_voice_id(req.persona)}",
-            json={"text": req.text},
-            headers={"xi-api-key": ELEVENLABS_API_KEY},
-        )
-        return Response(content=r.content, media_type="audio/mpeg")
-    except Exception:
+        upstream = await tts_client.open(voice_id, req.text)
+    except TTSError as e:
+        tts_requests.inc("error")
+        logger.warning(f"TTS upstream failed: {e}")
         raise HTTPException(500, "TTS Failed")
+    tts_requests.inc("miss")
+    tts_seconds.observe("first_byte", value=time.perf_counter() - started)
+    return StreamingResponse(_metered_audio(tts_client.relay(upstream, voice_id, req.text), started), media_type="audio/mpeg", headers={"X-TTS-Cache": "miss"})
+
+async def _metered_audio(chunks, started: float):
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        yield chunk
+    tts_seconds.observe("total", value=time.perf_counter() - started)
+    tts_bytes.inc(amount=size)
+    span("tts upstream", time.perf_counter() - started)
+
+@api.get("/students/gc-stream-stats")
+def gc_stream_stats():
+    return gc_hub.stats()
+
+@api.get("/db/write-behind-stats")
+def write_behind_stats():
+    return event_writer.stats()
+
+@api.get("/memory/cache-stats")
+def memory_cache_stats():
+    return memory_cache.stats()
+
+@api.get("/learning/conversation-stats")
+def conversation_stats():
+    return conversation_store.stats()
+
+@api.get("/learning/dispatch-stats")
+def llm_dispatch_stats():
+    return llm_dispatch.stats()
+
+@api.get("/learning/cache-stats")
+def llm_cache_stats():
+    return {"enabled": LLM_CACHE_ENABLED, "with_memory": LLM_CACHE_WITH_MEMORY, **llm_cache.stats()}
+
+@api.get("/review/cache-stats")
+def review_queue_stats():
+    return review_queue.stats()
+
+@api.get("/tts/cache-stats")
+def tts_cache_stats():
+    return tts_client.cache.stats()
+
+def _frame(**fields) -> str:
+    return json.dumps(fields) + "\n"
+
+
+class _JsonContentStream:
+    """Incrementally decode the "content" string of a streamed JSON object."""
+
+    _START = re.compile(r'"content"\s*:\s*"')
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self):
+        self.raw = ""
+        self.pos = None
+        self.closed = False
+
+    def feed(self, chunk: str) -> str:
+        self.raw += chunk
+        if self.closed:
+            return ""
+        if self.pos is None:
+            match = self._START.search(self.raw)
+            if not match:
+                return ""
+            self.pos = match.end()
+        out, i, raw = [], self.pos, self.raw
+        while i < len(raw):
+            c = raw[i]
+            if c == '"':
+                self.closed = True
+                i += 1
+                break
+            if c != "\\":
+                out.append(c)
+                i += 1
+                continue
+            if i + 1 >= len(raw):
+                break
+            if raw[i + 1] != "u":
+                out.append(self._ESCAPES.get(raw[i + 1], raw[i + 1]))
+                i += 2
+                continue
+            # \uXXXX, waiting for the low half when this is a surrogate pair
+            width = 12 if raw[i + 2:i + 4].lower() in ("d8", "d9", "da", "db") else 6
+            if i + width > len(raw):
+                break
+            out.append(json.loads(f'"{raw[i:i + width]}"'))
+            i += width
+        self.pos = i
+        return "".join(out)
+
+
+def _finalize_judy_json(raw: str) -> str:
+    match = re.search(r"\{.*\}", (raw or "").strip(), re.S)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and "content" in data:
+            return match.group(0)
+    return json.dumps({"content": "Thinking..."})
+
+
+class TutorCall:
+    """One upstream tutor request, fully assembled before the model is awaited."""
+
+    __slots__ = ("kind", "kwargs", "judy", "personalized")
+
+    def __init__(self, kind: str, kwargs: Dict[str, Any], judy: bool = False, personalized: bool = False):
+        self.kind = kind
+        self.kwargs = kwargs
+        self.judy = judy
+        self.personalized = personalized
+
+
+async def _prepare_tutor_call(req: LearningRequest, history: List[Dict[str, Any]]) -> TutorCall:
+    """Do the DB reads for a tutor turn and assemble the upstream call."""
+    # ---------------------------
+    # Samie: flexible text mode
+    # ---------------------------
+    if req.persona == "samie":
+        last_user_msg = ""
+        for m in reversed(history):
+            if m.get("role") == "user":
+                last_user_msg = m.get("content", "") or ""
+                break
+
+        image_data = None
+        if "data:image" in last_user_msg:
+            # Extract base64 Data URL
+            match = re.search(r"(data:image\/[a-zA-Z]+;base64,[A-Za-z0-9+/=]+)", last_user_msg)
+            image_data = match.group(1) if match else None
+
+        if image_data and openai_client.has_responses:
+            # Vision mode
+            return TutorCall("vision", {
+                "model": LLM_MODEL,
+                "input": [{
+                    "role": "user",
+                    "content": [
+                        {"type": "input_text", "text": vision_prompt},
+                        {"type": "input_image", "image_url": image_data},
+                    ],
+                }],
+                "max_output_tokens": 900,
+            })
+
+        # Normal Samie text chat (or text-only vision fallback) with A2G memory
+        memory = await _student_memory(req.student_id)
+        clean_history = _inject_a2g_memory(memory, history)
+        return TutorCall("chat", {"model": LLM_MODEL, "messages": clean_history}, personalized=bool(memory and memory.a2g_advice))
+
+    # ---------------------------
+    # Judy: strict JSON mode
+    # ---------------------------
+    memory = await _student_memory(req.student_id)
+    mem_str = memory.mem_str if memory else ""
+    prompt = (
+        f"You are Judy. Memory: {mem_str}. "
+        "You must ALWAYS respond in valid JSON with a single key named 'content'. "
+        "Do not include markdown, code fences, or extra keys."
+    )
+    messages_to_send = _inject_a2g_memory(memory, [{"role": "system", "content": prompt}] + history)
+    return TutorCall("chat", {
+        "model": LLM_MODEL,
+        "messages": messages_to_send,
+        "response_format": {"type": "json_object"},
+    }, judy=True, personalized=bool(memory and (mem_str or memory.a2g_advice)))
+
+
+def _response_cache_key(req: LearningRequest, call: TutorCall) -> Optional[str]:
+    """Cache key for ``call``, or None when the reply must not be shared."""
+    if not LLM_CACHE_ENABLED or (call.personalized and not LLM_CACHE_WITH_MEMORY):
+        return None
+    messages = call.kwargs.get("messages") or call.kwargs.get("input") or []
+    extra = {k: v for k, v in call.kwargs.items() if k not in ("model", "messages", "input")}
+    return llm_cache.key(req.persona, call.kwargs["model"], messages, kind=call.kind, **extra)
+
+
+async def _complete_tutor_call(call: TutorCall) -> str:
+    if call.kind == "vision":
+        r = await openai_client.responses.create(**call.kwargs)
+        _record_usage("vision", getattr(r, "usage", None))
+        text = getattr(r, "output_text", "") or ""
+    else:
+        resp = await openai_client.chat.completions.create(**call.kwargs)
+        _record_usage("chat", getattr(resp, "usage", None))
+        text = resp.choices[0].message.content or ""
+    return _finalize_judy_json(text) if call.judy else text
+
+
+async def _stream_tutor_call(call: TutorCall):
+    """Yield text deltas from the upstream model as they arrive."""
+    if call.kind == "vision":
+        events = await openai_client.responses.create(stream=True, **call.kwargs)
+        async for event in events:
+            if getattr(event, "type", "") == "response.output_text.delta":
+                yield event.delta or ""
+        return
+    chunks = await openai_client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **call.kwargs)
+    async for chunk in chunks:
+        # With include_usage the last chunk has no choices, only the token counts.
+        _record_usage("chat_stream", getattr(chunk, "usage", None))
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
-@api.post("/learning/tutor-request")
-async def tutor_request(req: LearningRequest, db: sqlite3.Connection = Depends(get_db)):
-    if not openai_client:
-        return {"role": "assistant", "content": json.dumps({"content": "AI Offline"})}
 
-    mem_str = ""
-    if req.student_id:
-        logs = db.execute(
-            "SELECT log_content FROM tutoring_logs WHERE student_id=? ORDER BY id DESC LIMIT 3",
-            (req.student_id,),
-        ).fetchall()
-        mem_str = "\n".join([l["log_content"] for l in logs])
+async def _log_tutoring_turn(req: LearningRequest):
+    """Save minimal tutoring log."""
+    if not req.student_id:
+        return
+    user_text = (req.message or "").lower()
+    log_content = "Session End" if "bye" in user_text else "Chat"
+    await event_writer.write(
+        "INSERT INTO tutoring_logs (student_id, log_date, log_content, tutor_name) VALUES (?, datetime('now', 'localtime'), ?, ?)",
+        (req.student_id, log_content, req.persona),
+        on_commit=lambda: _tutor_log_committed(req.student_id, log_content),
+    )
 
-    try:
-        final_response = ""
-
-        # ---------------------------
-        # Samie: flexible text mode
-        # ---------------------------
-        if req.persona == "samie":
-            last_user_msg = ""
-            for m in reversed(req.history or []):
-                if m.get("role") == "user":
-                    last_user_msg = m.get("content", "") or ""
-                    break
-
-            if "data:image" in last_user_msg:
-                # Extract base64 Data URL
-                match = re.search(r"(data:image\/[a-zA-Z]+;base64,[A-Za-z0-9+/=]+)", last_user_msg)
-                image_data = match.group(1) if match else None
-
-                if (not image_data) or (not hasattr(openai_client, "responses")):
-                    # Fallback: text-only with A2G memory
-                    clean_history = list(req.history)
-                    _inject_a2g_memory(db, req.student_id, clean_history)
-                    resp = await openai_client.chat.completions.create(
-                        model=LLM_MODEL,
-                        messages=clean_history,
-                    )
-                    final_response = resp.choices[0].message.content or ""
-                else:
-                    # Vision mode
-                    r = await openai_client.responses.create(
-                        model=LLM_MODEL,
-                        input=[{
-                            "role": "user",
-                            "content": [
-                                {"type": "input_text", "text": vision_prompt},
-                                {"type": "input_image", "image_url": image_data},
-                            ],
-                        }],
-                        max_output_tokens=900,
-                    )
-                    final_response = getattr(r, "output_text", "") or ""
-            else:
-                # Normal Samie text chat with A2G memory
-                clean_history = list(req.history)
-                _inject_a2g_memory(db, req.student_id, clean_history)
-                resp = await openai_client.chat.completions.create(
-                    model=LLM_MODEL,
-                    messages=clean_history,
-                )
-                final_response = resp.choices[0].message.content or ""
 
-        # ---------------------------
-        # Judy: strict JSON mode
-        # ---------------------------
+def _tutor_log_committed(student_id, log_content):
+    memory_cache.record_tutor_log(student_id, log_content)
+    student_versions.bump(student_id)
+
+
+class _TicketedStream(StreamingResponse):
+    """Releases the dispatcher ticket however the response ends, including before its body starts."""
+
+    def __init__(self, content, ticket, **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.ticket.release()
+
+
+async def _tutor_stream(call: TutorCall, cache_key: Optional[str], state: Dict[str, bool], ticket, persona: str):
+    """NDJSON frames: ``delta`` text pieces, then one ``final`` (or ``error``) frame."""
+    cached = llm_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        ticket.release()
+        text = json.loads(cached).get("content", "") if call.judy else cached
+        yield _frame(type="delta", content=text)
+        yield _frame(type="final", role="assistant", content=cached)
+        state["ok"], state["content"] = True, cached
+        return
+
+    content = _JsonContentStream() if call.judy else None
+    finalize = _finalize_judy_json if call.judy else (lambda raw: raw)
+    try:
+        if cache_key:
+            # Identical concurrent asks follow one upstream stream, which outlives any one client.
+            flight, started = llm_cache.join_stream(cache_key, lambda: llm_dispatch.stream(ticket, _stream_tutor_call(call)), finalize)
+            if not started:
+                ticket.release()
+            pieces = flight.follow() if flight.pieces is not None else None
         else:
-            prompt = (
-                f"You are Judy. Memory: {mem_str}. "
-                "You must ALWAYS respond in valid JSON with a single key named 'content'. "
-                "Do not include markdown, code fences, or extra keys."
-            )
-            messages_to_send = [{"role": "system", "content": prompt}] + req.history
-            _inject_a2g_memory(db, req.student_id, messages_to_send)
+            flight, pieces = None, llm_dispatch.stream(ticket, _stream_tutor_call(call))
+        raw = ""
+        if pieces is not None:
+            async for piece in pieces:
+                raw += piece
+                text = content.feed(piece) if call.judy else piece
+                if text:
+                    yield _frame(type="delta", content=text)
+        final_response = await flight.result() if flight else finalize(raw)
+        if pieces is None:
+            # Joined a non-streamed call: the whole reply arrives at once.
+            yield _frame(type="delta", content=json.loads(final_response).get("content", "") if call.judy else final_response)
+        yield _frame(type="final", role="assistant", content=final_response)
+        state["ok"], state["content"] = True, final_response
+    except LLMUnavailable as e:
+        tutor_errors.inc(persona)
+        yield _frame(type="error", role="assistant", content=json.dumps({"content": "Thinking error..."}), status=e.status_code)
+    except Exception:
+        tutor_errors.inc(persona)
+        logger.exception("Tutor stream failed")
+        yield _frame(type="error", role="assistant", content=json.dumps({"content": "Thinking error..."}))
+
+
+async def _log_streamed_turn(req: LearningRequest, state: Dict[str, Any], in_session: bool):
+    if state.get("ok"):
+        if in_session:
+            _record_session_turn(req, state["content"])
+        await _log_tutoring_turn(req)
+
+
+def _session_history(req: LearningRequest):
+    """History to send upstream and whether it came from the server-side session."""
+    if req.student_id and req.message and not req.history:
+        if req.new_session:
+            conversation_store.reset(req.student_id, req.persona)
+        return conversation_store.context(req.student_id, req.persona, req.message, req.system), True
+    history = req.history
+    if req.message and not history:
+        # Guests have no session to keep; their turn is just the message itself.
+        history = ([{"role": "system", "content": req.system}] if req.system else []) + [{"role": "user", "content": req.message}]
+    sent, _ = fit_to_budget(history, CONVERSATION_TOKEN_BUDGET)
+    conversation_store.note_legacy_request(history, sent)
+    return sent, False
+
+
+def _record_session_turn(req: LearningRequest, final_response: str):
+    reply = final_response
+    if req.persona != "samie":
+        try:
+            reply = json.loads(final_response).get("content", final_response)
+        except (ValueError, AttributeError):
+            pass
+    conversation_store.record(req.student_id, req.persona, req.message, reply)
+
 
-            resp = await openai_client.chat.completions.create(
-                model=LLM_MODEL,
-                messages=messages_to_send,
-                response_format={"type": "json_object"},
+async def _summarize_turns(summary: str, turns: List[Dict[str, Any]]) -> str:
+    transcript = "\n".join(f"{m['role']}: {m.get('content') or ''}" for m in turns)
+    await openai_client.ready()
+    resp = await llm_dispatch.call(lambda: openai_client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": "Update the running summary of a tutoring chat. Keep names, goals, struggles and promises. Under 120 words."},
+            {"role": "user", "content": f"Summary so far: {summary or '(none)'}\n\nNew turns:\n{transcript}"},
+        ],
+    ), BACKGROUND, timeout=LLM_DEADLINE_SECONDS)
+    return resp.choices[0].message.content or summary
+
+
+@api.post("/learning/tutor-request")
+async def tutor_request(req: LearningRequest, background_tasks: BackgroundTasks):
+    """Tutor chat turn; with ``stream: true`` the reply is sent as NDJSON frames."""
+    if not openai_client:
+        offline = json.dumps({"content": "AI Offline"})
+        if req.stream:
+            return StreamingResponse(iter([_frame(type="final", role="assistant", content=offline)]), media_type="application/x-ndjson")
+        return {"role": "assistant", "content": offline}
+    await openai_client.ready()
+
+    try:
+        # DB reads for the turn finish here, before any upstream slot is taken.
+        history, in_session = _session_history(req)
+        call = await _prepare_tutor_call(req, history)
+        cache_key = _response_cache_key(req, call)
+
+        if req.stream:
+            # Admission is decided now so a rejection is a 429/503, not a broken stream.
+            ticket = llm_dispatch.reserve(INTERACTIVE, req.student_id, LLM_DEADLINE_SECONDS)
+            # The log insert runs after the last frame has been sent.
+            state = {"ok": False}
+            return _TicketedStream(
+                _tutor_stream(call, cache_key, state, ticket, req.persona),
+                ticket,
+                media_type="application/x-ndjson",
+                background=BackgroundTask(_log_streamed_turn, req, state, in_session),
             )
 
-            raw_json = (resp.choices[0].message.content or "").strip()
-            match = re.search(r"\{.*\}", raw_json, re.S)
-            if not match:
-                final_response = json.dumps({"content": "Thinking..."})
-            else:
-                final_response = match.group(0)
-
-        # ---------------------------
-        # Save minimal tutoring log
-        # ---------------------------
-        if req.student_id:
-            user_text = (req.message or "").lower()
-            if "bye" in user_text:
-                db.execute(
-                    "INSERT INTO tutoring_logs (student_id, log_date, log_content, tutor_name) VALUES (?, datetime('now', 'localtime'), ?, ?)",
-                    (req.student_id, "Session End", req.persona),
-                )
-            else:
-                db.execute(
-                    "INSERT INTO tutoring_logs (student_id, log_date, log_content, tutor_name) VALUES (?, datetime('now', 'localtime'), ?, ?)",
-                    (req.student_id, "Chat", req.persona),
-                )
-            db.commit()
+        def upstream():
+            # Admitted here, by whoever starts the call: a follower never inherits another student's 429.
+            ticket = llm_dispatch.reserve(INTERACTIVE, req.student_id, LLM_DEADLINE_SECONDS)
+            return llm_dispatch.call(lambda: _complete_tutor_call(call), ticket=ticket)
 
+        if cache_key:
+            # Identical concurrent requests share one upstream call.
+            final_response = await llm_cache.get_or_call(cache_key, upstream)
+        else:
+            final_response = await upstream()
+        if in_session:
+            _record_session_turn(req, final_response)
+        background_tasks.add_task(_log_tutoring_turn, req)
         return {"role": "assistant", "content": final_response}
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
+    except LLMUnavailable:
+        raise
+    except Exception:
+        tutor_errors.inc(req.persona)
+        logger.exception("Tutor request failed")
         return {"role": "assistant", "content": json.dumps({"content": "Thinking error..."})}
 
+@api.post("/learning/vision-upload")
+async def vision_upload(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    student_id: Optional[int] = Form(None),
+    message: str = Form(""),
+):
+    """Samie reads a photo of the student's work; the same photo again reuses the analysis."""
+    if not openai_client:
+        return {"role": "assistant", "content": "AI Offline"}
+    await openai_client.ready()
+    if not openai_client.has_responses:
+        return {"role": "assistant", "content": "AI Offline"}
+    try:
+        digest, mime, size = await image_intake.digest(file)
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    key = vision_cache.key("samie", LLM_MODEL, [{"role": "user", "content": message}], image=digest, max_side=VISION_MAX_SIDE)
+    reply = vision_cache.get(key)
+    fresh = False
+    if reply is None:
+        # The flight can outlive this request and its upload, so it gets the shrunk bytes, never the file.
+        try:
+            data, out_mime = await asyncio.to_thread(image_intake.shrink, file.file, mime, size)
+        except ImageRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        prompt = f"{vision_prompt}\n\n{message}" if message else vision_prompt
+        call = TutorCall("vision", {
+            "model": LLM_MODEL,
+            "input": [{
+                "role": "user",
+                "content": [
+                    {"type": "input_text", "text": prompt},
+                    {"type": "input_image", "image_url": data_url(data, out_mime)},
+                ],
+            }],
+            "max_output_tokens": 900,
+        })
+
+        def upstream():
+            nonlocal fresh
+            fresh = True
+            ticket = llm_dispatch.reserve(INTERACTIVE, student_id, LLM_DEADLINE_SECONDS)
+            return llm_dispatch.call(lambda: _complete_tutor_call(call), ticket=ticket)
+
+        reply = await vision_cache.get_or_call(key, upstream)
+    if student_id:
+        # Follow-up questions in the chat can refer back to the photo.
+        conversation_store.record(student_id, "samie", f"[image] {message}".strip(), reply)
+        background_tasks.add_task(_log_tutoring_turn, LearningRequest(student_id=student_id, message=message, persona="samie"))
+    return {"role": "assistant", "content": reply, "image_sha256": digest, "cached": not fresh}
+
+@api.get("/learning/vision-stats")
+def vision_stats():
+    return {**image_intake.stats(), **vision_cache.stats()}
+
 @api.post("/lambda/attempt")
-async def lambda_attempt(req: LambdaAttemptRequest, db: sqlite3.Connection = Depends(get_db)):
-    row = db.execute("SELECT * FROM topic_mastery WHERE student_id=? AND topic_name=?", (req.student_id, req.topic_name)).fetchone()
-    if not row:
-        db.execute("INSERT INTO topic_mastery (student_id, topic_name, lambda_val, consecutive_correct) VALUES (?, ?, ?, ?)", (req.student_id, req.topic_name, 1.0, 0))
-        db.commit()
-        row = db.execute("SELECT * FROM topic_mastery WHERE student_id=? AND topic_name=?", (req.student_id, req.topic_name)).fetchone()
-    old_lambda = float(row["lambda_val"]) if row and row["lambda_val"] else 1.0
-    k_before = int(row["consecutive_correct"])
-    alpha = _alpha_tau(float(req.latency_tau))
-    beta = _beta_h(int(req.dependency_h))
-    eta = alpha * beta
-    C = 1 if int(req.correctness) == 1 else 0
-    if C == 1:
-        R_base = 0.5 if k_before >= 3 else 0.8
-        delta = R_base + (1.0 - R_base) * (1.0 - eta)
-        new_lambda = max(0.1, old_lambda * delta)
-        k_after = k_before + 1
-    else:
-        new_lambda = min(5.0, old_lambda + 1.5)
-        k_after = 0
-    db.execute("UPDATE topic_mastery SET lambda_val=?, consecutive_correct=?, last_practiced_at=CURRENT_TIMESTAMP WHERE student_id=? AND topic_name=?", (new_lambda, k_after, req.student_id, req.topic_name))
-    db.commit()
-    return {"old_lambda": old_lambda, "new_lambda": new_lambda}
+async def lambda_attempt(req: LambdaAttemptRequest):
+    result = (await db_pool.write(apply_attempts, [req]))[0]
+    _attempts_committed([result])
+    return {"old_lambda": result["old_lambda"], "new_lambda": result["new_lambda"]}
+
+@api.post("/lambda/attempts")
+async def lambda_attempts_batch(req: LambdaBatchRequest):
+    """Apply many attempts (any students/topics) in order, in one transaction."""
+    results = await db_pool.write(apply_attempts, req.attempts)
+    _attempts_committed(results)
+    return {"results": results}
+
+def _attempts_committed(results):
+    for r in results:
+        review_queue.record(r["student_id"], r["topic_name"], r["new_lambda"], r["consecutive_correct"])
+    for sid in {r["student_id"] for r in results}:
+        student_versions.bump(sid)
+    cohort_cache.invalidate()
+
+@api.get("/students/{student_id}/review/next")
+async def next_review_topics(student_id: int, k: int = 5, due_only: bool = False):
+    """Topics ranked by when they fall due for review, soonest first."""
+    k = max(1, min(k, PAGE_LIMIT_MAX))
+    topics = review_queue.next_due(student_id, k)
+    if topics is None:
+        generation = review_queue.generation(student_id)
+        heap = review_queue.put(student_id, await db_pool.read(load_topics, student_id), generation)
+        topics = review_queue.rank(heap, k)
+    if due_only:
+        topics = [t for t in topics if t["due"]]
+    return {"topics": topics}
 
 # --- GAME ENDPOINTS ---
 @api.get("/game/{student_id}/monsters")
-async def get_monsters(student_id: int, db: sqlite3.Connection = Depends(get_db)):
-    rows = db.execute("SELECT * FROM game_monsters WHERE student_id=? AND is_defeated=0", (student_id,)).fetchall()
+async def get_monsters(student_id: int):
+    rows = await db_pool.read(_load_monsters, student_id)
     if not rows:
-        monsters = [("Linear Lizard", "MOB", "Math", "Solve 2x=10", "5", 100, 100, 50)]
-        for m in monsters:
-            db.execute("INSERT INTO game_monsters (student_id, monster_name, monster_type, topic_name, question_text, correct_answer, hp_max, hp_current, xp_reward) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (student_id, m[0], m[1], m[2], m[3], m[4], m[5], m[6], m[7]))
-        db.commit()
-        rows = db.execute("SELECT * FROM game_monsters WHERE student_id=? AND is_defeated=0", (student_id,)).fetchall()
+        rows = await _restock_monsters(student_id)
+    else:
+        answer_index.put_rows(rows)
     return [dict(r) for r in rows]
 
+@api.get("/game/answer-index-stats")
+def answer_index_stats():
+    return answer_index.stats()
+
+@api.get("/game/monster-pool-stats")
+def monster_pool_stats():
+    return monster_factory.stats()
+
+def _student_topics(db, student_id):
+    return db.execute("SELECT topic_name, lambda_val FROM topic_mastery WHERE student_id=? ORDER BY lambda_val DESC LIMIT ?", (student_id, MONSTERS_PER_SEED)).fetchall()
+
+async def _restock_monsters(student_id):
+    """Seed a student who has no monsters left, from the pools when they have stock."""
+    taken = []
+    if monster_factory.enabled:
+        topics = await db_pool.read(_student_topics, student_id) or [("Math", None)]
+        for topic, lam in topics:
+            key = (topic, difficulty_for(lam))
+            monster = monster_factory.take(*key)
+            if monster:
+                taken.append((key, monster))
+    seeded = False
+    try:
+        rows, seeded = await db_pool.write(_seed_monsters, student_id, [m for _, m in taken] or None)
+    except asyncio.CancelledError:
+        seeded = True  # the write may still commit; a pick returned now could be served twice
+        raise
+    finally:
+        if not seeded:
+            # Another request seeded first, or the write rolled back: the picks go back on their shelves.
+            for key, monster in taken:
+                monster_factory.give_back(*key, monster)
+    answer_index.put_rows(rows)
+    student_versions.bump(student_id)
+    cohort_cache.invalidate()
+    return rows
+
+def _load_monsters(db, student_id):
+    return db.execute("SELECT * FROM game_monsters WHERE student_id=? AND is_defeated=0", (student_id,)).fetchall()
+
+def _seed_monsters(db, student_id, picks=None):
+    """Insert a student's monsters unless they already have some; returns ``(rows, seeded)``."""
+    rows = db.execute("SELECT * FROM game_monsters WHERE student_id=? AND is_defeated=0", (student_id,)).fetchall()
+    if rows:
+        return rows, False
+    monsters = [("Linear Lizard", "MOB", "Math", "Solve 2x=10", "5", 100, 100, 50)]
+    if picks:
+        monsters = [(m["monster_name"], m["monster_type"], m["topic_name"], m["question_text"], m["correct_answer"], m["hp_max"], m["hp_current"], m["xp_reward"]) for m in picks]
+        consume_pool_rows(db, picks)
+    for m in monsters:
+        db.execute("INSERT INTO game_monsters (student_id, monster_name, monster_type, topic_name, question_text, correct_answer, answer_canonical, hp_max, hp_current, xp_reward) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (student_id, m[0], m[1], m[2], m[3], m[4], canonicalize(m[4]), m[5], m[6], m[7]))
+    return db.execute("SELECT * FROM game_monsters WHERE student_id=? AND is_defeated=0", (student_id,)).fetchall(), True
+
 @api.post("/game/attack")
-async def game_attack(req: GameAttackRequest, db: sqlite3.Connection = Depends(get_db)):
-    monster = db.execute("SELECT * FROM game_monsters WHERE id=? AND student_id=?", (req.monster_id, req.student_id)).fetchone()
-    if not monster:
+async def game_attack(req: GameAttackRequest):
+    monster = answer_index.get(req.monster_id)
+    if monster is None:
+        rows = await db_pool.fetchall("SELECT id, student_id, monster_name, correct_answer, answer_canonical, xp_reward FROM game_monsters WHERE id=?", (req.monster_id,))
+        monster = answer_index.put_rows(rows)
+    if not monster or monster.student_id != req.student_id:
         raise HTTPException(404, "Monster not found")
-    def _norm(s):
-        return re.sub(r"\s+", "", (s or "").strip().lower())
-    is_correct = (_norm(req.answer) == _norm(monster["correct_answer"]))
+    # "2187" beats a "3^7" monster: both sides are compared in canonical form.
+    is_correct = matches(monster.canonical, req.answer)
     if is_correct:
-        db.execute("UPDATE game_monsters SET is_defeated=1 WHERE id=?", (req.monster_id,))
-        db.execute("UPDATE pq_scores SET attitude = attitude + 1 WHERE student_id=?", (req.student_id,))
-        db.commit()
-        return {"status": "defeated", "xp_gained": monster["xp_reward"], "message": f"Defeated {monster['monster_name']}!"}
+        def _defeat(db):
+            db.execute("UPDATE game_monsters SET is_defeated=1 WHERE id=?", (req.monster_id,))
+            db.execute("UPDATE pq_scores SET attitude = attitude + 1 WHERE student_id=?", (req.student_id,))
+        await db_pool.write(_defeat)
+        answer_index.discard(req.monster_id)
+        student_versions.bump(req.student_id)
+        cohort_cache.invalidate()
+        return {"status": "defeated", "xp_gained": monster.xp_reward, "message": f"Defeated {monster.monster_name}!"}
     return {"status": "missed", "xp_gained": 0, "message": "Missed!"}
 
+# --- KEYSET PAGINATION ---
+def _encode_cursor(row, key: str) -> str:
+    return base64.urlsafe_b64encode(f"{row[key]}|{row['id']}".encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        value, row_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().rsplit("|", 1)
+        return value, int(row_id)
+    except ValueError:
+        raise HTTPException(400, "Bad cursor")
+
+def _keyset_rows(db, columns: str, table: str, student_id: int, limit: Optional[int], cursor: Optional[str], key: str = "created_at"):
+    """Newest-first page ordered by (``key``, id); returns ``(rows, next_cursor)``."""
+    sql = f"SELECT id, created_at, {columns} FROM {table} WHERE student_id=?"
+    params: List[Any] = [student_id]
+    if cursor:
+        sql += f" AND ({key}, id) < (?, ?)"
+        params += _decode_cursor(cursor)
+    sql += f" ORDER BY {key} DESC, id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(min(limit, PAGE_LIMIT_MAX) + 1)
+    rows = db.execute(sql, params).fetchall()
+    next_cursor = None
+    if limit and len(rows) > min(limit, PAGE_LIMIT_MAX):
+        rows = rows[:-1]
+        next_cursor = _encode_cursor(rows[-1], key)
+    return [dict(r) for r in rows], next_cursor
+
+async def _keyset_page(columns: str, table: str, student_id: int, limit: Optional[int], cursor: Optional[str], response: Response,
+                       key: str = "created_at"):
+    """Route helper: the page as a list, with X-Next-Cursor set when more rows remain."""
+    rows, next_cursor = await db_pool.read(_keyset_rows, columns, table, student_id, limit, cursor, key)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
 # --- DIARY ENDPOINTS ---
 @api.get("/diary/{student_id}")
-async def get_diary(student_id: int, db: sqlite3.Connection = Depends(get_db)):
-    rows = db.execute("SELECT entry_date, content FROM diary_entries WHERE student_id=? ORDER BY entry_date DESC", (student_id,)).fetchall()
-    return [dict(r) for r in rows]
+async def get_diary(student_id: int, response: Response, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None):
+    # Newest diary date first, as the calendar has always listed it; id breaks ties within a day.
+    return await _keyset_page("entry_date, content", "diary_entries", student_id, limit, cursor, response, key="entry_date")
+
+def _diary_committed(student_id):
+    memory_cache.invalidate(student_id)
+    student_versions.bump(student_id)
 
 @api.post("/diary/save")
-async def save_diary(req: DiaryEntryRequest, db: sqlite3.Connection = Depends(get_db)):
-    db.execute("INSERT INTO diary_entries (student_id, entry_date, content) VALUES (?, ?, ?)", (req.student_id, req.date, req.content))
-    db.commit()
+async def save_diary(req: DiaryEntryRequest, durable: bool = False):
+    await event_writer.write(
+        "INSERT INTO diary_entries (student_id, entry_date, content) VALUES (?, ?, ?)",
+        (req.student_id, req.date, req.content),
+        durable=durable,
+        on_commit=lambda: _diary_committed(req.student_id),
+    )
     return {"status": "saved"}
 
 # --- WATERFALL ENDPOINTS ---
 @api.get("/students/{student_id}/pq-waterfall")
-async def get_pq_waterfall(student_id: int, db: sqlite3.Connection = Depends(get_db)):
-    rows = db.execute("SELECT metric_name, history_json FROM pq_waterfall_state WHERE student_id=?", (student_id,)).fetchall()
-    result = {}
-    for r in rows:
-        try:
-            result[r["metric_name"]] = json.loads(r["history_json"])
-        except Exception:
-            result[r["metric_name"]] = [{"value": 50}]
-    return result
+async def get_pq_waterfall(student_id: int, window: int = WATERFALL_WINDOW):
+    """Last ``window`` entries per metric (``window=0`` for the full history)."""
+    return await db_pool.read(waterfall.load_view, student_id, window)
 
 @api.post("/students/{student_id}/pq-waterfall/update")
-async def update_pq_waterfall(student_id: int, req: WaterfallUpdate, db: sqlite3.Connection = Depends(get_db)):
-    history_str = json.dumps(req.full_history)
-    db.execute("INSERT INTO pq_waterfall_state (student_id, metric_name, history_json, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP) ON CONFLICT(student_id, metric_name) DO UPDATE SET history_json=excluded.history_json, updated_at=CURRENT_TIMESTAMP", (student_id, req.metric_name, history_str))
-    db.commit()
+async def update_pq_waterfall(student_id: int, req: WaterfallUpdate):
+    seed = req.full_history[:-1] if req.full_history else None
+    await db_pool.write(waterfall.append_entry, student_id, req.metric_name, req.new_entry, seed)
+    student_versions.bump(student_id)
     return {"status": "saved"}
 
 # --- MESSAGE BOARD ENDPOINTS ---
 @api.get("/students/{student_id}/gc-messages")
-async def get_gc_messages(student_id: int, db: sqlite3.Connection = Depends(get_db)):
-    rows = db.execute("SELECT sender_name, message_content, created_at FROM gc_messages WHERE student_id=? ORDER BY created_at DESC", (student_id,)).fetchall()
-    return [dict(r) for r in rows]
+async def get_gc_messages(student_id: int, response: Response, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None):
+    return await _keyset_page("sender_name, message_content", "gc_messages", student_id, limit, cursor, response)
+
+def _sse(row) -> str:
+    return f"id: {row['id']}\nevent: message\ndata: {json.dumps(row)}\n\n"
+
+@api.get("/students/{student_id}/gc-messages/stream")
+async def stream_gc_messages(student_id: int, request: Request, after: Optional[int] = None):
+    """Server-Sent Events: new board messages as they are posted.
+
+    ``after`` (or the ``Last-Event-ID`` header on reconnect) replays anything
+    newer than that message id first; a missing or non-positive id means the
+    client has nothing to catch up on and only live posts are sent.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if after is None and last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+    if after is not None and after <= 0:
+        after = None
+    # Subscribe before the catch-up query so nothing posted in between is missed.
+    queue = gc_hub.subscribe(student_id)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            last_id = after or 0
+            if after is not None:
+                rows = await db_pool.fetchall(
+                    "SELECT id, sender_name, message_content, created_at FROM gc_messages WHERE student_id=? AND id>? ORDER BY created_at, id",
+                    (student_id, after),
+                )
+                for r in rows:
+                    last_id = max(last_id, r["id"])
+                    yield _sse(dict(r))
+            while True:
+                try:
+                    msg = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if msg["id"] > last_id:
+                    last_id = msg["id"]
+                    yield _sse(msg)
+        finally:
+            gc_hub.unsubscribe(student_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _insert_gc_message(db, student_id, req: GCMessageRequest):
+    cur = db.execute("INSERT INTO gc_messages (student_id, sender_id, sender_name, message_content) VALUES (?, ?, ?, ?)", (student_id, req.sender_id, req.sender_name, req.message))
+    return db.execute("SELECT id, sender_name, message_content, created_at FROM gc_messages WHERE id=?", (cur.lastrowid,)).fetchone()
 
 @api.post("/students/{student_id}/gc-messages")
-async def post_gc_message(student_id: int, req: GCMessageRequest, db: sqlite3.Connection = Depends(get_db)):
+async def post_gc_message(student_id: int, req: GCMessageRequest):
     if not req.sender_id.lower().startswith("mt"):
         raise HTTPException(403, "Access Denied")
-    db.execute("INSERT INTO gc_messages (student_id, sender_id, sender_name, message_content) VALUES (?, ?, ?, ?)", (student_id, req.sender_id, req.sender_name, req.message))
-    db.commit()
-    return {"status": "posted"}
+    # Written directly (not write-behind): subscribers need the committed row id.
+    row = dict(await db_pool.write(_insert_gc_message, student_id, req))
+    student_versions.bump(student_id)
+    gc_hub.publish(student_id, row)
+    return {"status": "posted", "id": row["id"]}
 
 # --- ATOZ ENDPOINTS ---
 @api.get("/students/{student_id}/atoz")
-async def get_atoz_log(student_id: int, db: sqlite3.Connection = Depends(get_db)):
+async def get_atoz_log(student_id: int):
+    return await db_pool.read(_load_atoz, student_id)
+
+def _load_atoz(db, student_id):
     row = db.execute("SELECT * FROM atoz_logs WHERE student_id=? ORDER BY id DESC LIMIT 1", (student_id,)).fetchone()
     if row:
         return dict(row)
@@ -539,9 +1344,8 @@ async def get_atoz_log(student_id: int, db: sqlite3.Connection = Depends(get_db)
         return {"current_score": 50, "future_score": 80, "rms_plan": "", "future_goal": ""}
 
 @api.post("/students/{student_id}/atoz")
-async def save_atoz_log(student_id: int, req: AtozUpdateRequest, db: sqlite3.Connection = Depends(get_db)):
-    db.execute("INSERT INTO atoz_logs (student_id, current_score, future_score, rms_plan, future_goal) VALUES (?, ?, ?, ?, ?)", (student_id, req.current_score, req.future_score, req.rms_plan, req.future_goal))
-    db.commit()
+async def save_atoz_log(student_id: int, req: AtozUpdateRequest, durable: bool = False):
+    await event_writer.write("INSERT INTO atoz_logs (student_id, current_score, future_score, rms_plan, future_goal) VALUES (?, ?, ?, ?, ?)", (student_id, req.current_score, req.future_score, req.rms_plan, req.future_goal), durable=durable, on_commit=lambda: student_versions.bump(student_id))
     return {"status": "saved"}
 
 # ==========================================
@@ -549,38 +1353,170 @@ async def save_atoz_log(student_id: int, req: AtozUpdateRequest, db: sqlite3.Con
 # ==========================================
 
 @api.get("/students/{student_id}/dashboard")
-async def get_dashboard(student_id: int, db: sqlite3.Connection = Depends(get_db)):
+async def get_dashboard(student_id: int):
+    return await db_pool.read(_load_dashboard, student_id)
+
+def _load_dashboard(db, student_id):
     pq = db.execute("SELECT * FROM pq_scores WHERE student_id=? ORDER BY updated_at DESC LIMIT 1", (student_id,)).fetchone()
-    pq_data = dict(pq) if pq else {"homework": 0, "attitude": 0, "organization": 0, "test_prep": 0, "review": 0}
     log_rows = db.execute("SELECT log_date as date, tutor_name as tutor, log_content as content FROM tutoring_logs WHERE student_id=? ORDER BY log_date DESC LIMIT 10", (student_id,)).fetchall()
+    pq_data = dict(pq) if pq else {"homework": 0, "attitude": 0, "organization": 0, "test_prep": 0, "review": 0}
     logs = [dict(r) for r in log_rows]
     if not logs:
         logs = [{"date": str(date.today()), "tutor": "System", "content": "Welcome to DreamARC!"}]
     return {"pq_scores": pq_data, "recent_logs": logs}
 
 @api.get("/students/{student_id}/rmsq-stats")
-async def get_rmsq_stats(student_id: int, db: sqlite3.Connection = Depends(get_db)):
-    rows = db.execute("SELECT week_label as label, lambda_score as lambda_val, rmsq_score as rmsq FROM rmsq_weekly_logs WHERE student_id=? ORDER BY id ASC", (str(student_id),)).fetchall()
-    data = [dict(r) for r in rows]
+async def get_rmsq_stats(student_id: int):
+    return await db_pool.read(_load_rmsq_stats, student_id)
+
+def _load_rmsq_stats(db, student_id):
+    summary = rmsq.load_summary(db, student_id)
+    data = rmsq.load_series(db, student_id, summary["n"], RMSQ_SERIES_POINTS) if summary else []
     insight = {"status": "Ready", "color": "#94a3b8", "judy_advice": "Waiting for data.", "samie_advice": "Let's begin!"}
 
-    if data:
-        curr = data[-1]
-        prev = data[-2] if len(data) > 1 else curr
-        lam = float(curr["lambda_val"])
-        d_lam = lam - float(prev["lambda_val"])
+    if summary:
+        lam = float(summary["latest_lambda"])
+        d_lam = float(summary["delta"])
         if lam >= 4.0:
             insight = {"status": "Critical", "color": "#ef4444", "judy_advice": "Stop new topics. Review basics.", "samie_advice": "It's okay to pause. Let's do one small step."}
         elif d_lam < 0:
             insight = {"status": "Golden Path", "color": "#10b981", "judy_advice": "Retention is improving.", "samie_advice": "You are fighting back against the entropy!"}
 
-    return {"graph_data": data, "insight": insight}
+    if summary:
+        summary.pop("recent_json", None)
+    return {"graph_data": data, "insight": insight, "summary": summary}
+
+@api.post("/students/{student_id}/rmsq-log")
+async def save_rmsq_log(student_id: int, req: RmsqLogRequest):
+    summary = await db_pool.write(rmsq.record_week, student_id, req.week_label, req.lambda_score, req.rmsq_score, req.context_note)
+    student_versions.bump(student_id)
+    summary.pop("recent_json", None)
+    return {"status": "saved", "summary": summary}
+
+# --- COHORT ANALYTICS ---
+async def _cohort_data() -> "cohort.CohortData":
+    if cohort.np is None:
+        raise HTTPException(503, "Cohort analytics requires numpy")
+    data = cohort_cache.get()
+    if data is None:
+        async with cohort_load_lock:
+            data = cohort_cache.get()
+            if data is None:
+                generation = cohort_cache.generation
+                data = await db_pool.read(cohort.load)
+                cohort_cache.put(data, generation)
+    return data
+
+@api.get("/cohort/lambda-distribution")
+async def cohort_lambda_distribution(grade: Optional[str] = None):
+    return {"topics": (await _cohort_data()).lambda_distribution(grade)}
+
+@api.get("/cohort/struggling")
+async def cohort_struggling(grade: Optional[str] = None, limit: int = 50):
+    return {"threshold": cohort.STRUGGLE_LAMBDA, "students": (await _cohort_data()).struggling_students(grade, max(1, min(limit, PAGE_LIMIT_MAX)))}
+
+@api.get("/cohort/pq-averages")
+async def cohort_pq_averages(grade: Optional[str] = None):
+    return (await _cohort_data()).pq_averages(grade)
+
+@api.get("/cohort/monster-defeat-rates")
+async def cohort_monster_defeat_rates(grade: Optional[str] = None):
+    return (await _cohort_data()).monster_defeat_rates(grade)
+
+@api.get("/cohort/cache-stats")
+def cohort_cache_stats():
+    return cohort_cache.stats()
+
+# --- AGGREGATED OVERVIEW ---
+OVERVIEW_SECTIONS = {
+    "dashboard": _load_dashboard,
+    "rmsq_stats": _load_rmsq_stats,
+    "pq_waterfall": lambda db, sid: waterfall.load_view(db, sid, WATERFALL_WINDOW),
+    "atoz": _load_atoz,
+    "diary": lambda db, sid: _keyset_rows(db, "entry_date, content", "diary_entries", sid, OVERVIEW_PAGE_SIZE, None, key="entry_date"),
+    "gc_messages": lambda db, sid: _keyset_rows(db, "sender_name, message_content", "gc_messages", sid, OVERVIEW_PAGE_SIZE, None),
+    "monsters": lambda db, sid: [dict(r) for r in _load_monsters(db, sid)],
+}
+
+def _load_overview(db, student_id, sections):
+    # One pooled connection, one read transaction: every section sees the same snapshot.
+    db.execute("BEGIN")
+    try:
+        result, cursors = {}, {}
+        for name in sections:
+            value = OVERVIEW_SECTIONS[name](db, student_id)
+            if name in ("diary", "gc_messages"):
+                value, cursors[name] = value
+            result[name] = value
+    finally:
+        db.rollback()
+    result["next_cursors"] = cursors
+    return result
+
+@api.get("/students/{student_id}/overview")
+async def get_student_overview(student_id: int, request: Request, fields: Optional[str] = None):
+    """Everything the student page loads on mount, behind a strong ETag.
+
+    ``fields`` is a comma-separated subset of the section names.  The ETag is
+    derived from the student's write version, so an unchanged reload is a
+    304 without running a query.
+    """
+    sections = [f for f in (fields or "").split(",") if f] or list(OVERVIEW_SECTIONS)
+    unknown = [f for f in sections if f not in OVERVIEW_SECTIONS]
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+    etag = student_versions.etag(student_id, ",".join(sorted(sections)) if fields else "")
+    if etag in (request.headers.get("if-none-match") or ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    result = await db_pool.read(_load_overview, student_id, sections)
+    if "monsters" in sections and not result["monsters"]:
+        result["monsters"] = [dict(r) for r in await _restock_monsters(student_id)]
+        etag = student_versions.etag(student_id, ",".join(sorted(sections)) if fields else "")
+    return JSONResponse(result, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
 app.include_router(api)
 
-@app.on_event("startup")
-def startup():
-    setup_database()
-    seed_default_users()
-    logger.info("🚀 DreamARC Hybrid Server Restored")
+async def _warm_up():
+    """After boot, import the deferred libraries off the event loop, then start the work that needs them."""
+    started = time.perf_counter()
+    if monster_factory.enabled:
+        # Stock generated before the restart is still good; only low pools are refilled below.
+        await monster_factory.load(db_pool)
+    if isinstance(openai_client, _LazyOpenAI):
+        await openai_client.ready()
+    for module in ("jose.jwt", "passlib.context"):
+        try:
+            await asyncio.to_thread(importlib.import_module, module)
+        except ImportError:
+            logger.warning(f"{module} is not installed")
+    boot_timings["warm_up_s"] = round(time.perf_counter() - started, 4)
+    for difficulty in DIFFICULTIES:
+        monster_factory.schedule_refill("Math", difficulty)
 
+@app.on_event("startup")
+async def startup():
+    started = time.perf_counter()
+    skipped = prepare_database()
+    event_writer.start()
+    if METRICS_ENABLED:
+        loop_lag.start()
+    app.state.warm_up = asyncio.get_running_loop().create_task(_warm_up())
+    boot_timings.update(database="fingerprint matched, skipped" if skipped else "migrated and seeded",
+                        startup_s=round(time.perf_counter() - started, 4))
+    logger.info(f"🚀 DreamARC Hybrid Server Restored (import {boot_timings['import_s']}s, startup {boot_timings['startup_s']}s, {boot_timings['database']})")
+
+@app.on_event("shutdown")
+async def shutdown():
+    warm_up = getattr(app.state, "warm_up", None)
+    if warm_up is not None:
+        warm_up.cancel()
+        await asyncio.gather(warm_up, return_exceptions=True)
+    await loop_lag.stop()
+    await monster_factory.close()
+    await conversation_store.close()
+    await event_writer.stop()
+    await tts_client.aclose()
+    password_hasher.close()
+    db_pool.close()
+
+boot_timings["import_s"] = round(time.perf_counter() - _IMPORT_STARTED, 4)
@@ -0,0 +1,131 @@
+# DreamARC Backend - lambda mastery update engine
+"""Apply lambda attempts in bulk.
+
+The update rule (per student/topic, in attempt order):
+
+    correct:  R_base = 0.5 if k >= 3 else 0.8
+              lambda' = max(0.1, lambda * (R_base + (1 - R_base) * (1 - alpha(tau) * beta(h))))
+              k' = k + 1
+    wrong:    lambda' = min(5.0, lambda + 1.5);  k' = 0
+
+Attempts on different (student, topic) keys are independent, so the NumPy
+path advances every key one step at a time as a vector; the pure-Python
+path is used for small batches or when NumPy is missing.  Both perform the
+same float operations in the same order, so results are identical.
+"""
+import sqlite3
+from typing import Any, Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY_MIN_BATCH = 32
+
+Key = Tuple[int, str]
+
+
+def alpha_tau(tau: float) -> float:
+    if tau <= 30:
+        return 1.0
+    if tau <= 60:
+        return 0.8
+    return 0.5
+
+
+def beta_h(h: int) -> float:
+    return 1.0 if (h is None or h == 0) else 0.5
+
+
+def _compute_python(lam0: List[float], k0: List[int], group: List[int], correct: List[int], eta: List[float]):
+    lam, k = list(lam0), list(k0)
+    old, new, streak = [0.0] * len(group), [0.0] * len(group), [0] * len(group)
+    for i, g in enumerate(group):
+        o = lam[g]
+        if correct[i]:
+            R_base = 0.5 if k[g] >= 3 else 0.8
+            delta = R_base + (1.0 - R_base) * (1.0 - eta[i])
+            lam[g] = max(0.1, o * delta)
+            k[g] += 1
+        else:
+            lam[g] = min(5.0, o + 1.5)
+            k[g] = 0
+        old[i], new[i], streak[i] = o, lam[g], k[g]
+    return old, new, streak, lam, k
+
+
+def _compute_numpy(lam0: List[float], k0: List[int], group: List[int], correct: List[int], eta: List[float]):
+    group_a = np.asarray(group, dtype=np.int64)
+    correct_a = np.asarray(correct, dtype=bool)
+    eta_a = np.asarray(eta, dtype=np.float64)
+    lam = np.asarray(lam0, dtype=np.float64)
+    k = np.asarray(k0, dtype=np.int64)
+
+    order = np.argsort(group_a, kind="stable")  # attempts grouped by key, original order kept
+    counts = np.bincount(group_a, minlength=len(lam0))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    old = np.empty(len(group), dtype=np.float64)
+    new = np.empty(len(group), dtype=np.float64)
+    streak = np.empty(len(group), dtype=np.int64)
+
+    for step in range(int(counts.max())):
+        idx = order[starts[counts > step] + step]  # the step-th attempt of every key that has one
+        g = group_a[idx]
+        o, kb, c = lam[g], k[g], correct_a[idx]
+        R_base = np.where(kb >= 3, 0.5, 0.8)
+        delta = R_base + (1.0 - R_base) * (1.0 - eta_a[idx])
+        n = np.where(c, np.maximum(0.1, o * delta), np.minimum(5.0, o + 1.5))
+        lam[g] = n
+        k[g] = np.where(c, kb + 1, 0)
+        old[idx], new[idx], streak[idx] = o, n, k[g]
+    return old.tolist(), new.tolist(), streak.tolist(), lam.tolist(), k.tolist()
+
+
+def _load_states(db: sqlite3.Connection, keys: Sequence[Key]) -> Dict[Key, Tuple[float, int]]:
+    states = {}
+    for i in range(0, len(keys), 400):
+        chunk = keys[i:i + 400]
+        placeholders = ",".join(["(?, ?)"] * len(chunk))
+        params = [v for key in chunk for v in key]
+        rows = db.execute(
+            f"SELECT student_id, topic_name, lambda_val, consecutive_correct FROM topic_mastery WHERE (student_id, topic_name) IN (VALUES {placeholders})",
+            params,
+        ).fetchall()
+        for r in rows:
+            states[(r[0], r[1])] = (float(r[2]) if r[2] else 1.0, int(r[3] or 0))
+    return states
+
+
+def apply_attempts(db: sqlite3.Connection, attempts: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Apply ``attempts`` (objects shaped like ``LambdaAttemptRequest``) in order.
+
+    Runs inside the caller's transaction; returns one result per attempt.
+    """
+    if not attempts:
+        return []
+    index: Dict[Key, int] = {}
+    group, correct, eta = [], [], []
+    for a in attempts:
+        key = (int(a.student_id), a.topic_name)
+        group.append(index.setdefault(key, len(index)))
+        correct.append(1 if int(a.correctness) == 1 else 0)
+        eta.append(alpha_tau(float(a.latency_tau)) * beta_h(int(a.dependency_h)))
+
+    keys = list(index)
+    states = _load_states(db, keys)
+    lam0 = [states.get(key, (1.0, 0))[0] for key in keys]
+    k0 = [states.get(key, (1.0, 0))[1] for key in keys]
+
+    compute = _compute_numpy if (np is not None and len(attempts) >= NUMPY_MIN_BATCH) else _compute_python
+    old, new, streak, lam, k = compute(lam0, k0, group, correct, eta)
+
+    db.executemany(
+        "INSERT INTO topic_mastery (student_id, topic_name, lambda_val, consecutive_correct, last_practiced_at) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP) "
+        "ON CONFLICT(student_id, topic_name) DO UPDATE SET lambda_val=excluded.lambda_val, consecutive_correct=excluded.consecutive_correct, last_practiced_at=CURRENT_TIMESTAMP",
+        [(key[0], key[1], float(lam[g]), int(k[g])) for g, key in enumerate(keys)],
+    )
+    return [
+        {"student_id": key[0], "topic_name": key[1], "old_lambda": float(old[i]), "new_lambda": float(new[i]), "consecutive_correct": int(streak[i])}
+        for i, key in enumerate(keys[g] for g in group)
+    ]
@@ -0,0 +1,115 @@
+# DreamARC Backend - per-student memory context cache
+"""In-process LRU of each student's assembled tutor memory.
+
+A chat turn needs the last three tutoring-log lines (Judy's ``mem_str``) and
+the A2G advice built from the newest diary entry and latest struggle.  The
+entry is loaded once and then kept current: diary writes invalidate it,
+tutoring-log writes are applied to it in place.  The struggle topic comes
+from ``lambda_logs``, which the attempt routes do not write (they update
+``topic_mastery``), so attempts leave the entry alone.
+
+A per-student generation stops a load that raced with a write from caching
+stale data.  Generations are drawn from one counter and kept for the
+``max_entries`` most recently written students; a forgotten student reads
+as the highest generation forgotten so far, so a load that started before
+the forgetting can never match.
+"""
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+TUTOR_MEMORY_LINES = 3
+
+
+class StudentMemory:
+    __slots__ = ("tutor_logs", "life_log", "struggle_topic")
+
+    def __init__(self, tutor_logs: List[str], life_log: Optional[str], struggle_topic: Optional[str]):
+        self.tutor_logs = tutor_logs
+        self.life_log = life_log
+        self.struggle_topic = struggle_topic
+
+    @property
+    def mem_str(self) -> str:
+        return "\n".join(self.tutor_logs)
+
+    @property
+    def a2g_advice(self) -> str:
+        """A2G Contextual Memory (Big Brother/Sister Logic)."""
+        if not (self.life_log or self.struggle_topic):
+            return ""
+        memory_context = "\n[SYSTEM MEMORY ADVICE]: "
+        if self.life_log:
+            memory_context += f"The student recently mentioned: '{self.life_log}'. "
+        if self.struggle_topic:
+            memory_context += f"They struggled with '{self.struggle_topic}' recently; check if they've recovered. "
+        return memory_context
+
+
+class StudentMemoryCache:
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[int, StudentMemory]" = OrderedDict()
+        self._generations: "OrderedDict[int, int]" = OrderedDict()
+        self._forgotten = 0
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def generation(self, student_id: int) -> int:
+        with self._lock:
+            return self._generations.get(student_id, self._forgotten)
+
+    def _bump(self, student_id: int):
+        self._generations[student_id] = next(self._counter)
+        self._generations.move_to_end(student_id)
+        while len(self._generations) > self.max_entries:
+            _, forgotten = self._generations.popitem(last=False)
+            self._forgotten = max(self._forgotten, forgotten)
+
+    def get(self, student_id: int) -> Optional[StudentMemory]:
+        with self._lock:
+            memory = self._entries.get(student_id)
+            if memory is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(student_id)
+            self.hits += 1
+            return memory
+
+    def put(self, student_id: int, memory: StudentMemory, generation: int):
+        """Cache ``memory`` unless a write landed since ``generation`` was read."""
+        with self._lock:
+            if self._generations.get(student_id, self._forgotten) != generation:
+                return
+            self._entries[student_id] = memory
+            self._entries.move_to_end(student_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, student_id: int):
+        with self._lock:
+            self._bump(student_id)
+            if self._entries.pop(student_id, None) is not None:
+                self.invalidations += 1
+
+    def record_tutor_log(self, student_id: int, log_content: str):
+        with self._lock:
+            self._bump(student_id)
+            memory = self._entries.get(student_id)
+            if memory is not None:
+                memory.tutor_logs = ([log_content] + memory.tutor_logs)[:TUTOR_MEMORY_LINES]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,280 @@
+# DreamARC Backend - metrics and slow-request traces
+"""A small Prometheus-compatible registry, with no client library needed.
+
+``Registry.render`` emits the text exposition format (v0.0.4), so
+``/metrics`` can be scraped by Prometheus, Grafana Agent or anything
+else that speaks that format.  Counters, gauges and histograms are
+labelled, thread-safe and cheap enough for the hot path.  Gauges that mirror another component's state (pool depth, queue
+lengths) are read at scrape time through ``Registry.collect``.
+
+``MetricsMiddleware`` is a plain ASGI middleware: it times every request
+up to the last body byte, labels it with the matched route template (not
+the raw path, to keep cardinality bounded), and tracks requests in
+flight.  Streamed bodies (sent in more than one chunk) are timed into
+``http_stream_duration_seconds`` instead, so a slow token stream does not
+read as a slow request; Server-Sent Events subscriptions, which stay open
+by design, are counted but not timed.  Components add spans to the current request with ``span``; a
+request slower than ``slow_seconds`` keeps its spans as a trace with
+probability ``sample_rate``, and the newest ``max_traces`` are returned
+by ``TraceBuffer.recent``.
+
+``LoopLagMonitor`` samples event-loop lag: how late a timer fires.
+"""
+import asyncio
+import bisect
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+Collector = Callable[[], Iterable[Tuple[Dict[str, str], float]]]
+
+_spans: contextvars.ContextVar[Optional[List[Tuple[str, float, float]]]] = contextvars.ContextVar("metrics_spans", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, *labels: str, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def count(self, *labels: str) -> int:
+        row = self._values.get(labels)
+        return int(sum(row[:-1])) if row else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self.header()
+        for labels, row in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = 'le="%s"' % _num(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {_num(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {row[-1]!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {_num(cumulative)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Tuple[str, str, str, Collector]] = []
+
+    def _add(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def collect(self, name: str, help: str, fn: Collector, kind: str = "gauge"):
+        """Scrape-time values: ``fn`` yields ``(labels, value)`` pairs."""
+        self._collectors.append((name, help, kind, fn))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for name, help, kind, fn in self._collectors:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in fn():
+                lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# --- request traces --------------------------------------------------------
+def span(name: str, seconds: float, wait: float = 0.0):
+    """Attach a timed step to the current request's trace, if one is being collected."""
+    spans = _spans.get()
+    if spans is not None and len(spans) < 200:
+        spans.append((name, seconds, wait))
+
+
+class TraceBuffer:
+    def __init__(self, slow_seconds: float = 1.0, sample_rate: float = 1.0, max_traces: int = 50):
+        self.slow_seconds = slow_seconds
+        self.sample_rate = sample_rate
+        self._traces: Deque[Dict[str, Any]] = deque(maxlen=max_traces)
+
+    def consider(self, method: str, route: str, status: int, seconds: float, spans: List[Tuple[str, float, float]]):
+        if seconds < self.slow_seconds or random.random() >= self.sample_rate:
+            return
+        self._traces.append({
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "method": method,
+            "route": route,
+            "status": status,
+            "duration_ms": round(seconds * 1000, 2),
+            "spans": [{"name": n, "ms": round(s * 1000, 2), **({"wait_ms": round(w * 1000, 2)} if w else {})} for n, s, w in spans],
+        })
+
+    def recent(self) -> List[Dict[str, Any]]:
+        return list(reversed(self._traces))
+
+
+# --- middleware -------------------------------------------------------------
+class MetricsMiddleware:
+    def __init__(self, app, registry: Registry, traces: Optional[TraceBuffer] = None, skip: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.traces = traces
+        self.skip = tuple(skip)
+        self.requests = registry.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+        self.latency = registry.histogram("http_request_duration_seconds", "HTTP request latency up to the last body byte", ("method", "route"))
+        self.stream_latency = registry.histogram("http_stream_duration_seconds", "Streamed HTTP response time up to the last body byte",
+                                                 ("method", "route"), buckets=LATENCY_BUCKETS + (60.0, 120.0))
+        self.in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being served")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip):
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        kind = "request"
+
+        async def send_wrapper(message):
+            nonlocal status, kind
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = dict(message.get("headers") or ()).get(b"content-type", b"")
+                if content_type.startswith(b"text/event-stream"):
+                    kind = "events"
+            elif message["type"] == "http.response.body" and message.get("more_body") and kind == "request":
+                kind = "stream"
+            await send(message)
+
+        spans: List[Tuple[str, float, float]] = []
+        token = _spans.set(spans if self.traces is not None else None)
+        self.in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight.dec()
+            _spans.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.requests.inc(scope["method"], route, str(status))
+            if kind == "stream":
+                self.stream_latency.observe(scope["method"], route, value=elapsed)
+            elif kind == "request":
+                self.latency.observe(scope["method"], route, value=elapsed)
+            if self.traces is not None and kind == "request":
+                self.traces.consider(scope["method"], route, status, elapsed, spans)
+
+
+# --- event loop lag -----------------------------------------------------------
+class LoopLagMonitor:
+    def __init__(self, registry: Registry, interval: float = 0.5):
+        self.interval = interval
+        self.lag = registry.histogram("event_loop_lag_seconds", "How late a periodic event-loop timer fired",
+                                      buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+        self.last = registry.gauge("event_loop_lag_last_seconds", "Most recent event-loop lag sample")
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lag.observe(value=lag)
+            self.last.set(value=lag)
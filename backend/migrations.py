@@ -0,0 +1,187 @@
+# DreamARC Backend - versioned schema migrations
+"""Ordered, recorded schema migrations.
+
+Each migration runs once, inside its own transaction, and is recorded in
+``schema_migrations``.  A step is either SQL or a ``step(conn)`` callable for
+data fixes SQL cannot express; startup returns immediately when the database is
+already at the latest version.  ``check_query_plans`` runs ``EXPLAIN QUERY
+PLAN`` over the hot per-student queries and reports any that fall back to a
+table scan or a temporary sort.
+
+    python -m backend.migrations [DB_PATH] [--check]
+"""
+import os
+import re
+import sqlite3
+import sys
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from . import rmsq
+
+Step = Union[str, Callable[[sqlite3.Connection], None]]
+
+MIGRATIONS: List[Tuple[int, str, Sequence[Step]]] = [
+    (1, "baseline schema", [
+        "CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE, hashed_password TEXT, role TEXT DEFAULT 'student')",
+        "CREATE TABLE IF NOT EXISTS students (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER UNIQUE, grade TEXT, FOREIGN KEY(user_id) REFERENCES users(id))",
+        "CREATE TABLE IF NOT EXISTS pq_scores (id INTEGER PRIMARY KEY, student_id INTEGER, session_date DATE, homework INTEGER DEFAULT 0, attitude INTEGER DEFAULT 0, valid_question INTEGER DEFAULT 0, solving_question INTEGER DEFAULT 0, organization INTEGER DEFAULT 0, test_prep INTEGER DEFAULT 0, review INTEGER DEFAULT 0, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+        "CREATE TABLE IF NOT EXISTS tutoring_logs (id INTEGER PRIMARY KEY, student_id INTEGER, log_date DATE, log_content TEXT, duration_minutes INTEGER DEFAULT 0, tutor_name TEXT)",
+        "CREATE TABLE IF NOT EXISTS topic_mastery (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, topic_name TEXT, lambda_val REAL DEFAULT 1.0, last_practiced_at DATETIME DEFAULT CURRENT_TIMESTAMP, consecutive_correct INTEGER DEFAULT 0)",
+        "CREATE TABLE IF NOT EXISTS rmsq_weekly_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id TEXT NOT NULL, week_label TEXT, lambda_score REAL, rmsq_score INTEGER, context_note TEXT, recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+        "CREATE TABLE IF NOT EXISTS game_monsters (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, monster_name TEXT, monster_type TEXT, topic_name TEXT, question_text TEXT, correct_answer TEXT, hp_max INTEGER, hp_current INTEGER, xp_reward INTEGER, is_defeated BOOLEAN DEFAULT 0, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+        "CREATE TABLE IF NOT EXISTS diary_entries (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, entry_date DATE, content TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+        "CREATE TABLE IF NOT EXISTS pq_waterfall_state (student_id INTEGER, metric_name TEXT, history_json TEXT, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (student_id, metric_name))",
+        "CREATE TABLE IF NOT EXISTS atoz_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, current_score INTEGER, future_score INTEGER, rms_plan TEXT, future_goal TEXT, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+        "CREATE TABLE IF NOT EXISTS gc_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, sender_id TEXT, sender_name TEXT, message_content TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+        "CREATE TABLE IF NOT EXISTS lambda_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, topic TEXT, lambda_val REAL, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    ]),
+    (2, "per-student indexes", [
+        # Older databases may hold duplicate (student_id, topic_name) rows; keep the newest.
+        "DELETE FROM topic_mastery WHERE id NOT IN (SELECT MAX(id) FROM topic_mastery GROUP BY student_id, topic_name)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_topic_mastery_student_topic ON topic_mastery (student_id, topic_name)",
+        "CREATE INDEX IF NOT EXISTS ix_pq_scores_student_updated ON pq_scores (student_id, updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_tutoring_logs_student ON tutoring_logs (student_id)",
+        "CREATE INDEX IF NOT EXISTS ix_tutoring_logs_student_date ON tutoring_logs (student_id, log_date)",
+        "CREATE INDEX IF NOT EXISTS ix_diary_entries_student_created ON diary_entries (student_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_diary_entries_student_date ON diary_entries (student_id, entry_date)",
+        "CREATE INDEX IF NOT EXISTS ix_gc_messages_student_created ON gc_messages (student_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_lambda_logs_student_ts_lambda ON lambda_logs (student_id, timestamp, lambda_val)",
+        "CREATE INDEX IF NOT EXISTS ix_game_monsters_student_defeated ON game_monsters (student_id, is_defeated)",
+        "CREATE INDEX IF NOT EXISTS ix_atoz_logs_student ON atoz_logs (student_id)",
+        "CREATE INDEX IF NOT EXISTS ix_rmsq_weekly_logs_student ON rmsq_weekly_logs (student_id)",
+    ]),
+    (3, "pq waterfall delta storage", [
+        "CREATE TABLE IF NOT EXISTS pq_waterfall_entries (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, metric_name TEXT, entry_json TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+        "CREATE INDEX IF NOT EXISTS ix_pq_waterfall_entries_student_metric ON pq_waterfall_entries (student_id, metric_name, id)",
+        "ALTER TABLE pq_waterfall_state ADD COLUMN tail_json TEXT",
+        "ALTER TABLE pq_waterfall_state ADD COLUMN snapshot_upto INTEGER DEFAULT 0",
+    ]),
+    (4, "integer rmsq student ids and rolling aggregates", [
+        # student_id was TEXT, so integer lookups never matched; rebuild the table as INTEGER.
+        "CREATE TABLE rmsq_weekly_logs_v4 (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER NOT NULL, week_label TEXT, lambda_score REAL, rmsq_score INTEGER, context_note TEXT, recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+        "INSERT INTO rmsq_weekly_logs_v4 (id, student_id, week_label, lambda_score, rmsq_score, context_note, recorded_at) SELECT id, CAST(student_id AS INTEGER), week_label, lambda_score, rmsq_score, context_note, recorded_at FROM rmsq_weekly_logs",
+        "DROP TABLE rmsq_weekly_logs",
+        "ALTER TABLE rmsq_weekly_logs_v4 RENAME TO rmsq_weekly_logs",
+        "CREATE INDEX IF NOT EXISTS ix_rmsq_weekly_logs_student ON rmsq_weekly_logs (student_id)",
+        "CREATE TABLE IF NOT EXISTS rmsq_aggregates (student_id INTEGER PRIMARY KEY, n INTEGER, latest_label TEXT, latest_lambda REAL, prev_lambda REAL, delta REAL, moving_avg REAL, min_lambda REAL, max_lambda REAL, latest_rmsq INTEGER, recent_json TEXT, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    ]),
+    (5, "canonical monster answers", [
+        # Filled on insert; older rows start NULL and are canonicalized when first indexed.
+        "ALTER TABLE game_monsters ADD COLUMN answer_canonical TEXT",
+    ]),
+    (6, "app metadata", [
+        # Small key/value facts about the database itself, e.g. the boot fingerprint.
+        "CREATE TABLE IF NOT EXISTS app_meta (key TEXT PRIMARY KEY, value TEXT)",
+    ]),
+    (7, "rmsq aggregates maintained by trigger", [
+        # Every insert into the logs folds into the aggregate, whichever code path wrote it.
+        rmsq.AGGREGATE_TRIGGER,
+        # v4 created the table empty; fold in every log written before it.
+        rmsq.backfill,
+    ]),
+    (8, "persisted monster pools", [
+        "CREATE TABLE IF NOT EXISTS monster_pool (id INTEGER PRIMARY KEY AUTOINCREMENT, topic_name TEXT, difficulty TEXT, monster_json TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Hot per-student queries as issued by the routes; each must be served by an index.
+HOT_QUERIES: Dict[str, Tuple[str, Sequence]] = {
+    "dashboard.pq": ("SELECT * FROM pq_scores WHERE student_id=? ORDER BY updated_at DESC LIMIT 1", (1,)),
+    "dashboard.logs": ("SELECT log_date as date, tutor_name as tutor, log_content as content FROM tutoring_logs WHERE student_id=? ORDER BY log_date DESC LIMIT 10", (1,)),
+    "tutor.memory": ("SELECT log_content FROM tutoring_logs WHERE student_id=? ORDER BY id DESC LIMIT 3", (1,)),
+    "a2g.diary": ("SELECT content FROM diary_entries WHERE student_id=? ORDER BY created_at DESC LIMIT 1", (1,)),
+    "a2g.struggles": ("SELECT topic FROM lambda_logs WHERE student_id=? AND lambda_val > 3.5 ORDER BY timestamp DESC LIMIT 1", (1,)),
+    "lambda.mastery": ("SELECT * FROM topic_mastery WHERE student_id=? AND topic_name=?", (1, "Math")),
+    "review.topics": ("SELECT topic_name, lambda_val, consecutive_correct, last_practiced_at FROM topic_mastery WHERE student_id=?", (1,)),
+    "diary.page": ("SELECT id, created_at, entry_date, content FROM diary_entries WHERE student_id=? AND (entry_date, id) < (?, ?) ORDER BY entry_date DESC, id DESC LIMIT ?", (1, "2026-01-01", 1, 21)),
+    "gc.page": ("SELECT id, created_at, sender_name, message_content FROM gc_messages WHERE student_id=? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?", (1, "2026-01-01", 1, 21)),
+    "gc.catchup": ("SELECT id, sender_name, message_content, created_at FROM gc_messages WHERE student_id=? AND id>? ORDER BY created_at, id", (1, 0)),
+    "game.monsters": ("SELECT * FROM game_monsters WHERE student_id=? AND is_defeated=0", (1,)),
+    "atoz.latest": ("SELECT * FROM atoz_logs WHERE student_id=? ORDER BY id DESC LIMIT 1", (1,)),
+    "waterfall.pending": ("SELECT COUNT(*) FROM pq_waterfall_entries WHERE student_id=? AND metric_name=? AND id>?", (1, "Homework", 0)),
+    "waterfall.deltas": ("SELECT id, metric_name, entry_json FROM pq_waterfall_entries WHERE student_id=? ORDER BY metric_name, id", (1,)),
+    "rmsq.summary": ("SELECT * FROM rmsq_aggregates WHERE student_id=?", (1,)),
+    "rmsq.recent": ("SELECT week_label as label, lambda_score as lambda_val, rmsq_score as rmsq FROM rmsq_weekly_logs WHERE student_id=? ORDER BY id DESC LIMIT ?", (1, 52)),
+    "rmsq.series": ("SELECT week_label, lambda_score, rmsq_score FROM rmsq_weekly_logs WHERE student_id=? ORDER BY id", (1,)),
+}
+
+# A plan step is bad when it scans a table without any index ("SCAN items") or
+# sorts in a temp b-tree; "SCAN items USING [COVERING] INDEX ..." is fine.
+_BAD_PLAN = re.compile(r"^(SCAN \w+\b(?! USING)|USE TEMP B-TREE)")
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name TEXT, applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    """Apply pending migrations in order and return the versions applied."""
+    version = current_version(conn)
+    conn.commit()
+    applied = []
+    for number, name, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        conn.execute("BEGIN")
+        try:
+            for step in statements:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)", (number, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(number)
+    return applied
+
+
+def get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    try:
+        row = conn.execute("SELECT value FROM app_meta WHERE key=?", (key,)).fetchone()
+    except sqlite3.OperationalError:
+        return None  # database predates v6
+    return row[0] if row else None
+
+
+def set_meta(conn: sqlite3.Connection, key: str, value: str):
+    conn.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def check_query_plans(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """Return ``{label: plan}`` for every hot query that scans or sorts."""
+    failures = {}
+    for label, (sql, params) in HOT_QUERIES.items():
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        if any(_BAD_PLAN.match(detail) for detail in plan):
+            failures[label] = plan
+    return failures
+
+
+def main(argv: Sequence[str]) -> int:
+    args = [a for a in argv if not a.startswith("--")]
+    db_path = args[0] if args else os.getenv("DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "dreamarc.db"))
+    conn = sqlite3.connect(db_path)
+    try:
+        applied = migrate(conn)
+        print(f"schema at v{current_version(conn)} (applied: {applied or 'none'})")
+        if "--check" in argv:
+            failures = check_query_plans(conn)
+            for label, plan in failures.items():
+                print(f"SCAN  {label}: {' | '.join(plan)}")
+            if failures:
+                return 1
+            print(f"OK    {len(HOT_QUERIES)} hot queries use indexes")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
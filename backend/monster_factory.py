@@ -0,0 +1,264 @@
+# DreamARC Backend - pre-generated monster pools
+"""Keep a bounded pool of LLM-written monsters per (topic, difficulty).
+
+``take`` pops from the pool without waiting on anything.  Whenever a pool
+is at or below ``low_water`` a background refill is scheduled (at most one
+per pool), which asks the LLM for a batch of questions and tops the pool
+up to ``pool_size``.  Upstream calls are rate-limited by a token bucket and
+run through the LLM dispatcher at background priority, so refills never
+crowd out tutor traffic.
+
+Generated monsters are also written to the ``monster_pool`` table once
+``load`` has attached a ``DBPool``, and ``load`` restores them at boot, so a
+restart keeps the stock it paid for and only refills pools that are low.
+A monster leaves the table in the same transaction that seeds it into
+``game_monsters`` (``consume_pool_rows``).
+
+Difficulty follows the student's lambda for the topic: a high forgetting
+rate gets gentler monsters, a low one gets bosses.
+
+``FakeMonsterLLM`` implements the slice of the OpenAI client used here and
+writes arithmetic questions locally, for offline runs and tests.
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from .db import DBPool
+from .llm_dispatch import BACKGROUND, LLMDispatcher
+
+logger = logging.getLogger(__name__)
+
+# difficulty -> (hp, xp)
+DIFFICULTIES: Dict[str, Tuple[int, int]] = {
+    "MOB": (100, 50),
+    "ELITE": (400, 150),
+    "BOSS": (1500, 500),
+}
+_DIFFICULTY_HINTS = {
+    "MOB": "one-step warm-up questions",
+    "ELITE": "two- or three-step questions",
+    "BOSS": "challenging multi-step questions",
+}
+
+PoolKey = Tuple[str, str]
+
+
+def difficulty_for(lambda_val: Optional[float]) -> str:
+    lam = 1.0 if lambda_val is None else float(lambda_val)
+    if lam >= 3.5:
+        return "MOB"
+    if lam <= 1.0:
+        return "BOSS"
+    return "ELITE"
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class MonsterFactory:
+    def __init__(self, llm: Any, model: str, pool_size: int = 12, low_water: int = 4, batch_size: int = 6,
+                 calls_per_minute: float = 20, dispatcher: Optional[LLMDispatcher] = None, timeout: float = 120.0):
+        self.llm = llm
+        self.model = model
+        self.pool_size = pool_size
+        self.low_water = low_water
+        self.batch_size = batch_size
+        self.served = 0
+        self.empty = 0
+        self.generated = 0
+        self.failures = 0
+        self.loaded = 0
+        self.store: Optional[DBPool] = None
+        self._pools: Dict[PoolKey, Deque[Dict[str, Any]]] = {}
+        self._refilling: Set[PoolKey] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.dispatcher = dispatcher or LLMDispatcher(max_concurrency=2)
+        self.timeout = timeout
+        self._bucket = _TokenBucket(calls_per_minute, burst=2)
+
+    @property
+    def enabled(self) -> bool:
+        return self.llm is not None
+
+    async def load(self, store: DBPool) -> int:
+        """Restore persisted pools and persist later refills to ``store``; returns how many."""
+        self.store = store
+        rows, overflow = await store.read(_load_pool_rows), []
+        for pool_id, topic, difficulty, monster_json in rows:
+            pool = self._pools.setdefault((topic, difficulty), deque(maxlen=self.pool_size))
+            if len(pool) >= self.pool_size:
+                overflow.append(pool_id)
+                continue
+            pool.append(dict(json.loads(monster_json), pool_id=pool_id))
+            self.loaded += 1
+        if overflow:
+            await store.write(consume_pool_rows, [{"pool_id": i} for i in overflow])
+        return self.loaded
+
+    def take(self, topic: str, difficulty: str) -> Optional[Dict[str, Any]]:
+        """Pop one monster, or None if the pool is empty; schedules a refill when low."""
+        key = (topic, difficulty)
+        pool = self._pools.setdefault(key, deque(maxlen=self.pool_size))
+        monster = pool.popleft() if pool else None
+        if monster is None:
+            self.empty += 1
+        else:
+            self.served += 1
+        if len(pool) <= self.low_water:
+            self.schedule_refill(topic, difficulty)
+        return monster
+
+    def give_back(self, topic: str, difficulty: str, monster: Dict[str, Any]):
+        """Return an unused monster from ``take`` to the front of its pool (dropped if the pool refilled meanwhile)."""
+        pool = self._pools.setdefault((topic, difficulty), deque(maxlen=self.pool_size))
+        if len(pool) < self.pool_size:
+            pool.appendleft(monster)
+            self.served -= 1
+
+    def schedule_refill(self, topic: str, difficulty: str):
+        """Start a background refill unless the pool is above ``low_water`` or already refilling."""
+        key = (topic, difficulty)
+        if not self.enabled or key in self._refilling or len(self._pools.get(key, ())) > self.low_water:
+            return
+        self._refilling.add(key)
+        task = asyncio.get_running_loop().create_task(self._refill(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refill(self, key: PoolKey):
+        try:
+            pool = self._pools.setdefault(key, deque(maxlen=self.pool_size))
+            while len(pool) < self.pool_size:
+                await self._bucket.acquire()
+                count = min(self.batch_size, self.pool_size - len(pool))
+                batch = await self.dispatcher.call(lambda: self._generate(*key, count), BACKGROUND, timeout=self.timeout)
+                if not batch:
+                    break
+                if self.store is not None:
+                    for monster, pool_id in zip(batch, await self.store.write(_insert_pool_rows, key, batch)):
+                        monster["pool_id"] = pool_id
+                pool.extend(batch)
+                self.generated += len(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Monster refill for {key} failed: {e}")
+        finally:
+            self._refilling.discard(key)
+
+    async def _generate(self, topic: str, difficulty: str, count: int) -> List[Dict[str, Any]]:
+        prompt = (
+            f"Write {count} {_DIFFICULTY_HINTS[difficulty]} for a student practising {topic}. "
+            "Each has a short fantasy monster name, the question, and a short exact answer "
+            "(a number or expression). Respond in JSON: "
+            '{"monsters": [{"name": "...", "question": "...", "answer": "..."}]}'
+        )
+        resp = await self.llm.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "system", "content": prompt}],
+            response_format={"type": "json_object"},
+        )
+        data = json.loads(resp.choices[0].message.content or "{}")
+        hp, xp = DIFFICULTIES[difficulty]
+        monsters = []
+        for m in data.get("monsters", [])[:count]:
+            if not isinstance(m, dict) or not m.get("question") or not str(m.get("answer", "")).strip():
+                continue
+            monsters.append({
+                "monster_name": str(m.get("name") or f"{topic} Wraith")[:60],
+                "monster_type": difficulty,
+                "topic_name": topic,
+                "question_text": str(m["question"]),
+                "correct_answer": str(m["answer"]).strip(),
+                "hp_max": hp,
+                "hp_current": hp,
+                "xp_reward": xp,
+            })
+        return monsters
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "served": self.served,
+            "empty": self.empty,
+            "generated": self.generated,
+            "failures": self.failures,
+            "loaded": self.loaded,
+            "refilling": len(self._refilling),
+            "pools": {f"{t}/{d}": len(p) for (t, d), p in self._pools.items()},
+        }
+
+
+def _load_pool_rows(db) -> List[Tuple[int, str, str, str]]:
+    return db.execute("SELECT id, topic_name, difficulty, monster_json FROM monster_pool ORDER BY id").fetchall()
+
+
+def _insert_pool_rows(db, key: PoolKey, monsters: List[Dict[str, Any]]) -> List[int]:
+    return [db.execute("INSERT INTO monster_pool (topic_name, difficulty, monster_json) VALUES (?, ?, ?)",
+                       (key[0], key[1], json.dumps(m))).lastrowid for m in monsters]
+
+
+def consume_pool_rows(db, monsters: List[Dict[str, Any]]):
+    """Delete taken monsters from ``monster_pool``; runs in the caller's transaction."""
+    db.executemany("DELETE FROM monster_pool WHERE id=?", [(m["pool_id"],) for m in monsters if m.get("pool_id")])
+
+
+class FakeMonsterLLM:
+    """Offline stand-in for ``AsyncOpenAI`` that answers monster prompts locally."""
+
+    _NAMES = ("Sum Slime", "Carry Goblin", "Product Troll", "Quotient Wyrm", "Factor Hydra", "Power Lich")
+
+    def __init__(self, seed: Optional[int] = None, latency: float = 0.0):
+        self.calls = 0
+        self.latency = latency
+        self._rng = random.Random(seed)
+        self.chat = self
+        self.completions = self
+
+    async def create(self, model: str, messages: List[Dict[str, Any]], **kwargs):
+        from types import SimpleNamespace
+
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        count = int(re.match(r"Write (\d+)", prompt).group(1)) if re.match(r"Write (\d+)", prompt) else 1
+        scale = 100 if "challenging" in prompt else 20 if "two- or three-step" in prompt else 10
+        monsters = []
+        for _ in range(count):
+            a, b, c = (self._rng.randint(2, scale) for _ in range(3))
+            if scale == 10:
+                question, answer = f"What is {a} + {b}?", a + b
+            else:
+                question, answer = f"What is {a} * {b} - {c}?", a * b - c
+            monsters.append({"name": self._rng.choice(self._NAMES), "question": question, "answer": str(answer)})
+        content = json.dumps({"monsters": monsters})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
@@ -0,0 +1,135 @@
+# DreamARC Backend - password hashing off the event loop
+"""pbkdf2 hashing and verification on a bounded process pool.
+
+Each hash burns tens of milliseconds of CPU, so a login storm at the start
+of class would otherwise freeze every other request.  ``PasswordHasher`` runs
+one job per worker and queues the rest, sized by default to hold a whole
+class logging in at once.  A job that waits longer than ``max_wait`` seconds
+for a worker, or arrives when ``max_pending`` are already queued, raises
+``HasherBusy`` and the app answers 503 with ``Retry-After``.
+
+Workers default to the CPUs this process may actually use: its affinity
+mask, further capped by a cgroup v2 CPU quota when one is set.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+HASH_ROUNDS = os.getenv("PASSWORD_HASH_ROUNDS")
+# Logins the queue absorbs before shedding, whatever the CPU count.
+CLASS_BURST = 128
+
+_worker_context: Optional["CryptContext"] = None
+
+
+def make_crypt_context() -> "CryptContext":
+    # Imported on first use: nothing on the boot path needs passlib any more.
+    from passlib.context import CryptContext
+
+    settings = {}
+    if HASH_ROUNDS:
+        # min_rounds makes hashes from an older, cheaper setting report needs_update.
+        settings["pbkdf2_sha256__default_rounds"] = int(HASH_ROUNDS)
+        settings["pbkdf2_sha256__min_rounds"] = int(HASH_ROUNDS)
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto", **settings)
+
+
+def _context() -> "CryptContext":
+    global _worker_context
+    if _worker_context is None:
+        _worker_context = make_crypt_context()
+    return _worker_context
+
+
+def _hash(password: str) -> str:
+    return _context().hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return _context().verify_and_update(password, hashed)
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+class HasherBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None, max_wait: float = 10.0,
+                 retry_after: int = 1, rehash_on_login: bool = True):
+        self.workers = workers or available_cpus()
+        self.max_pending = max_pending or max(CLASS_BURST, self.workers * 8)
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.rehash_on_login = rehash_on_login
+        self.pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: workers only import this module, not the forked app state.
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HasherBusy(self.retry_after)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        self.pending += 1
+        try:
+            # Waiting here rather than in the executor's queue lets a job give up on its deadline.
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                self.timed_out += 1
+                raise HasherBusy(self.retry_after) from None
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+            finally:
+                self._slots.release()
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password)
+
+    async def verify(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """Return ``(ok, new_hash)``; ``new_hash`` is set when the stored hash should be replaced."""
+        if not hashed:
+            return False, None
+        ok, new_hash = await self._submit(_verify_and_update, password, hashed)
+        return ok, (new_hash if self.rehash_on_login else None)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._slots = None
@@ -0,0 +1,48 @@
+# DreamARC Backend - in-process pub/sub hub
+"""Fan out events to live subscribers, keyed by student id.
+
+Each subscriber gets a bounded queue; a subscriber that stops reading
+loses its oldest undelivered events rather than holding memory or
+blocking the publisher.
+"""
+import asyncio
+from typing import Any, Dict, Hashable, Set
+
+
+class PubSubHub:
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self.published = 0
+        self.dropped = 0
+        self._subscribers: Dict[Hashable, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, key: Hashable) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        self._subscribers.setdefault(key, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, key: Hashable, queue: asyncio.Queue):
+        subs = self._subscribers.get(key)
+        if subs is not None:
+            subs.discard(queue)
+            if not subs:
+                del self._subscribers[key]
+
+    def publish(self, key: Hashable, event: Any) -> int:
+        """Deliver ``event`` to every subscriber of ``key``; returns how many."""
+        subs = self._subscribers.get(key, ())
+        for queue in subs:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+        self.published += 1
+        return len(subs)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "channels": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,161 @@
+# DreamARC Backend - spaced-repetition review queue
+"""Per-student priority queues of topics ordered by when they fall due.
+
+A topic's review interval is a half-life derived from its mastery row:
+
+    interval = BASE_INTERVAL_HOURS * 2 ** min(consecutive_correct, MAX_STREAK_DOUBLINGS) / lambda
+
+so high forgetting rates (lambda) shorten it and correct streaks stretch it.
+Retention decays as ``0.5 ** (elapsed / interval)`` and the topic is due once
+it drops to one half, at ``due_at = last_practiced_at + interval``.  Because
+``due_at`` does not depend on the current time, each student's topics sit in
+a heap keyed by it and the top K is read off without rescoring everything.
+
+``topic_mastery`` stays the source of truth: a student's heap is loaded on
+first use and then kept current from the lambda-attempt results, with the
+same generation guard as the memory cache against loads that race a write.
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+BASE_INTERVAL_HOURS = 24.0
+MAX_STREAK_DOUBLINGS = 6
+
+# topic -> (due_at, lambda_val, consecutive_correct, practiced_at)
+Entry = Tuple[float, float, int, float]
+
+
+def review_interval(lambda_val: float, consecutive_correct: int) -> float:
+    """Half-life of a topic in seconds."""
+    return BASE_INTERVAL_HOURS * 3600.0 * 2 ** min(max(consecutive_correct, 0), MAX_STREAK_DOUBLINGS) / max(lambda_val, 0.1)
+
+
+def _timestamp(value: Any) -> float:
+    if not value:
+        return 0.0
+    try:
+        return datetime.strptime(str(value)[:19], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _entry(lambda_val: Optional[float], consecutive_correct: Optional[int], practiced_at: float) -> Entry:
+    lam = float(lambda_val) if lambda_val else 1.0
+    k = int(consecutive_correct or 0)
+    return (practiced_at + review_interval(lam, k), lam, k, practiced_at)
+
+
+def load_topics(db, student_id: int) -> List[Tuple[str, Entry]]:
+    rows = db.execute(
+        "SELECT topic_name, lambda_val, consecutive_correct, last_practiced_at FROM topic_mastery WHERE student_id=?",
+        (student_id,),
+    ).fetchall()
+    return [(r[0], _entry(r[1], r[2], _timestamp(r[3]))) for r in rows]
+
+
+class _StudentHeap:
+    """Heap of ``(due_at, topic)`` with lazy deletion of superseded entries."""
+
+    __slots__ = ("topics", "heap")
+
+    def __init__(self, topics: Sequence[Tuple[str, Entry]]):
+        self.topics: Dict[str, Entry] = dict(topics)
+        self.heap = [(entry[0], topic) for topic, entry in self.topics.items()]
+        heapq.heapify(self.heap)
+
+    def update(self, topic: str, entry: Entry):
+        self.topics[topic] = entry
+        heapq.heappush(self.heap, (entry[0], topic))
+        if len(self.heap) > 2 * len(self.topics) + 16:
+            self.heap = [(e[0], t) for t, e in self.topics.items()]
+            heapq.heapify(self.heap)
+
+    def top(self, k: int) -> List[Tuple[str, Entry]]:
+        found = []
+        while self.heap and len(found) < k:
+            due_at, topic = heapq.heappop(self.heap)
+            entry = self.topics.get(topic)
+            if entry is not None and entry[0] == due_at:
+                found.append((topic, entry))
+        for topic, entry in found:
+            heapq.heappush(self.heap, (entry[0], topic))
+        return found
+
+
+class ReviewQueue:
+    def __init__(self, max_students: int = 4096):
+        self.max_students = max_students
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, _StudentHeap]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, student_id: int) -> int:
+        return self._generations.get(student_id, 0)
+
+    def put(self, student_id: int, topics: Sequence[Tuple[str, Entry]], generation: int) -> _StudentHeap:
+        """Install a loaded heap unless a write landed since ``generation`` was read.
+
+        The heap is returned either way so the caller can answer from it.
+        """
+        heap = _StudentHeap(topics)
+        with self._lock:
+            if self._generations.get(student_id, 0) == generation:
+                self._entries[student_id] = heap
+                self._entries.move_to_end(student_id)
+                while len(self._entries) > self.max_students:
+                    self._entries.popitem(last=False)
+        return heap
+
+    def record(self, student_id: int, topic: str, lambda_val: float, consecutive_correct: int, practiced_at: Optional[float] = None):
+        """Apply a committed attempt to the student's heap, if it is loaded."""
+        entry = _entry(lambda_val, consecutive_correct, time.time() if practiced_at is None else practiced_at)
+        with self._lock:
+            self._generations[student_id] = self._generations.get(student_id, 0) + 1
+            heap = self._entries.get(student_id)
+            if heap is not None:
+                heap.update(topic, entry)
+
+    def next_due(self, student_id: int, k: int, now: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+        """The ``k`` topics due soonest, or None when the student is not loaded."""
+        with self._lock:
+            heap = self._entries.get(student_id)
+            if heap is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(student_id)
+            self.hits += 1
+        return self.rank(heap, k, now)
+
+    def rank(self, heap: _StudentHeap, k: int, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        now = time.time() if now is None else now
+        with self._lock:
+            top = heap.top(k)
+        result = []
+        for topic, (due_at, lam, streak, practiced_at) in top:
+            interval = due_at - practiced_at
+            result.append({
+                "topic_name": topic,
+                "lambda_val": lam,
+                "consecutive_correct": streak,
+                "due_at": datetime.fromtimestamp(due_at, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                "due": due_at <= now,
+                "retention": round(0.5 ** (max(now - practiced_at, 0.0) / interval), 4),
+            })
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "students": len(self._entries),
+            "topics": sum(len(h.topics) for h in self._entries.values()),
+            "max_students": self.max_students,
+        }
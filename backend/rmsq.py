@@ -0,0 +1,152 @@
+# DreamARC Backend - RMSQ weekly trend aggregates
+"""Rolling per-student aggregates over ``rmsq_weekly_logs``.
+
+Every insert into ``rmsq_weekly_logs`` is folded into the student's
+``rmsq_aggregates`` row by ``AGGREGATE_TRIGGER`` in the same transaction,
+whichever code path wrote it, so the stats endpoint reads one row for the
+latest/previous lambda, delta, moving average and min/max instead of the
+whole history.  The graph series is capped at ``points`` values; longer
+histories are averaged into that many buckets.
+
+Migration v7 backfills aggregates for logs written before the trigger
+existed, and ``load_summary`` replays the logs for a student that still has
+no aggregate row.  A rebuild can also be run by hand:
+
+    python -m backend.rmsq [DB_PATH] [STUDENT_ID ...]
+"""
+import json
+import os
+import sqlite3
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+MOVING_AVG_WEEKS = 4
+SERIES_POINTS = 52
+
+# The SQL form of ``_fold``.  Without an aggregate row yet, the count, previous
+# value and range come from the logs, so a missed backfill heals on the next insert.
+AGGREGATE_TRIGGER = f"""
+CREATE TRIGGER IF NOT EXISTS trg_rmsq_weekly_logs_aggregate AFTER INSERT ON rmsq_weekly_logs
+BEGIN
+    INSERT OR REPLACE INTO rmsq_aggregates (student_id, n, latest_label, latest_lambda, prev_lambda, delta, moving_avg, min_lambda, max_lambda, latest_rmsq, recent_json, updated_at)
+    SELECT NEW.student_id,
+           COALESCE(a.n + 1, (SELECT COUNT(*) FROM rmsq_weekly_logs WHERE student_id = NEW.student_id)),
+           NEW.week_label, r.lam,
+           COALESCE(a.latest_lambda, p.lam, r.lam),
+           r.lam - COALESCE(a.latest_lambda, p.lam, r.lam),
+           w.moving_avg,
+           MIN(COALESCE(a.min_lambda, (SELECT MIN(COALESCE(lambda_score, 0.0)) FROM rmsq_weekly_logs WHERE student_id = NEW.student_id)), r.lam),
+           MAX(COALESCE(a.max_lambda, (SELECT MAX(COALESCE(lambda_score, 0.0)) FROM rmsq_weekly_logs WHERE student_id = NEW.student_id)), r.lam),
+           NEW.rmsq_score, w.recent_json, CURRENT_TIMESTAMP
+    FROM (SELECT COALESCE(NEW.lambda_score, 0.0) AS lam) r
+    LEFT JOIN rmsq_aggregates a ON a.student_id = NEW.student_id
+    LEFT JOIN (SELECT COALESCE(lambda_score, 0.0) AS lam FROM rmsq_weekly_logs WHERE student_id = NEW.student_id AND id < NEW.id ORDER BY id DESC LIMIT 1) p
+    JOIN (SELECT AVG(lam) AS moving_avg, json_group_array(lam) AS recent_json FROM (
+            SELECT lam FROM (SELECT id, COALESCE(lambda_score, 0.0) AS lam FROM rmsq_weekly_logs WHERE student_id = NEW.student_id ORDER BY id DESC LIMIT {MOVING_AVG_WEEKS})
+            ORDER BY id)) w;
+END
+"""
+
+
+def _fold(agg: Optional[Dict[str, Any]], label: str, lam: float, rmsq: Optional[int]) -> Dict[str, Any]:
+    """The aggregate after one more week; ``agg`` is None for the first."""
+    if agg is None:
+        recent = [lam]
+        return {"n": 1, "latest_label": label, "latest_lambda": lam, "prev_lambda": lam, "delta": 0.0,
+                "moving_avg": lam, "min_lambda": lam, "max_lambda": lam, "latest_rmsq": rmsq,
+                "recent_json": json.dumps(recent)}
+    recent = (json.loads(agg["recent_json"] or "[]") + [lam])[-MOVING_AVG_WEEKS:]
+    return {"n": agg["n"] + 1, "latest_label": label, "latest_lambda": lam, "prev_lambda": agg["latest_lambda"],
+            "delta": lam - agg["latest_lambda"], "moving_avg": sum(recent) / len(recent),
+            "min_lambda": min(agg["min_lambda"], lam), "max_lambda": max(agg["max_lambda"], lam),
+            "latest_rmsq": rmsq, "recent_json": json.dumps(recent)}
+
+
+def _store(db: sqlite3.Connection, student_id: int, agg: Dict[str, Any]):
+    db.execute(
+        "INSERT OR REPLACE INTO rmsq_aggregates (student_id, n, latest_label, latest_lambda, prev_lambda, delta, moving_avg, min_lambda, max_lambda, latest_rmsq, recent_json, updated_at) "
+        "VALUES (:student_id, :n, :latest_label, :latest_lambda, :prev_lambda, :delta, :moving_avg, :min_lambda, :max_lambda, :latest_rmsq, :recent_json, CURRENT_TIMESTAMP)",
+        dict(agg, student_id=student_id),
+    )
+
+
+def _replay(db: sqlite3.Connection, student_id: int) -> Optional[Dict[str, Any]]:
+    agg = None
+    for label, lam, rmsq in db.execute("SELECT week_label, lambda_score, rmsq_score FROM rmsq_weekly_logs WHERE student_id=? ORDER BY id", (student_id,)):
+        agg = _fold(agg, label, float(lam or 0.0), rmsq)
+    return agg
+
+
+def load_summary(db: sqlite3.Connection, student_id: int) -> Optional[Dict[str, Any]]:
+    row = db.execute("SELECT * FROM rmsq_aggregates WHERE student_id=?", (student_id,)).fetchone()
+    if row:
+        return dict(row)
+    # No aggregate yet: computed from the logs, or None when there are none.
+    return _replay(db, student_id)
+
+
+def record_week(db: sqlite3.Connection, student_id: int, week_label: str, lambda_score: float, rmsq_score: Optional[int] = None, context_note: Optional[str] = None) -> Dict[str, Any]:
+    """Append one weekly log and return the updated aggregate; runs in the caller's transaction."""
+    db.execute(
+        "INSERT INTO rmsq_weekly_logs (student_id, week_label, lambda_score, rmsq_score, context_note) VALUES (?, ?, ?, ?, ?)",
+        (student_id, week_label, float(lambda_score), rmsq_score, context_note),
+    )
+    return load_summary(db, student_id)
+
+
+def load_series(db: sqlite3.Connection, student_id: int, n: int, points: int = SERIES_POINTS) -> List[Dict[str, Any]]:
+    """Graph points oldest-first; at most ``points`` values, bucket-averaged past that."""
+    if n <= points:
+        rows = db.execute(
+            "SELECT week_label as label, lambda_score as lambda_val, rmsq_score as rmsq FROM rmsq_weekly_logs WHERE student_id=? ORDER BY id DESC LIMIT ?",
+            (student_id, points),
+        ).fetchall()
+        return [dict(r) for r in reversed(rows)]
+
+    # Each bucket takes the label of its last week and the mean of its values.
+    size = -(-n // points)
+    series, lam_sum, rmsq_sum, rmsq_count, count, label = [], 0.0, 0, 0, 0, None
+    cursor = db.execute("SELECT week_label, lambda_score, rmsq_score FROM rmsq_weekly_logs WHERE student_id=? ORDER BY id", (student_id,))
+    for week_label, lam, rmsq in cursor:
+        label, lam_sum, count = week_label, lam_sum + (lam or 0.0), count + 1
+        if rmsq is not None:
+            rmsq_sum, rmsq_count = rmsq_sum + rmsq, rmsq_count + 1
+        if count == size:
+            series.append({"label": label, "lambda_val": lam_sum / count, "rmsq": round(rmsq_sum / rmsq_count) if rmsq_count else None})
+            lam_sum, rmsq_sum, rmsq_count, count = 0.0, 0, 0, 0
+    if count:
+        series.append({"label": label, "lambda_val": lam_sum / count, "rmsq": round(rmsq_sum / rmsq_count) if rmsq_count else None})
+    return series
+
+
+def backfill(db: sqlite3.Connection, student_ids: Sequence[int] = ()) -> int:
+    """Rebuild aggregates from the logs (all students by default); returns how many."""
+    if not student_ids:
+        student_ids = [r[0] for r in db.execute("SELECT DISTINCT student_id FROM rmsq_weekly_logs")]
+    for sid in student_ids:
+        agg = _replay(db, sid)
+        if agg is None:
+            db.execute("DELETE FROM rmsq_aggregates WHERE student_id=?", (sid,))
+        else:
+            _store(db, sid, agg)
+    return len(student_ids)
+
+
+def main(argv: Sequence[str]) -> int:
+    from .migrations import migrate
+
+    db_path = argv[0] if argv else os.getenv("DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "dreamarc.db"))
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        migrate(conn)
+        count = backfill(conn, [int(a) for a in argv[1:]])
+        conn.commit()
+        print(f"rebuilt RMSQ aggregates for {count} student(s)")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,83 @@
+import pytest
+
+from backend.answers import AnswerIndex, canonicalize, matches
+
+
+@pytest.mark.parametrize("stored, answer", [
+    ("3^7", "2187"),
+    ("2(x+1)", "2x + 2"),
+    ("5", "x = 5"),
+    ("3^7", "3 ^ 7"),
+    ("1000", "1,000"),
+    ("1000", "1e3"),
+    ("0.0015", "1.5e-3"),
+    ("(3, 4)", "(3,4)"),
+    ("(3, 4)", "3, 4"),
+    ("[1, 2]", "(1, 2)"),
+    ("1/2", "0.5"),
+    ("0.5", "1/2"),
+    ("-1e3", "-1000"),
+    ("Yes", " yes "),
+    ("New York", "new  york"),
+    ("A", "a"),
+])
+def test_equivalent_answers_match(stored, answer):
+    assert matches(canonicalize(stored), answer)
+
+
+@pytest.mark.parametrize("stored, answer", [
+    # commas that are not thousands separators
+    ("(3, 4)", "34"),
+    ("34", "3,4"),
+    ("34", "(3, 4)"),
+    ("(3, 4)", "(4, 3)"),
+    # words are not products of single-letter variables
+    ("no", "on"),
+    ("yes", "sey"),
+    ("abc", "cab"),
+    ("pi", "ip"),
+    # variables only count when the stored answer is an expression
+    ("5", "5x/x"),
+    ("x", "2x/2"),
+    # arithmetic only wins by repeating the stored expression
+    ("3^7", "3^2 * 3^5"),
+    ("5", "10/2"),
+    ("5", "2 + 3"),
+    ("1000", "10^3"),
+    ("(5, 2)", "(10/2, 2)"),
+])
+def test_false_positives_are_rejected(stored, answer):
+    assert not matches(canonicalize(stored), answer)
+
+
+def test_scientific_notation_is_a_number():
+    assert canonicalize("1e3") == "n:1000"
+    assert canonicalize("2e") != canonicalize("2e3")
+
+
+def test_literals_and_expressions_are_tagged_apart():
+    assert canonicalize("3/4") == "n:3/4"
+    assert canonicalize("6/8") == "n:3/4@6 / 8"
+    assert canonicalize("3^7") == "n:2187@3 ** 7"
+    assert canonicalize("1.5e-3") == "n:3/2000"
+
+
+def test_thousands_separators_only():
+    assert canonicalize("1,000,000") == "n:1000000"
+    assert canonicalize("3,4") == "s:n:3|n:4"
+    assert canonicalize("(1,234)") == "s:n:1|n:234"
+
+
+def test_hostile_input_falls_back_to_text():
+    assert canonicalize("__import__('os')").startswith("t:")
+    assert canonicalize("9^9^9^9").startswith("t:")
+    assert canonicalize("1/0").startswith("t:")
+
+
+def test_index_prefers_stored_canonical():
+    index = AnswerIndex(max_entries=1)
+    row = {"id": 1, "student_id": 7, "answer_canonical": None, "correct_answer": "3^7", "monster_name": "Dragon", "xp_reward": 5}
+    entry = index.put_rows([row])
+    assert entry.canonical == "n:2187@3 ** 7"
+    index.put_rows([dict(row, id=2)])
+    assert index.get(1) is None and index.get(2) is not None
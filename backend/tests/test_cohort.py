@@ -0,0 +1,107 @@
+import sqlite3
+import statistics
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend import cohort  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("cohort") / "cohort.db")
+    cohort._synthetic_db(path, students=120, topics=5, seed=11)
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="module")
+def data(db):
+    return cohort.load(db)
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    pos = (len(values) - 1) * p / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+@pytest.mark.parametrize("grade", [None, "9"])
+def test_lambda_distribution_matches_sql(db, data, grade):
+    where, params = ("WHERE student_id IN (SELECT id FROM students WHERE grade=?)", (grade,)) if grade else ("", ())
+    rows = db.execute(f"SELECT topic_name, lambda_val FROM topic_mastery {where}", params).fetchall()
+    by_topic = {}
+    for topic, lam in rows:
+        by_topic.setdefault(topic, []).append(lam)
+    view = {r["topic_name"]: r for r in data.lambda_distribution(grade)}
+    assert set(view) == set(by_topic)
+    for topic, values in by_topic.items():
+        row = view[topic]
+        assert row["students"] == len(values)
+        assert row["mean"] == pytest.approx(statistics.fmean(values), abs=1e-4)
+        assert row["struggling"] == sum(v > cohort.STRUGGLE_LAMBDA for v in values)
+        for p in cohort.PERCENTILES:
+            assert row["percentiles"][f"p{p}"] == pytest.approx(_percentile(values, p), abs=1e-4)
+
+
+def test_struggling_students_match_sql(db, data):
+    rows = db.execute(
+        "SELECT student_id, COUNT(*), MAX(lambda_val) FROM topic_mastery WHERE lambda_val > ? GROUP BY student_id",
+        (cohort.STRUGGLE_LAMBDA,),
+    ).fetchall()
+    events = dict(db.execute(
+        "SELECT student_id, COUNT(*) FROM lambda_logs WHERE lambda_val > ? GROUP BY student_id", (cohort.STRUGGLE_LAMBDA,),
+    ).fetchall())
+    view = data.struggling_students(limit=10_000)
+    assert {r["student_id"]: (r["struggling_topics"], r["max_lambda"], r["struggle_events"]) for r in view} == {
+        sid: (n, round(mx, 4), events.get(sid, 0)) for sid, n, mx in rows
+    }
+    # Most struggling topics first, then the worst lambda, then student id.
+    assert [r["student_id"] for r in view] == [
+        r["student_id"] for r in sorted(view, key=lambda r: (-r["struggling_topics"], -r["max_lambda"], r["student_id"]))
+    ]
+    for r in view:
+        worst = db.execute(
+            "SELECT topic_name FROM topic_mastery WHERE student_id=? ORDER BY lambda_val DESC LIMIT 1", (r["student_id"],),
+        ).fetchone()[0]
+        assert r["worst_topic"] == worst
+    assert len(data.struggling_students(limit=3)) == min(3, len(view))
+
+
+def test_pq_averages_use_each_students_latest_row(db, data):
+    fields = ", ".join(cohort.PQ_FIELDS)
+    latest = db.execute(
+        f"SELECT {fields} FROM pq_scores p WHERE id = "
+        "(SELECT id FROM pq_scores q WHERE q.student_id = p.student_id ORDER BY updated_at DESC, id DESC LIMIT 1)"
+    ).fetchall()
+    view = data.pq_averages()
+    assert view["students"] == len(latest)
+    for i, field in enumerate(cohort.PQ_FIELDS):
+        assert view["averages"][field] == pytest.approx(statistics.fmean(r[i] for r in latest), abs=1e-4)
+    totals = [sum(r) for r in latest]
+    assert view["total"]["mean"] == pytest.approx(statistics.fmean(totals), abs=1e-4)
+    assert view["total"]["p50"] == pytest.approx(_percentile(totals, 50), abs=1e-4)
+
+
+def test_monster_defeat_rates_match_sql(db, data):
+    view = data.monster_defeat_rates()
+    total, won = db.execute("SELECT COUNT(*), SUM(is_defeated) FROM game_monsters").fetchone()
+    assert (view["monsters"], view["defeated"]) == (total, won)
+    by_type = {t: (n, d) for t, n, d in db.execute("SELECT monster_type, COUNT(*), SUM(is_defeated) FROM game_monsters GROUP BY monster_type")}
+    assert {r["name"]: (r["monsters"], r["defeated"]) for r in view["by_type"]} == by_type
+    by_topic = {t: (n, d) for t, n, d in db.execute("SELECT topic_name, COUNT(*), SUM(is_defeated) FROM game_monsters GROUP BY topic_name")}
+    assert {r["name"]: (r["monsters"], r["defeated"]) for r in view["by_topic"]} == by_topic
+
+
+def test_cache_drops_a_snapshot_loaded_before_a_write(data):
+    cache = cohort.CohortCache()
+    generation = cache.generation
+    cache.invalidate()
+    cache.put(data, generation)
+    assert cache.get() is None
+    cache.put(data, cache.generation)
+    assert cache.get() is data
@@ -0,0 +1,27 @@
+from backend import main
+from backend.conversations import fit_to_budget
+
+
+def test_guest_message_becomes_the_user_turn():
+    history, in_session = main._session_history(main.LearningRequest(message="hi", system="be kind"))
+    assert not in_session
+    assert history == [{"role": "system", "content": "be kind"}, {"role": "user", "content": "hi"}]
+
+
+def test_legacy_history_is_sent_as_is():
+    turns = [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}, {"role": "user", "content": "c"}]
+    history, in_session = main._session_history(main.LearningRequest(history=turns))
+    assert not in_session and history == turns
+
+
+def test_student_message_uses_the_session():
+    req = main.LearningRequest(message="hello", student_id=987654, new_session=True)
+    history, in_session = main._session_history(req)
+    assert in_session and history[-1] == {"role": "user", "content": "hello"}
+
+
+def test_fit_to_budget_keeps_system_and_newest_turns():
+    messages = [{"role": "system", "content": "s"}] + [{"role": "user", "content": "word " * 50} for _ in range(10)]
+    kept, dropped = fit_to_budget(messages, 200)
+    assert kept[0]["role"] == "system" and dropped > 0
+    assert kept[-1] is messages[-1]
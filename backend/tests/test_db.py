@@ -0,0 +1,63 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from backend.db import DBPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = DBPool(str(tmp_path / "pool.db"), readers=2)
+    asyncio.run(pool.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)"))
+    yield pool
+    pool.close()
+
+
+def _thread_name(db):
+    return threading.current_thread().name
+
+
+def test_reads_and_writes_run_on_separate_threads(pool):
+    async def run():
+        return await pool.read(_thread_name), await pool.write(_thread_name)
+
+    reader, writer = asyncio.run(run())
+    assert reader.startswith("db-read") and writer.startswith("db-write")
+
+
+def test_writes_are_durable_by_default(pool):
+    async def run():
+        return await pool.read(lambda db: db.execute("PRAGMA synchronous").fetchone()[0])
+
+    assert asyncio.run(run()) == 2  # FULL
+
+
+def test_failed_write_rolls_back_and_raises(pool):
+    def insert_twice(db):
+        db.execute("INSERT INTO items (name) VALUES ('a')")
+        db.execute("INSERT INTO items (name) VALUES ('a')")
+
+    async def run():
+        with pytest.raises(sqlite3.IntegrityError):
+            await pool.write(insert_twice)
+        # The writer connection is usable again and the first insert was undone.
+        await pool.execute("INSERT INTO items (name) VALUES (?)", ("b",))
+        return await pool.fetchall("SELECT name FROM items")
+
+    assert [r["name"] for r in asyncio.run(run())] == ["b"]
+
+
+def test_reader_errors_reach_the_caller(pool):
+    async def run():
+        with pytest.raises(sqlite3.OperationalError):
+            await pool.fetchone("SELECT * FROM missing")
+        return await pool.fetchone("SELECT COUNT(*) AS n FROM items")
+
+    assert asyncio.run(run())["n"] == 0
+
+
+def test_unknown_synchronous_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        DBPool(str(tmp_path / "x.db"), synchronous="sometimes")
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from backend.llm_cache import LLMResponseCache
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    cache = LLMResponseCache()
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "reply"
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_call("k", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_call("k", upstream))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "reply"
+    assert calls == [1]
+    assert cache.get("k") == "reply"
+    assert (cache.misses, cache.coalesced) == (1, 1)
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = LLMResponseCache()
+
+    async def upstream():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_call("k", upstream) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
+    assert cache.get("k") is None and not cache.stats()["inflight"]
+
+
+def test_admission_failure_stays_with_the_caller_that_started():
+    cache = LLMResponseCache()
+    admitted = iter((False, True))
+
+    def upstream():
+        if not next(admitted):
+            raise RuntimeError("429 for the first caller's student")
+
+        async def reply():
+            await asyncio.sleep(0.01)
+            return "reply"
+        return reply()
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_call("k", upstream)
+        assert not cache.stats()["inflight"]
+        return await cache.get_or_call("k", upstream)
+
+    assert asyncio.run(run()) == "reply"
+
+
+def test_concurrent_streams_share_one_upstream():
+    cache = LLMResponseCache()
+    upstream_calls = []
+
+    async def pieces():
+        upstream_calls.append(1)
+        for piece in ("Hel", "lo", "!"):
+            await asyncio.sleep(0.01)
+            yield piece
+
+    async def reader(delay):
+        await asyncio.sleep(delay)
+        flight, started = cache.join_stream("k", pieces, str.upper)
+        received = [p async for p in flight.follow()]
+        return started, received, await flight.result()
+
+    async def run():
+        return await asyncio.gather(reader(0), reader(0.015))
+
+    (first_started, first, first_final), (second_started, second, second_final) = asyncio.run(run())
+    assert upstream_calls == [1]
+    assert (first_started, second_started) == (True, False)
+    assert first == second == ["Hel", "lo", "!"]  # the late reader replays from the start
+    assert first_final == second_final == "HELLO!"
+    assert cache.get("k") == "HELLO!"
+    assert (cache.misses, cache.coalesced) == (1, 1)
+
+
+def test_stream_outlives_its_first_reader():
+    cache = LLMResponseCache()
+
+    async def pieces():
+        for piece in ("a", "b"):
+            await asyncio.sleep(0.01)
+            yield piece
+
+    async def run():
+        flight, _ = cache.join_stream("k", pieces, lambda raw: raw)
+        async for _ in flight.follow():
+            break  # the client went away after one piece
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert cache.get("k") == "ab"
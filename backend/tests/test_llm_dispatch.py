@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from backend.llm_dispatch import INTERACTIVE, LLMDispatcher, LLMUnavailable
+
+
+def test_reserved_tickets_count_against_the_queue():
+    dispatch = LLMDispatcher(max_concurrency=1, max_queue=2, per_student=10)
+    tickets = [dispatch.reserve(INTERACTIVE, 1) for _ in range(3)]  # one slot plus a queue of two
+    with pytest.raises(LLMUnavailable) as rejected:
+        dispatch.reserve(INTERACTIVE, 1)
+    assert rejected.value.status_code == 503
+    assert dispatch.stats()["reserved"]["interactive"] == 3
+
+    tickets[0].release()
+    dispatch.reserve(INTERACTIVE, 1)
+
+
+def test_unstarted_ticket_release_returns_the_student_budget():
+    dispatch = LLMDispatcher(per_student=1)
+    ticket = dispatch.reserve(INTERACTIVE, 7)
+    with pytest.raises(LLMUnavailable) as rejected:
+        dispatch.reserve(INTERACTIVE, 7)
+    assert rejected.value.status_code == 429
+    ticket.release()
+    ticket.release()
+    assert dispatch.stats()["reserved"]["interactive"] == 0
+    dispatch.reserve(INTERACTIVE, 7)
+
+
+def test_started_tickets_move_from_reserved_to_running():
+    dispatch = LLMDispatcher(max_concurrency=1)
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def held():
+            await gate.wait()
+            return "done"
+
+        task = asyncio.create_task(dispatch.call(held, INTERACTIVE, 1))
+        await asyncio.sleep(0)
+        stats = dispatch.stats()
+        gate.set()
+        return stats, await task
+
+    stats, result = asyncio.run(run())
+    assert result == "done"
+    assert (stats["running"], stats["reserved"]["interactive"]) == (1, 0)
+    assert dispatch.stats()["running"] == 0
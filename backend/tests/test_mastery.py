@@ -0,0 +1,69 @@
+import random
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from backend import mastery
+from backend.migrations import migrate
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    return conn
+
+
+def _attempts(n, seed=11):
+    rng = random.Random(seed)
+    return [SimpleNamespace(student_id=rng.randint(1, 8), topic_name=rng.choice(["Math", "Algebra", "Geometry", "Ratios", "Exponents"]),
+                            correctness=rng.choice([0, 1, 1]), latency_tau=rng.uniform(5, 120), dependency_h=rng.choice([0, 0, 1, 2]))
+            for _ in range(n)]
+
+
+def _mastery(db):
+    return db.execute("SELECT student_id, topic_name, lambda_val, consecutive_correct FROM topic_mastery ORDER BY student_id, topic_name").fetchall()
+
+
+def _apply(attempts, compute):
+    db = _db()
+    db.execute("INSERT INTO topic_mastery (student_id, topic_name, lambda_val, consecutive_correct) VALUES (1, 'Math', 3.25, 2)")
+    original = mastery._compute_numpy, mastery._compute_python
+    mastery._compute_numpy = mastery._compute_python = compute
+    try:
+        results = mastery.apply_attempts(db, attempts)
+    finally:
+        mastery._compute_numpy, mastery._compute_python = original
+    return results, _mastery(db)
+
+
+def test_numpy_python_and_single_attempts_agree():
+    pytest.importorskip("numpy")
+    attempts = _attempts(3000)
+    numpy_results, numpy_rows = _apply(attempts, mastery._compute_numpy)
+    python_results, python_rows = _apply(attempts, mastery._compute_python)
+
+    db = _db()
+    db.execute("INSERT INTO topic_mastery (student_id, topic_name, lambda_val, consecutive_correct) VALUES (1, 'Math', 3.25, 2)")
+    single_results = [r for a in attempts for r in mastery.apply_attempts(db, [a])]
+
+    assert numpy_results == python_results == single_results
+    assert numpy_rows == python_rows == _mastery(db)
+
+
+def test_update_rule():
+    db = _db()
+    a = dict(student_id=1, topic_name="Math", latency_tau=10, dependency_h=0)
+    results = mastery.apply_attempts(db, [SimpleNamespace(correctness=1, **a)] * 4 + [SimpleNamespace(correctness=0, **a)])
+    # Fast, independent correct answers: 0.8 then 0.5 once the streak reaches 3.
+    assert [r["new_lambda"] for r in results[:4]] == pytest.approx([0.8, 0.64, 0.512, 0.256])
+    assert results[4]["new_lambda"] == pytest.approx(1.756)
+    assert [r["consecutive_correct"] for r in results] == [1, 2, 3, 4, 0]
+
+
+def test_lambda_is_clamped():
+    db = _db()
+    wrong = SimpleNamespace(student_id=2, topic_name="Math", correctness=0, latency_tau=10, dependency_h=0)
+    assert mastery.apply_attempts(db, [wrong] * 4)[-1]["new_lambda"] == 5.0
+    right = SimpleNamespace(student_id=3, topic_name="Math", correctness=1, latency_tau=10, dependency_h=0)
+    assert mastery.apply_attempts(db, [right] * 20)[-1]["new_lambda"] == 0.1
@@ -0,0 +1,36 @@
+from backend.memory_cache import StudentMemory, StudentMemoryCache
+
+
+def _memory(*logs):
+    return StudentMemory(list(logs), None, None)
+
+
+def test_load_that_raced_a_write_is_not_cached():
+    cache = StudentMemoryCache()
+    generation = cache.generation(1)
+    cache.invalidate(1)  # a diary write lands while the load is in flight
+    cache.put(1, _memory("stale"), generation)
+    assert cache.get(1) is None
+
+    cache.put(1, _memory("fresh"), cache.generation(1))
+    assert cache.get(1).mem_str == "fresh"
+
+
+def test_tutor_logs_apply_in_place():
+    cache = StudentMemoryCache()
+    cache.put(1, _memory("b", "c", "d"), cache.generation(1))
+    cache.record_tutor_log(1, "a")
+    assert cache.get(1).tutor_logs == ["a", "b", "c"]
+
+
+def test_generations_are_bounded_and_stay_safe():
+    cache = StudentMemoryCache(max_entries=2)
+    generation = cache.generation(1)
+    cache.invalidate(1)
+    for student in (2, 3, 4):  # pushes student 1's generation out
+        cache.invalidate(student)
+    assert len(cache._generations) == 2
+    cache.put(1, _memory("stale"), generation)
+    assert cache.get(1) is None
+    cache.put(1, _memory("fresh"), cache.generation(1))
+    assert cache.get(1).mem_str == "fresh"
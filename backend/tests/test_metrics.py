@@ -0,0 +1,76 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.metrics import MetricsMiddleware, Registry
+
+
+def test_exposition_format():
+    registry = Registry()
+    hits = registry.counter("hits_total", "Hits by route", ("route",))
+    hits.inc('/a"b')
+    registry.gauge("depth", "Queue depth").set(value=2.5)
+    registry.collect("slots", "Free slots", lambda: [({"pool": "read"}, 3)])
+    assert registry.render().splitlines() == [
+        "# HELP hits_total Hits by route",
+        "# TYPE hits_total counter",
+        'hits_total{route="/a\\"b"} 1',
+        "# HELP depth Queue depth",
+        "# TYPE depth gauge",
+        "depth 2.5",
+        "# HELP slots Free slots",
+        "# TYPE slots gauge",
+        'slots{pool="read"} 3',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.observe(value=value)
+    lines = [l for l in registry.render().splitlines() if not l.startswith("#")]
+    assert lines == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 2.65",
+        "latency_seconds_count 4",
+    ]
+
+
+def _app():
+    app = FastAPI()
+    registry = Registry()
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/tokens")
+    def tokens():
+        return StreamingResponse(iter(["a", "b", "c"]), media_type="application/x-ndjson")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter(["data: 1\n\n"]), media_type="text/event-stream")
+
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    return app, registry
+
+
+def test_middleware_labels_by_route_template_and_separates_streams():
+    app, registry = _app()
+    client = TestClient(app)
+    for path in ("/items/1", "/items/2", "/nowhere", "/tokens", "/events"):
+        client.get(path)
+    latency = registry._metrics["http_request_duration_seconds"]
+    streams = registry._metrics["http_stream_duration_seconds"]
+    requests = registry._metrics["http_requests_total"]
+
+    assert latency.count("GET", "/items/{item_id}") == 2
+    assert latency.count("GET", "unmatched") == 1
+    assert requests.value("GET", "unmatched", "404") == 1
+    assert latency.count("GET", "/tokens") == 0 and streams.count("GET", "/tokens") == 1
+    assert latency.count("GET", "/events") == 0 and streams.count("GET", "/events") == 0
+    assert requests.value("GET", "/events", "200") == 1
@@ -0,0 +1,96 @@
+import sqlite3
+
+from backend import migrations
+
+
+def _conn(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_migrate_is_idempotent(tmp_path):
+    conn = _conn(tmp_path / "app.db")
+    applied = migrations.migrate(conn)
+    assert applied == [number for number, _, _ in migrations.MIGRATIONS]
+    assert migrations.current_version(conn) == migrations.LATEST_VERSION
+    assert migrations.migrate(conn) == []
+    conn.close()
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    conn = _conn(tmp_path / "app.db")
+    migrations.migrate(conn)
+    assert migrations.check_query_plans(conn) == {}
+    conn.close()
+
+
+def test_check_reports_a_scan(tmp_path):
+    conn = _conn(tmp_path / "app.db")
+    migrations.migrate(conn)
+    conn.execute("DROP INDEX ix_tutoring_logs_student")
+    conn.execute("DROP INDEX ix_tutoring_logs_student_date")
+    failures = migrations.check_query_plans(conn)
+    assert "tutor.memory" in failures and "dashboard.logs" in failures
+    conn.close()
+
+
+def test_covering_index_scan_is_not_flagged(tmp_path, monkeypatch):
+    conn = _conn(tmp_path / "app.db")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, rank INTEGER, name TEXT)")
+    conn.execute("CREATE INDEX ix_items_rank_name ON items (rank, name)")
+    monkeypatch.setattr(migrations, "HOT_QUERIES", {
+        "covering": ("SELECT name FROM items ORDER BY rank", ()),
+        "table": ("SELECT * FROM items WHERE name=?", ("a",)),
+    })
+    failures = migrations.check_query_plans(conn)
+    assert list(failures) == ["table"]
+    plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN SELECT name FROM items ORDER BY rank")]
+    assert plan == ["SCAN items USING COVERING INDEX ix_items_rank_name"]
+    conn.close()
+
+
+def test_cli_check_exit_status(tmp_path, capsys):
+    path = str(tmp_path / "app.db")
+    assert migrations.main([path, "--check"]) == 0
+    assert "hot queries use indexes" in capsys.readouterr().out
+
+    conn = _conn(path)
+    conn.execute("DROP INDEX ix_gc_messages_student_created")
+    conn.commit()
+    conn.close()
+    assert migrations.main([path, "--check"]) == 1
+    assert "SCAN  gc." in capsys.readouterr().out
+
+
+def test_failed_migration_rolls_back(tmp_path):
+    conn = _conn(tmp_path / "app.db")
+    original = migrations.MIGRATIONS
+    migrations.MIGRATIONS = original + [(original[-1][0] + 1, "broken", ["CREATE TABLE probe (id INTEGER)", "NOT SQL"])]
+    try:
+        try:
+            migrations.migrate(conn)
+        except sqlite3.OperationalError:
+            pass
+        else:
+            raise AssertionError("broken migration applied")
+    finally:
+        migrations.MIGRATIONS = original
+    assert migrations.current_version(conn) == original[-1][0]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name='probe'").fetchone() is None
+    conn.close()
+
+
+def test_duplicate_topic_rows_are_collapsed_before_the_unique_index(tmp_path):
+    conn = _conn(tmp_path / "app.db")
+    original = migrations.MIGRATIONS
+    migrations.MIGRATIONS = original[:1]
+    try:
+        migrations.migrate(conn)
+    finally:
+        migrations.MIGRATIONS = original
+    conn.executemany("INSERT INTO topic_mastery (student_id, topic_name, lambda_val) VALUES (1, 'Math', ?)", [(2.0,), (3.0,)])
+    conn.commit()
+    migrations.migrate(conn)
+    assert [tuple(r) for r in conn.execute("SELECT student_id, topic_name, lambda_val FROM topic_mastery")] == [(1, "Math", 3.0)]
+    conn.close()
@@ -0,0 +1,94 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from backend.db import DBPool
+from backend.migrations import migrate
+from backend.monster_factory import FakeMonsterLLM, MonsterFactory, consume_pool_rows, difficulty_for
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "pool.db")
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.close()
+    store = DBPool(path, readers=1)
+    yield store
+    store.close()
+
+
+def _factory(llm):
+    return MonsterFactory(llm, "fake", pool_size=6, low_water=2, batch_size=3, calls_per_minute=6000)
+
+
+async def _settle(factory):
+    while factory._tasks:
+        await asyncio.gather(*factory._tasks)
+
+
+def test_difficulty_follows_lambda():
+    assert [difficulty_for(v) for v in (4.0, 2.0, 0.5, None)] == ["MOB", "ELITE", "BOSS", "BOSS"]
+
+
+def test_refills_survive_a_restart(store):
+    first, second = FakeMonsterLLM(seed=1), FakeMonsterLLM(seed=2)
+
+    async def run():
+        factory = _factory(first)
+        await factory.load(store)
+        factory.schedule_refill("Math", "MOB")
+        await _settle(factory)
+
+        restarted = _factory(second)
+        assert await restarted.load(store) == 6
+        restarted.schedule_refill("Math", "MOB")  # full pool: no upstream call
+        monster = restarted.take("Math", "MOB")
+        await _settle(restarted)
+        return monster
+
+    monster = asyncio.run(run())
+    assert first.calls == 2 and second.calls == 0
+    assert monster["pool_id"] and monster["monster_type"] == "MOB"
+
+
+def test_taken_monsters_leave_the_table(store):
+    async def run():
+        factory = _factory(FakeMonsterLLM(seed=3))
+        await factory.load(store)
+        factory.schedule_refill("Math", "BOSS")
+        await _settle(factory)
+        taken = [factory.take("Math", "BOSS") for _ in range(4)]
+        await store.write(consume_pool_rows, taken)
+        await _settle(factory)  # taking below low water refills
+        return await store.fetchall("SELECT id FROM monster_pool"), factory
+
+    rows, factory = asyncio.run(run())
+    assert len(rows) == 6
+    assert {r["id"] for r in rows} == {m["pool_id"] for m in factory._pools[("Math", "BOSS")]}
+
+
+def test_disabled_factory_never_refills():
+    factory = MonsterFactory(None, "none")
+
+    async def run():
+        factory.schedule_refill("Math", "MOB")
+        return factory.take("Math", "MOB")
+
+    assert asyncio.run(run()) is None and not factory._tasks
+
+
+def test_unused_picks_go_back_to_the_front(store):
+    async def run():
+        factory = _factory(FakeMonsterLLM(seed=4))
+        await factory.load(store)
+        factory.schedule_refill("Math", "ELITE")
+        await _settle(factory)
+        first = factory.take("Math", "ELITE")
+        factory.give_back("Math", "ELITE", first)
+        return first, factory.take("Math", "ELITE"), factory
+
+    first, again, factory = asyncio.run(run())
+    assert again is first
+    assert factory.served == 1
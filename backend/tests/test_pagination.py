@@ -0,0 +1,38 @@
+import sqlite3
+
+from backend import main, migrations
+
+
+def _conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    migrations.migrate(conn)
+    return conn
+
+
+def test_diary_pages_newest_entry_date_first():
+    conn = _conn()
+    # Written out of date order, two on the same day.
+    for day in ("2026-03-02", "2026-03-05", "2026-03-01", "2026-03-05", "2026-03-04"):
+        conn.execute("INSERT INTO diary_entries (student_id, entry_date, content) VALUES (1, ?, ?)", (day, day))
+    seen, cursor = [], None
+    while True:
+        rows, cursor = main._keyset_rows(conn, "entry_date, content", "diary_entries", 1, 2, cursor, key="entry_date")
+        seen += [(r["entry_date"], r["id"]) for r in rows]
+        if cursor is None:
+            break
+    assert seen == sorted(seen, reverse=True)
+    assert [d for d, _ in seen] == ["2026-03-05", "2026-03-05", "2026-03-04", "2026-03-02", "2026-03-01"]
+
+
+def test_board_pages_do_not_repeat_or_skip():
+    conn = _conn()
+    for i in range(5):
+        conn.execute("INSERT INTO gc_messages (student_id, sender_name, message_content, created_at) VALUES (1, 'mt', ?, '2026-03-01 10:00:00')", (str(i),))
+    seen, cursor = [], None
+    while True:
+        rows, cursor = main._keyset_rows(conn, "sender_name, message_content", "gc_messages", 1, 2, cursor)
+        seen += [r["message_content"] for r in rows]
+        if cursor is None:
+            break
+    assert seen == ["4", "3", "2", "1", "0"]
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend import passwords
+from backend.passwords import HasherBusy, PasswordHasher
+
+
+def _slow(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _hasher(**kwargs):
+    hasher = PasswordHasher(**kwargs)
+    hasher._pool = ThreadPoolExecutor(max_workers=hasher.workers)  # threads are enough to test admission
+    return hasher
+
+
+def test_defaults_hold_a_class_sized_burst():
+    hasher = PasswordHasher(workers=1)
+    assert hasher.max_pending >= passwords.CLASS_BURST
+    assert 1 <= passwords.available_cpus()
+
+
+def test_burst_queues_instead_of_rejecting():
+    hasher = _hasher(workers=1, max_wait=5)
+
+    async def run():
+        return await asyncio.gather(*(hasher._submit(_slow, 0.005) for _ in range(50)))
+
+    assert len(asyncio.run(run())) == 50
+    assert hasher.rejected == 0 and hasher.pending == 0
+
+
+def test_full_queue_and_deadline_shed_with_busy():
+    hasher = _hasher(workers=1, max_pending=3, max_wait=0.05)
+
+    async def run():
+        return await asyncio.gather(*(hasher._submit(_slow, 0.2) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    busy = [r for r in results if isinstance(r, HasherBusy)]
+    assert len(busy) == 4  # two over max_pending, two past their deadline
+    assert hasher.timed_out == 2 and hasher.rejected == 4
+
+
+def test_hash_and_verify_round_trip():
+    pytest.importorskip("passlib")
+    hasher = PasswordHasher(workers=1)
+    try:
+        async def run():
+            hashed = await hasher.hash("s3cret")
+            return hashed, await hasher.verify("s3cret", hashed), await hasher.verify("wrong", hashed)
+
+        hashed, good, bad = asyncio.run(run())
+        assert hashed.startswith("$pbkdf2-sha256$")
+        assert good[0] and not bad[0]
+    finally:
+        hasher.close()
@@ -0,0 +1,55 @@
+import random
+
+from backend.review_queue import BASE_INTERVAL_HOURS, ReviewQueue, _entry, review_interval
+
+DAY = BASE_INTERVAL_HOURS * 3600
+
+
+def test_interval_shrinks_with_lambda_and_doubles_with_streak():
+    assert review_interval(1.0, 0) == DAY
+    assert review_interval(2.0, 0) == DAY / 2
+    assert review_interval(1.0, 3) == DAY * 8
+    assert review_interval(1.0, 100) == review_interval(1.0, 6)
+
+
+def test_heap_matches_a_full_sort():
+    rng = random.Random(5)
+    topics = [(f"t{i}", _entry(rng.uniform(0.2, 5), rng.randint(0, 8), rng.uniform(0, 10 * DAY))) for i in range(60)]
+    queue = ReviewQueue()
+    heap = queue.put(1, topics, queue.generation(1))
+    # Updates leave superseded heap entries behind; they must never surface.
+    for i in rng.sample(range(60), 25):
+        queue.record(1, f"t{i}", rng.uniform(0.2, 5), rng.randint(0, 8), practiced_at=rng.uniform(0, 10 * DAY))
+    expected = sorted(heap.topics, key=lambda t: (heap.topics[t][0], t))[:10]
+    first = [r["topic_name"] for r in queue.next_due(1, 10, now=0)]
+    assert first == expected
+    # Reading the top does not consume it.
+    assert [r["topic_name"] for r in queue.next_due(1, 10, now=0)] == expected
+
+
+def test_due_and_retention_at_the_half_life():
+    queue = ReviewQueue()
+    queue.put(1, [("algebra", _entry(1.0, 0, 0.0))], queue.generation(1))
+    [row] = queue.next_due(1, 1, now=DAY)
+    assert row["due"] and row["retention"] == 0.5
+
+
+def test_load_that_raced_an_attempt_is_not_installed():
+    queue = ReviewQueue()
+    generation = queue.generation(1)
+    queue.record(1, "algebra", 2.0, 1, practiced_at=0.0)  # commits while the load is in flight
+    heap = queue.put(1, [("algebra", _entry(1.0, 0, 0.0))], generation)
+    assert heap.topics["algebra"][1] == 1.0  # the caller can still answer from its load
+    assert queue.next_due(1, 1) is None
+
+    queue.put(1, [("algebra", _entry(2.0, 1, 0.0))], queue.generation(1))
+    assert queue.next_due(1, 1)[0]["lambda_val"] == 2.0
+
+
+def test_attempts_for_unloaded_students_are_ignored():
+    queue = ReviewQueue(max_students=1)
+    queue.record(1, "algebra", 2.0, 1)
+    assert queue.next_due(1, 1) is None
+    queue.put(1, [], queue.generation(1))
+    queue.put(2, [], queue.generation(2))
+    assert queue.next_due(1, 1) is None and queue.next_due(2, 1) == []
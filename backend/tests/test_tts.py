@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.bench import fake_upstream_app
+from backend.tts import AudioCache, TTSClient, TTSError
+
+CLIP = b"\xff\xf3" * 4096 * 4  # what the fake ElevenLabs streams per request
+
+
+class _CountingTransport(httpx.ASGITransport):
+    def __init__(self, app):
+        super().__init__(app=app)
+        self.requests = 0
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        return await super().handle_async_request(request)
+
+
+def _client(tmp_path, max_bytes=10 * len(CLIP)):
+    transport = _CountingTransport(fake_upstream_app(llm_latency=0, tts_latency=0))
+    client = TTSClient("http://fake", "key", AudioCache(str(tmp_path / "tts"), max_bytes))
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=transport)
+    return client, transport
+
+
+async def _speak(client, voice, text):
+    path = client.cache.get(voice, text)
+    if path is not None:
+        return path.read_bytes(), "hit"
+    resp = await client.open(voice, text)
+    return b"".join([chunk async for chunk in client.relay(resp, voice, text)]), "miss"
+
+
+def test_miss_then_hit_against_the_fake(tmp_path):
+    client, transport = _client(tmp_path)
+
+    async def run():
+        try:
+            first = await _speak(client, "judy", "Hello   there")
+            second = await _speak(client, "judy", "Hello there")  # same normalized text
+            other_voice = await _speak(client, "samie", "Hello there")
+            return first, second, other_voice
+        finally:
+            await client.aclose()
+
+    first, second, other_voice = asyncio.run(run())
+    assert first == (CLIP, "miss") and second == (CLIP, "hit") and other_voice[1] == "miss"
+    assert transport.requests == 2
+    assert (client.cache.hits, client.cache.misses) == (1, 2)
+
+
+def test_cache_survives_restart_and_evicts_lru(tmp_path):
+    client, _ = _client(tmp_path, max_bytes=2 * len(CLIP))
+
+    async def run():
+        try:
+            for text in ("one", "two"):
+                await _speak(client, "judy", text)
+            await _speak(client, "judy", "one")  # "two" is now least recently used
+            await _speak(client, "judy", "three")
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    restarted = AudioCache(str(tmp_path / "tts"), 2 * len(CLIP))
+    assert restarted.get("judy", "one") is not None
+    assert restarted.get("judy", "three") is not None
+    assert restarted.get("judy", "two") is None
+    assert restarted.stats()["bytes"] == 2 * len(CLIP)
+
+
+def test_upstream_error_is_not_cached(tmp_path):
+    client, _ = _client(tmp_path)
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(lambda request: httpx.Response(401)))
+
+    async def run():
+        try:
+            with pytest.raises(TTSError):
+                await client.open("judy", "hi")
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert client.cache.stats()["entries"] == 0
+
+
+def test_speak_endpoint_reports_cache_status(tmp_path, monkeypatch):
+    client, transport = _client(tmp_path)
+    monkeypatch.setattr(main, "ELEVENLABS_API_KEY", "key")
+    monkeypatch.setattr(main, "tts_client", client)
+    http = TestClient(main.app)
+    body = {"text": "Keep going!", "persona": "judy"}
+
+    first = http.post("/api/tts/speak", json=body)
+    second = http.post("/api/tts/speak", json=body)
+    assert first.status_code == second.status_code == 200
+    assert first.headers["X-TTS-Cache"] == "miss" and second.headers["X-TTS-Cache"] == "hit"
+    assert first.content == second.content == CLIP
+    assert transport.requests == 1
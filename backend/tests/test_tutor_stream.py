@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import pytest
+
+from backend import main
+from backend.llm_dispatch import INTERACTIVE, LLMUnavailable
+
+
+def _run(monkeypatch, call, pieces, persona="judy"):
+    async def fake_stream(_call):
+        for piece in pieces:
+            if isinstance(piece, Exception):
+                raise piece
+            yield piece
+
+    async def collect():
+        ticket = main.llm_dispatch.reserve(INTERACTIVE, None, 5)
+        state = {"ok": False}
+        frames = [json.loads(f) async for f in main._tutor_stream(call, None, state, ticket, persona)]
+        return frames, state, ticket
+
+    monkeypatch.setattr(main, "_stream_tutor_call", fake_stream)
+    return asyncio.run(collect())
+
+
+def test_judy_frames_are_deltas_then_final(monkeypatch):
+    call = main.TutorCall("chat", {"model": "m", "messages": []}, judy=True)
+    frames, state, ticket = _run(monkeypatch, call, ['{"content": "Hel', 'lo\\n', '"}'])
+    assert [f["type"] for f in frames] == ["delta", "delta", "final"]
+    assert "".join(f["content"] for f in frames[:-1]) == "Hello\n"
+    assert json.loads(frames[-1]["content"]) == {"content": "Hello\n"}
+    assert state["ok"] and ticket.released
+
+
+def test_plain_text_frames_pass_through(monkeypatch):
+    call = main.TutorCall("chat", {"model": "m", "messages": []})
+    frames, state, _ = _run(monkeypatch, call, ["Hi ", "there"], persona="samie")
+    assert frames == [
+        {"type": "delta", "content": "Hi "},
+        {"type": "delta", "content": "there"},
+        {"type": "final", "role": "assistant", "content": "Hi there"},
+    ]
+    assert state["content"] == "Hi there"
+
+
+@pytest.mark.parametrize("failure, status", [(RuntimeError("upstream broke"), None), (LLMUnavailable(503, "busy"), 503)])
+def test_failure_ends_with_an_error_frame_and_counts(monkeypatch, failure, status):
+    call = main.TutorCall("chat", {"model": "m", "messages": []})
+    before = main.tutor_errors.value("samie")
+    frames, state, ticket = _run(monkeypatch, call, ["partial", failure], persona="samie")
+    assert [f["type"] for f in frames] == ["delta", "error"]
+    assert frames[-1].get("status") == status
+    assert not state["ok"] and ticket.released
+    assert main.tutor_errors.value("samie") == before + 1
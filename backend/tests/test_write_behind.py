@@ -0,0 +1,99 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from backend.db import DBPool
+from backend.write_behind import WriteBehindQueue
+
+INSERT = "INSERT INTO events (student_id, body) VALUES (?, ?)"
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / "events.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, student_id INTEGER, body TEXT NOT NULL)")
+    conn.commit()
+    conn.close()
+    pool = DBPool(path, readers=1)
+    yield pool
+    pool.close()
+
+
+def _bodies(pool):
+    return asyncio.run(pool.fetchall("SELECT body FROM events ORDER BY id"))
+
+
+def test_bad_row_does_not_drop_the_batch(pool):
+    committed = []
+
+    async def run():
+        queue = WriteBehindQueue(pool, interval_ms=10_000)
+        queue.start()
+        await queue.write(INSERT, (1, "a"), on_commit=lambda: committed.append("a"))
+        await queue.write(INSERT, (1, None))  # NOT NULL
+        await queue.write(INSERT, (1, "c"), on_commit=lambda: committed.append("c"))
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert [r["body"] for r in _bodies(pool)] == ["a", "c"]
+    assert committed == ["a", "c"]
+    assert stats["dropped"] == 1 and stats["failed_flushes"] == 1
+
+
+def test_durable_write_of_bad_row_raises(pool):
+    async def run():
+        queue = WriteBehindQueue(pool, interval_ms=5)
+        queue.start()
+        try:
+            with pytest.raises(sqlite3.IntegrityError):
+                await queue.write(INSERT, (1, None), durable=True)
+            await queue.write(INSERT, (1, "ok"), durable=True)
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+    assert [r["body"] for r in _bodies(pool)] == ["ok"]
+
+
+def test_transient_failure_is_retried(pool):
+    async def run():
+        queue = WriteBehindQueue(pool, interval_ms=5)
+        real_write, real_execute = pool.write, pool.execute
+        failures = {"left": 2}
+
+        async def flaky(fn, *args):
+            if failures["left"]:
+                failures["left"] -= 1
+                raise sqlite3.OperationalError("database is locked")
+            return await real_write(fn, *args)
+
+        async def flaky_execute(sql, params=()):
+            return await flaky(lambda db, p: db.execute(sql, p).lastrowid, params)
+
+        pool.write, pool.execute = flaky, flaky_execute
+        queue.start()
+        await queue.write(INSERT, (1, "kept"))
+        await queue.stop()
+        pool.write, pool.execute = real_write, real_execute
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert [r["body"] for r in _bodies(pool)] == ["kept"]
+    assert stats["retried"] == 1 and stats["dropped"] == 0
+
+
+def test_stop_drains_without_losing_rows(pool):
+    async def run():
+        queue = WriteBehindQueue(pool, interval_ms=10_000, max_batch=10_000)
+        queue.start()
+        for i in range(500):
+            await queue.write(INSERT, (1, str(i)))
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert len(_bodies(pool)) == 500
+    assert stats["pending"] == 0 and stats["rows_written"] == 500
@@ -0,0 +1,169 @@
+# DreamARC Backend - pooled ElevenLabs client + on-disk audio cache
+"""Text-to-speech plumbing for ``/api/tts/speak``.
+
+``TTSClient`` keeps one keep-alive ``httpx.AsyncClient`` for the process and
+relays audio to the browser chunk by chunk.  ``AudioCache`` stores finished
+clips on disk under a content address of ``(voice_id, normalized text)`` and
+evicts least-recently-used files once the directory exceeds its size cap.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_tts_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+class AudioCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.dir = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(voice_id: str, text: str) -> str:
+        return hashlib.sha256(f"{voice_id}\0{normalize_tts_text(text)}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{key}.mp3"
+
+    def _load(self):
+        # Rebuild LRU order from file mtimes so the cache survives restarts.
+        self.dir.mkdir(parents=True, exist_ok=True)
+        files = sorted(self.dir.glob("*.mp3"), key=lambda p: p.stat().st_mtime)
+        for p in files:
+            size = p.stat().st_size
+            self._entries[p.stem] = size
+            self._bytes += size
+        self._loaded = True
+
+    def get(self, voice_id: str, text: str) -> Optional[Path]:
+        key = self.key(voice_id, text)
+        path = self._path(key)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            if not path.exists():
+                self._bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, voice_id: str, text: str, audio: bytes):
+        if not audio or len(audio) > self.max_bytes:
+            return
+        key = self.key(voice_id, text)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._bytes += len(audio) - self._entries.pop(key, 0)
+            self._entries[key] = len(audio)
+            while self._bytes > self.max_bytes and self._entries:
+                old, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                try:
+                    self._path(old).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class TTSError(Exception):
+    pass
+
+
+class TTSClient:
+    def __init__(self, base_url: str, api_key: Optional[str], cache: AudioCache, timeout: float = 30.0, max_connections: int = 20):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.cache = cache
+        self.timeout = httpx.Timeout(timeout, connect=5.0)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def open(self, voice_id: str, text: str) -> httpx.Response:
+        """Start an upstream synthesis and return the streaming response."""
+        request = self.client.build_request(
+            "POST",
+            f"/v1/text-to-speech/{voice_id}",
+            json={"text": text},
+            headers={"xi-api-key": self.api_key or ""},
+        )
+        try:
+            resp = await self.client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            raise TTSError(str(e)) from e
+        if resp.status_code != 200:
+            await resp.aclose()
+            raise TTSError(f"ElevenLabs returned {resp.status_code}")
+        return resp
+
+    async def relay(self, resp: httpx.Response, voice_id: str, text: str) -> AsyncIterator[bytes]:
+        """Yield audio chunks as they arrive; cache the clip once it is complete."""
+        chunks = []
+        complete = False
+        try:
+            async for chunk in resp.aiter_bytes():
+                chunks.append(chunk)
+                yield chunk
+            complete = True
+        finally:
+            await resp.aclose()
+        if complete:
+            try:
+                await asyncio.to_thread(self.cache.put, voice_id, text, b"".join(chunks))
+            except OSError:
+                logger.exception("Failed to cache TTS audio")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
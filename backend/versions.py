@@ -0,0 +1,25 @@
+# DreamARC Backend - per-student data versions
+"""Monotonic per-student version counters for conditional GETs.
+
+Every committed write that changes what a student's pages show calls
+``bump``.  An ETag built from the counter (plus a per-process boot id, so
+restarts never reuse a tag) lets unchanged reloads be answered with 304
+before any query runs.
+"""
+import uuid
+from typing import Dict
+
+
+class StudentVersions:
+    def __init__(self):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._versions: Dict[int, int] = {}
+
+    def get(self, student_id: int) -> int:
+        return self._versions.get(student_id, 0)
+
+    def bump(self, student_id: int):
+        self._versions[student_id] = self._versions.get(student_id, 0) + 1
+
+    def etag(self, student_id: int, variant: str = "") -> str:
+        return f'"{self.boot_id}-{student_id}-{self.get(student_id)}{"-" + variant if variant else ""}"'
@@ -0,0 +1,126 @@
+# DreamARC Backend - PQ waterfall delta storage
+"""Append-only storage for PQ waterfall histories.
+
+Each click appends one row to ``pq_waterfall_entries``.  Every
+``COMPACT_EVERY`` entries the pending deltas are folded into the
+``pq_waterfall_state`` snapshot: ``history_json`` is extended by splicing
+JSON text (the archived history is never re-parsed) and ``tail_json`` keeps
+the last ``TAIL_SIZE`` entries, which is all a windowed read needs to
+deserialize.  ``snapshot_upto`` is the id of the last entry folded in; only
+entries above it count as pending, so a delta can never be applied twice.
+
+A ``history_json`` that is not a JSON array cannot be spliced; compaction
+then rebuilds it from ``tail_json`` (the older part is lost) and logs it.
+"""
+import json
+import logging
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BASELINE = [{"value": 50}]
+COMPACT_EVERY = 50
+TAIL_SIZE = 200
+
+
+def _splice(history_json: Optional[str], entries_json: List[str]) -> str:
+    body = (history_json or "[]").strip()
+    if not (body.startswith("[") and body.endswith("]")):
+        raise ValueError("history_json is not a JSON array")
+    if body[1:-1].strip() == "":
+        return "[" + ",".join(entries_json) + "]"
+    return body[:-1] + "," + ",".join(entries_json) + "]"
+
+
+def _tail(state: sqlite3.Row) -> List[Dict[str, Any]]:
+    raw = state["tail_json"] if state["tail_json"] is not None else state["history_json"]
+    try:
+        return json.loads(raw)[-TAIL_SIZE:]
+    except (TypeError, ValueError):
+        return list(BASELINE)
+
+
+def append_entry(db: sqlite3.Connection, student_id: int, metric: str, entry: Dict[str, Any], seed: Optional[List[Dict[str, Any]]] = None):
+    """Append one entry; ``seed`` initialises a metric that has no snapshot yet."""
+    state = db.execute("SELECT snapshot_upto FROM pq_waterfall_state WHERE student_id=? AND metric_name=?", (student_id, metric)).fetchone()
+    if not state:
+        seed_json = json.dumps(seed if seed is not None else BASELINE)
+        db.execute(
+            "INSERT INTO pq_waterfall_state (student_id, metric_name, history_json, tail_json, snapshot_upto, updated_at) VALUES (?, ?, ?, ?, 0, CURRENT_TIMESTAMP)",
+            (student_id, metric, seed_json, seed_json),
+        )
+    db.execute(
+        "INSERT INTO pq_waterfall_entries (student_id, metric_name, entry_json) VALUES (?, ?, ?)",
+        (student_id, metric, json.dumps(entry)),
+    )
+    pending = db.execute(
+        "SELECT COUNT(*) FROM pq_waterfall_entries WHERE student_id=? AND metric_name=? AND id>?",
+        (student_id, metric, (state["snapshot_upto"] if state else 0) or 0),
+    ).fetchone()[0]
+    if pending >= COMPACT_EVERY:
+        compact(db, student_id, metric)
+
+
+def compact(db: sqlite3.Connection, student_id: int, metric: str):
+    """Fold pending delta rows into the snapshot and delete them."""
+    state = db.execute(
+        "SELECT history_json, tail_json, snapshot_upto FROM pq_waterfall_state WHERE student_id=? AND metric_name=?",
+        (student_id, metric),
+    ).fetchone()
+    if not state:
+        return
+    deltas = db.execute(
+        "SELECT id, entry_json FROM pq_waterfall_entries WHERE student_id=? AND metric_name=? AND id>? ORDER BY id",
+        (student_id, metric, state["snapshot_upto"] or 0),
+    ).fetchall()
+    if not deltas:
+        return
+    entries_json = [d["entry_json"] for d in deltas]
+    new = [json.loads(e) for e in entries_json]
+    tail = (_tail(state) + new)[-TAIL_SIZE:]
+    try:
+        history_json = _splice(state["history_json"], entries_json)
+    except ValueError:
+        logger.warning("Rebuilding malformed waterfall history for student %s metric %s from its tail", student_id, metric)
+        history_json = json.dumps(_tail(state) + new)
+    last_id = deltas[-1]["id"]
+    db.execute(
+        "UPDATE pq_waterfall_state SET history_json=?, tail_json=?, snapshot_upto=?, updated_at=CURRENT_TIMESTAMP WHERE student_id=? AND metric_name=?",
+        (history_json, json.dumps(tail), last_id, student_id, metric),
+    )
+    db.execute("DELETE FROM pq_waterfall_entries WHERE student_id=? AND metric_name=? AND id<=?", (student_id, metric, last_id))
+
+
+def load_view(db: sqlite3.Connection, student_id: int, window: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Last ``window`` entries per metric; ``window <= 0`` returns full histories."""
+    states = db.execute(
+        "SELECT metric_name, history_json, tail_json, snapshot_upto FROM pq_waterfall_state WHERE student_id=?",
+        (student_id,),
+    ).fetchall()
+    deltas = db.execute(
+        "SELECT id, metric_name, entry_json FROM pq_waterfall_entries WHERE student_id=? ORDER BY metric_name, id",
+        (student_id,),
+    ).fetchall()
+    folded = {s["metric_name"]: s["snapshot_upto"] or 0 for s in states}
+    pending: Dict[str, List[str]] = {}
+    for d in deltas:
+        if d["id"] > folded.get(d["metric_name"], 0):
+            pending.setdefault(d["metric_name"], []).append(d["entry_json"])
+
+    result = {}
+    for s in states:
+        metric = s["metric_name"]
+        new = [json.loads(e) for e in pending.get(metric, [])]
+        if window <= 0 or window > TAIL_SIZE:
+            try:
+                base = json.loads(s["history_json"])
+            except (TypeError, ValueError):
+                base = list(BASELINE)
+        elif len(new) >= window:
+            base = []
+        else:
+            base = _tail(s)
+        view = base + new
+        result[metric] = view[-window:] if window > 0 else view
+    return result
@@ -0,0 +1,181 @@
+# DreamARC Backend - write-behind group commit for append-only tables
+"""Batch single-row inserts into one transaction.
+
+Hot paths append one row at a time to event tables (tutoring logs, diary,
+message board, ATOZ).  Instead of paying a commit each, they enqueue the
+insert; a background task flushes the buffer every ``interval_ms`` or as
+soon as ``max_batch`` rows are waiting, using ``executemany`` inside a single
+writer transaction.  ``write(..., durable=True)`` waits for that commit
+before returning, for endpoints that must confirm persistence.
+
+Callers that did not wait have already been told their write succeeded, so
+a failed batch is never dropped: it is retried row by row, which commits
+every good row and isolates a bad one.  Rows that fail for a transient
+reason (a locked database, a full disk) go back to the head of the buffer
+and are retried on later flushes, up to ``max_attempts``; only rows SQLite
+rejects outright, or that keep failing, are dropped and logged.  ``stop``
+lets the writer finish its current flush and drains the buffer.
+"""
+import asyncio
+import logging
+import sqlite3
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from .db import DBPool
+
+logger = logging.getLogger(__name__)
+
+OnCommit = Optional[Callable[[], None]]
+
+# Errors that retrying the same row cannot fix.
+_PERMANENT = (sqlite3.IntegrityError, sqlite3.ProgrammingError, sqlite3.InterfaceError, sqlite3.DataError)
+
+
+class _Pending:
+    __slots__ = ("sql", "params", "on_commit", "future", "attempts")
+
+    def __init__(self, sql: str, params: Sequence[Any], on_commit: OnCommit, future: Optional[asyncio.Future]):
+        self.sql = sql
+        self.params = params
+        self.on_commit = on_commit
+        self.future = future
+        self.attempts = 0
+
+
+class WriteBehindQueue:
+    def __init__(self, pool: DBPool, interval_ms: int = 50, max_batch: int = 200, max_pending: int = 10000,
+                 max_attempts: int = 5):
+        self.pool = pool
+        self.interval = interval_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.flushes = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+        self.retried = 0
+        self.dropped = 0
+        self._buffer: List[_Pending] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer after a final flush; nothing buffered is lost."""
+        task, self._task = self._task, None
+        if task is not None:
+            # Never cancel mid-flush: that would lose the batch and its commit hooks.
+            self._stopping = True
+            self._wake.set()
+            await task
+        while self._buffer:
+            await self._flush()
+            if self._buffer:
+                await asyncio.sleep(self.interval)
+
+    async def write(self, sql: str, params: Sequence[Any], durable: bool = False, on_commit: OnCommit = None):
+        """Queue one insert; with ``durable`` wait until it has been committed."""
+        if not self.running:
+            await self.pool.execute(sql, params)
+            if on_commit:
+                on_commit()
+            return
+        row = _Pending(sql, params, on_commit, asyncio.get_running_loop().create_future() if durable else None)
+        self._buffer.append(row)
+        if len(self._buffer) >= self.max_batch:
+            self._wake.set()
+        if len(self._buffer) >= self.max_pending and row.future is None:
+            # Backpressure: the writer is falling behind, so wait for this row too.
+            row.future = asyncio.get_running_loop().create_future()
+            self._wake.set()
+        if row.future is not None:
+            await row.future
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._flush()
+
+    async def _flush(self):
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        try:
+            await self.pool.write(_insert_batch, [(row.sql, row.params) for row in batch])
+            committed, retry = batch, []
+        except Exception:
+            self.failed_flushes += 1
+            logger.warning(f"Write-behind flush of {len(batch)} rows failed; retrying row by row", exc_info=True)
+            committed, retry = await self._insert_rows(batch)
+        if retry:
+            # Ahead of anything queued meanwhile, so retried rows keep their place.
+            self.retried += len(retry)
+            self._buffer[:0] = retry
+        if committed:
+            self.flushes += 1
+            self.rows_written += len(committed)
+        for row in committed:
+            if row.on_commit:
+                try:
+                    row.on_commit()
+                except Exception:
+                    logger.exception("Write-behind commit hook failed")
+            if row.future is not None and not row.future.done():
+                row.future.set_result(None)
+
+    async def _insert_rows(self, batch: List[_Pending]) -> Tuple[List[_Pending], List[_Pending]]:
+        """Insert one row per transaction; returns ``(committed, retry)`` and fails the rest."""
+        committed, retry = [], []
+        for row in batch:
+            try:
+                await self.pool.execute(row.sql, row.params)
+            except Exception as e:
+                row.attempts += 1
+                if not isinstance(e, _PERMANENT) and row.attempts < self.max_attempts:
+                    retry.append(row)
+                    continue
+                self.dropped += 1
+                logger.error(f"Write-behind dropped a row after {row.attempts} attempt(s): {row.sql} {row.params!r}: {e}")
+                if row.future is not None and not row.future.done():
+                    row.future.set_exception(e)
+            else:
+                committed.append(row)
+        return committed, retry
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "pending": len(self._buffer),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "avg_rows_per_flush": round(self.rows_written / self.flushes, 2) if self.flushes else 0.0,
+            "failed_flushes": self.failed_flushes,
+            "retried": self.retried,
+            "dropped": self.dropped,
+        }
+
+
+def _insert_batch(db, rows: List[Tuple[str, Sequence[Any]]]):
+    # Runs of the same statement go through one executemany, preserving order.
+    i = 0
+    while i < len(rows):
+        sql = rows[i][0]
+        j = i
+        while j < len(rows) and rows[j][0] == sql:
+            j += 1
+        db.executemany(sql, [params for _, params in rows[i:j]])
+        i = j
@@ -202,12 +202,10 @@ export default function GameChanger() {
 
     try {
       const token = getAuthToken();
-      const systemMsg = { role: "system", content: currentConfig.systemPrompt };
-      const apiHistory = [systemMsg, ...newHistoryObj].map(msg => ({ role: msg.role, content: typeof msg.content === 'object' ? JSON.stringify(msg.content) : String(msg.content) }));
-
+      // The server keeps the conversation; only the new message goes up (history[0] is the local greeting).
       const res = await fetch(`${API_BASE}/api/learning/tutor-request`, {
         method: "POST", headers: { "Content-Type": "application/json", "Authorization": `Bearer ${token}` },
-        body: JSON.stringify({ history: apiHistory, student_id: studentId || user?.id, persona: "samie" })
+        body: JSON.stringify({ message: userMsg.content, system: currentConfig.systemPrompt, student_id: studentId || user?.id, persona: "samie", new_session: history.length <= 1 })
       });
       
       const data = await res.json();
@@ -372,12 +370,14 @@ function ShowMyWorkModal({ isOpen, onClose, initialImage, clearInitialImage, lan
       setLoading(true); setModalHistory([{ role: "user", content: "Checking your work... 🐾" }]); 
       try { 
           const token = getAuthToken(); 
-          const res = await fetch(`${API_BASE}/api/learning/tutor-request`, { 
-            method: "POST", headers: { "Content-Type": "application/json", ...(token ? { Authorization: `Bearer ${token}` } : {}) }, 
-            body: JSON.stringify({ 
-              history: [{ role: "user", content: `OCD_CAMERA_SUBMISSION\nAnalyze math problem immediately. DO NOT refuse. Provide full step-by-step solution and final answer in LaTeX. Support student confidence.\n\nIMAGE_DATA: ${previewUrl}` }], 
-              student_id: user?.id, persona: "samie" 
-            }) 
+          // Upload the image as a file; the server downscales it and reuses the analysis for repeats.
+          const form = new FormData();
+          form.append("file", await (await fetch(previewUrl)).blob(), "work.jpg");
+          form.append("message", "OCD_CAMERA_SUBMISSION\nAnalyze math problem immediately. DO NOT refuse. Provide full step-by-step solution and final answer in LaTeX. Support student confidence.");
+          if (user?.id) form.append("student_id", user.id);
+          const res = await fetch(`${API_BASE}/api/learning/vision-upload`, { 
+            method: "POST", headers: { ...(token ? { Authorization: `Bearer ${token}` } : {}) }, 
+            body: form 
           }); 
           const data = await res.json(); 
           setModalHistory([{ role: "assistant", content: data.content }]); onAnalyzed(data.content); 
@@ -115,14 +115,17 @@ function CatchUpModule({ isDemo }) {
   return <div className="catchup-container card-effect"><div className="cup-header"><span>🚀 Plan Ready</span><span className="cup-badge active">Active</span></div><div className="cup-body"><div className="gap-analysis"><strong>⚠️ Gap:</strong> Quadratic Functions</div><div className="plan-grid"><div className="plan-card"><span className="subject-icon">📐</span><div><strong>Math Bridge</strong><br /><small>3 Sessions</small></div></div><div className="plan-card"><span className="subject-icon">🧪</span><div><strong>Science Bridge</strong><br /><small>2 Sessions</small></div></div></div><div className="ai-message">"I've briefed Sarah. You're syncing up!" - Judy</div></div></div>;
 }
 
-function StudyCalendar({ studentId }) {
+function StudyCalendar({ studentId, initial, nextCursor }) {
   const [selectedDate, setSelectedDate] = useState(new Date().getDate());
   const [events, setEvents] = useState({});
   const [noteInput, setNoteInput] = useState("");
   const [status, setStatus] = useState("");
-  useEffect(() => { fetch(`${API_BASE}/api/diary/${studentId}`).then(r=>r.json()).then(data => {
-      const mapped = {}; (Array.isArray(data) ? data : []).forEach(e => { const d = parseInt(String(e.entry_date).split("-")[2], 10); if (!mapped[d]) mapped[d]=[]; mapped[d].push(e.content); }); setEvents(mapped);
-  }).catch(e=>console.error(e)); }, [studentId]);
+  // The first page comes with the page's overview; older entries are fetched only if there are more.
+  useEffect(() => {
+      const addEntries = (rows) => setEvents(p => { const mapped = {...p}; (Array.isArray(rows) ? rows : []).forEach(e => { const d = parseInt(String(e.entry_date).split("-")[2], 10); mapped[d] = [...(mapped[d]||[]), e.content]; }); return mapped; });
+      setEvents({}); addEntries(initial);
+      if (nextCursor) fetch(`${API_BASE}/api/diary/${studentId}?cursor=${encodeURIComponent(nextCursor)}`).then(r=>r.json()).then(addEntries).catch(e=>console.error(e));
+  }, [studentId, initial, nextCursor]);
   const handleSaveNote = async () => {
     if (!noteInput.trim()) return;
     setStatus("Saving...");
@@ -155,7 +158,7 @@ function MetricGauge({ value, max, label, color }) {
   );
 }
 
-function AtozDashboard({ studentId }) {
+function AtozDashboard({ studentId, initial }) {
   const [currentScore, setCurrentScore] = useState(50);
   const [futureScore, setFutureScore] = useState(80);
   const [rmsPlan, setRmsPlan] = useState("");
@@ -163,10 +166,9 @@ function AtozDashboard({ studentId }) {
   const [status, setStatus] = useState("");
 
   useEffect(() => {
-    fetch(`${API_BASE}/api/students/${studentId}/atoz`).then(r=>r.json()).then(data=>{
-       if(data){ setCurrentScore(data.current_score||50); setFutureScore(data.future_score||80); setRmsPlan(data.rms_plan||""); setFutureGoal(data.future_goal||""); }
-    }).catch(e=>console.error(e));
-  }, [studentId]);
+    const data = initial;
+    if(data){ setCurrentScore(data.current_score||50); setFutureScore(data.future_score||80); setRmsPlan(data.rms_plan||""); setFutureGoal(data.future_goal||""); }
+  }, [initial]);
 
   const handleSave = async () => {
     setStatus("Saving...");
@@ -215,17 +217,17 @@ function WaterfallChart({ title, data, onUpdate }) {
   );
 }
 
-function PqWaterfallSystem({ studentId }) {
+function PqWaterfallSystem({ studentId, initial }) {
   const METRICS = ["Homework", "Note Taking", "Attitude", "Test Prep", "Review"];
   const [selectedMetrics, setSelectedMetrics] = useState(["Homework", "Attitude"]);
   const [chartData, setChartData] = useState({ "Homework": [{value: 50}], "Attitude": [{value: 50}] });
   
-  useEffect(() => { fetch(`${API_BASE}/api/students/${studentId}/pq-waterfall`).then(r=>r.json()).then(d=>{ if(d && Object.keys(d).length>0) setChartData(d); }).catch(console.error); }, [studentId]);
+  useEffect(() => { const d = initial; if(d && Object.keys(d).length>0) setChartData(d); }, [initial]);
 
   const handleUpdate = async (metric, changeVal) => {
     const newData = [...(chartData[metric] || [{value: 50}]), { value: changeVal }];
     setChartData(p => ({ ...p, [metric]: newData }));
-    await fetch(`${API_BASE}/api/students/${studentId}/pq-waterfall/update`, { method: "POST", headers: {"Content-Type":"application/json"}, body: JSON.stringify({ metric_name: metric, new_entry: { value: changeVal }, full_history: newData }) });
+    await fetch(`${API_BASE}/api/students/${studentId}/pq-waterfall/update`, { method: "POST", headers: {"Content-Type":"application/json"}, body: JSON.stringify({ metric_name: metric, new_entry: { value: changeVal } }) });
   };
   
   const toggleMetric = (m) => {
@@ -243,19 +245,28 @@ function PqWaterfallSystem({ studentId }) {
   );
 }
 
-function GameChangerBoard({ studentId }) {
+function GameChangerBoard({ studentId, initial }) {
   const [messages, setMessages] = useState([]);
   const [mentorId, setMentorId] = useState("");
   const [msgContent, setMsgContent] = useState("");
   
-  const load = () => fetch(`${API_BASE}/api/students/${studentId}/gc-messages`).then(r=>r.json()).then(setMessages).catch(console.error);
-  useEffect(() => { load(); }, [studentId]);
+  // First page comes with the overview, then new posts arrive over SSE instead of re-downloading the board.
+  // Nothing is opened until the overview has landed, so the stream never replays a board the client is about to receive.
+  useEffect(() => {
+    if (initial === undefined) return;
+    const rows = Array.isArray(initial) ? initial : [];
+    setMessages(rows);
+    const after = rows.reduce((mx, m) => Math.max(mx, m.id || 0), 0);
+    const es = new EventSource(`${API_BASE}/api/students/${studentId}/gc-messages/stream${after > 0 ? `?after=${after}` : ""}`);
+    es.addEventListener("message", e => { const m = JSON.parse(e.data); setMessages(p => p.some(x=>x.id===m.id) ? p : [m, ...p]); });
+    return () => es.close();
+  }, [studentId, initial]);
 
   const handlePost = async () => {
     if (!mentorId.toLowerCase().startsWith("mt")) { alert("🚫 Mentor ID must start with 'mt'"); return; }
     if (!msgContent.trim()) return;
     const res = await fetch(`${API_BASE}/api/students/${studentId}/gc-messages`, { method: "POST", headers: {"Content-Type":"application/json"}, body: JSON.stringify({sender_id: mentorId, sender_name: "Mentor "+mentorId, message: msgContent})});
-    if(res.ok) { setMsgContent(""); load(); alert("✅ Sent!"); }
+    if(res.ok) { setMsgContent(""); alert("✅ Sent!"); }
   };
 
   return (
@@ -290,14 +301,15 @@ function BadgeCard({ badge, isLocked }) {
   return <div className={`badge-card ${!isLocked?"earned":"locked"}`}><div className="badge-icon-wrapper"><img src={badge.img} alt={badge.name} className="badge-img" onError={e=>e.target.style.display="none"}/><span className="badge-fallback">🏅</span>{isLocked&&<div className="lock-overlay">🔒</div>}</div><div className="badge-info"><h4>{badge.name}</h4><p>{badge.desc}</p></div></div>;
 }
 
-function BattleArena({ studentId, onBattleWin }) {
+function BattleArena({ studentId, initial, offline, onBattleWin }) {
   const [chat, setChat] = useState([{ sender: "Judy", text: "Welcome to the **Shadow Breaker Arena**!" }]);
   const [input, setInput] = useState("");
   const [questions, setQuestions] = useState([]);
   const [activeQ, setActiveQ] = useState(null);
   const [loading, setLoading] = useState(false);
 
-  useEffect(() => { fetch(`${API_BASE}/api/game/${studentId}/monsters`).then(r=>r.json()).then(data=>setQuestions(Array.isArray(data)?data.map(m=>({id:m.id, name:m.monster_name, hp:m.hp_current, xp:m.xp_reward, desc:m.question_text, color:m.monster_type==="BOSS"?"#ef4444":"#f59e0b"})):[])).catch(()=>setChat(p=>[...p,{sender:"System",text:"Arena Offline"}])); }, [studentId]);
+  // undefined means the overview is still loading; only a failed fetch takes the arena offline.
+  useEffect(() => { if (offline) { setChat(p=>[...p,{sender:"System",text:"Arena Offline"}]); return; } const data = initial; if (!Array.isArray(data)) return; setQuestions(data.map(m=>({id:m.id, name:m.monster_name, hp:m.hp_current, xp:m.xp_reward, desc:m.question_text, color:m.monster_type==="BOSS"?"#ef4444":"#f59e0b"}))); }, [initial, offline]);
 
   const handleAttack = async () => {
     if (!input.trim() || !activeQ) return;
@@ -342,6 +354,8 @@ export default function PageStudent() {
   const { studentId } = useParams();
   const navigate = useNavigate();
 
+  const [overview, setOverview] = useState(null);
+  const [overviewFailed, setOverviewFailed] = useState(false);
   const [dashboardData, setDashboardData] = useState(null);
   const [rmsqData, setRmsqData] = useState([]);
   const [insight, setInsight] = useState(null);
@@ -357,12 +371,19 @@ export default function PageStudent() {
   const [canvas, setCanvas] = useState(null);
   const [isGraphPanelOpen, setIsGraphPanelOpen] = useState(false);
 
+  const applyStats = (o) => { setDashboardData(o.dashboard); const d=o.rmsq_stats||{}; setRmsqData(d.graph_data||[]); setInsight(d.insight||null); };
+
+  // After a battle only the stats change; the browser revalidates with If-None-Match and gets a 304 when nothing did.
   const refreshData = () => {
-    fetch(`${API_BASE}/api/students/${studentId}/dashboard`).then(r=>r.json()).then(setDashboardData).catch(console.error);
-    fetch(`${API_BASE}/api/students/${studentId}/rmsq-stats`).then(r=>r.json()).then(d=>{ setRmsqData(d.graph_data||[]); setInsight(d.insight||null); }).catch(console.error);
+    fetch(`${API_BASE}/api/students/${studentId}/overview?fields=dashboard,rmsq_stats`).then(r=>r.json()).then(applyStats).catch(console.error);
   };
 
-  useEffect(() => { refreshData(); if (studentId === "1") setTimeout(() => setShowInsight(true), 1500); }, [studentId]);
+  // Every panel's mount data in one round trip; the panels below start from their section of it.
+  useEffect(() => {
+    setOverview(null); setOverviewFailed(false); setDashboardData(null);
+    fetch(`${API_BASE}/api/students/${studentId}/overview`).then(r=>{ if (!r.ok) throw new Error(`overview ${r.status}`); return r.json(); }).then(o=>{ setOverview(o); applyStats(o); }).catch(e=>{ console.error(e); setOverviewFailed(true); });
+    if (studentId === "1") setTimeout(() => setShowInsight(true), 1500);
+  }, [studentId]);
 
   const handleOpenGift = (id, content) => { confetti({ particleCount: 100, spread: 70, origin: { y: 0.6 } }); alert(`🎉 GIFT UNLOCKED!\n\n${content}`); };
 
@@ -378,20 +399,17 @@ export default function PageStudent() {
     setIsChatLoading(true);
 
     // 2. Prepare Payload (INJECTING THE BRAIN)
-    const apiMessages = [
-        { role: "system", content: SAMIE_SYSTEM_PROMPT }, 
-        ...newMessages
-    ];
-
+    // The server keeps the conversation; only the new message goes up.
     try {
         const response = await fetch(`${API_BASE}/api/learning/tutor-request`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ 
                 student_id: parseInt(studentId),
-                history: apiMessages,
                 message: userText,
-                persona: "samie"
+                system: SAMIE_SYSTEM_PROMPT,
+                persona: "samie",
+                new_session: chatHistory.length === 0
             })
         });
         const data = await response.json();
@@ -599,20 +617,20 @@ export default function PageStudent() {
         </div>
       </div>
 
-      <PqWaterfallSystem studentId={studentId} />
+      <PqWaterfallSystem studentId={studentId} initial={overview?.pq_waterfall} />
 
       <div style={{ marginBottom: "2rem" }}>
-         <AtozDashboard studentId={studentId} /> 
+         <AtozDashboard studentId={studentId} initial={overview?.atoz} /> 
       </div>
 
       <div style={{ marginBottom: "2rem" }}>
-         <GameChangerBoard studentId={studentId} /> 
+         <GameChangerBoard studentId={studentId} initial={overview?.gc_messages} /> 
       </div>
 
       {/* ✅ UPDATED TOOLS GRID: Sketch Board Removed to unblock Calendar */}
       <div className="tools-grid">
         <CatchUpModule isDemo={isDemo} />
-        <div className="card-no-padding"><StudyCalendar studentId={studentId} /></div>
+        <div className="card-no-padding"><StudyCalendar studentId={studentId} initial={overview?.diary} nextCursor={overview?.next_cursors?.diary} /></div>
       </div>
 
       {/* PAST LOGS */}
@@ -633,7 +651,7 @@ export default function PageStudent() {
         </div>
       </div>
 
-      <BattleArena studentId={studentId} onBattleWin={refreshData} />
+      <BattleArena studentId={studentId} initial={overview?.monsters} offline={overviewFailed} onBattleWin={refreshData} />
       
       {showInsight && insight && <DailyInsightModal data={insight} onClose={() => setShowInsight(false)} />}
       